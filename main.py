@@ -18,11 +18,25 @@ import time
 import logging
 import traceback
 import io
+import csv
+import tempfile
 import re
 import urllib.error
 import urllib.request
+import queue
+import atexit
+import codecs
+import hashlib
+import secrets
+import itertools
+import heapq
+from collections import OrderedDict, deque
+from array import array
+import bisect
 
 DISCORD_TOKEN = os.environ.get("DISCORD_TOKEN")
+# Chave dos tabuleiros dos minigames; sem a variável, usa a gerada uma vez e guardada no banco (migração 14).
+SEGREDO_JOGOS = os.environ.get("FORT_SEGREDO_JOGOS", "").encode()[:64]
 BR_TZ = timezone(timedelta(hours=-3))
 
 from flask import Flask, jsonify
@@ -50,6 +64,21 @@ def ping():
     return "pong", 200
 
 
+@app.route("/persistencia")
+def persistencia():
+    return jsonify(bot.escritor.metricas())
+
+
+@app.route("/dms")
+def dms():
+    return jsonify(bot.dms.metricas())
+
+
+@app.route("/agendador")
+def agendador():
+    return jsonify({**bot.agendador.metricas(), "encerramentos": bot.encerramentos.metricas()})
+
+
 def run_webserver():
     port = int(os.environ.get("PORT", 8080))
     print(f"📡 Iniciando servidor web na porta {port}")
@@ -62,21 +91,1618 @@ def keep_alive():
     print("✅ Servidor web configurado")
 
 
-class EnqueteButton(Button):
-    def __init__(self, enquete_id: str, opcao_index: int, opcao_texto: str):
+class DadosRastreados(dict):
+    """dict que anota quais chaves mudaram desde o último flush para o save_data gravar só o necessário."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.alterados = set()
+        self.removidos = set()
+        self.detalhes = {}
+
+    def __setitem__(self, chave, valor):
+        super().__setitem__(chave, valor)
+        self.alterados.add(chave)
+        self.removidos.discard(chave)
+        self.detalhes.pop(chave, None)
+
+    def __delitem__(self, chave):
+        super().__delitem__(chave)
+        self.alterados.discard(chave)
+        self.removidos.add(chave)
+        self.detalhes.pop(chave, None)
+
+    def setdefault(self, chave, padrao=None):
+        if chave not in self:
+            self[chave] = padrao
+        return super().__getitem__(chave)
+
+    def pop(self, chave, *padrao):
+        if chave in self:
+            valor = super().__getitem__(chave)
+            del self[chave]
+            return valor
+        return super().pop(chave, *padrao)
+
+    def popitem(self):
+        chave, valor = super().popitem()
+        self.alterados.discard(chave)
+        self.removidos.add(chave)
+        self.detalhes.pop(chave, None)
+        return chave, valor
+
+    def update(self, *args, **kwargs):
+        for chave, valor in dict(*args, **kwargs).items():
+            self[chave] = valor
+
+    def clear(self):
+        self.removidos.update(self.keys())
+        self.alterados.clear()
+        self.detalhes.clear()
+        super().clear()
+
+    def marcar(self, chave, detalhe=None):
+        """
+        Use quando o valor foi alterado por dentro (ex.: lista/dict aninhado).
+        Com `detalhe`, só aquela parte (um voto, um participante...) precisa ser regravada.
+        """
+        if chave not in self:
+            return
+        if detalhe is None:
+            self.alterados.add(chave)
+            self.detalhes.pop(chave, None)
+        elif chave not in self.alterados:
+            self.detalhes.setdefault(chave, set()).add(detalhe)
+
+    def marcar_todos(self):
+        self.alterados.update(self.keys())
+        self.detalhes.clear()
+
+    @property
+    def sujo(self) -> bool:
+        return bool(self.alterados or self.removidos or self.detalhes)
+
+    def coletar(self):
+        """Devolve ({chave: valor} alterados, {chaves removidas}, {chave: detalhes}) e zera o rastreamento."""
+        alterados = {k: super(DadosRastreados, self).__getitem__(k) for k in self.alterados if k in self}
+        removidos = self.removidos
+        detalhes = {k: d for k, d in self.detalhes.items() if k in self}
+        self.alterados = set()
+        self.removidos = set()
+        self.detalhes = {}
+        return alterados, removidos, detalhes
+
+
+class RegistrosIndexados(DadosRastreados):
+    """
+    DadosRastreados de registros (chamadas, enquetes) com índices em memória por mensagem, canal,
+    servidor e criador, mantidos a cada set/del para os comandos não varrerem tudo.
+    """
+
+    CAMPOS_INDICE = ("channel_id", "guild_id", "criador_id")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.por_mensagem = {}
+        self.indices = {campo: {} for campo in self.CAMPOS_INDICE}
+        for chave, valor in dict(*args, **kwargs).items():
+            dict.__setitem__(self, chave, valor)
+            self._indexar(chave, valor)
+
+    def _indexar(self, chave, registro):
+        if registro.get("message_id"):
+            self.por_mensagem[str(registro["message_id"])] = chave
+        for campo, indice in self.indices.items():
+            if registro.get(campo):
+                indice.setdefault(str(registro[campo]), {})[chave] = None
+
+    def _desindexar(self, chave, registro):
+        if registro.get("message_id") and self.por_mensagem.get(str(registro["message_id"])) == chave:
+            del self.por_mensagem[str(registro["message_id"])]
+        for campo, indice in self.indices.items():
+            valor = registro.get(campo)
+            ids = indice.get(str(valor)) if valor else None
+            if ids is not None:
+                ids.pop(chave, None)
+                if not ids:
+                    del indice[str(valor)]
+
+    def __setitem__(self, chave, valor):
+        if chave in self:
+            self._desindexar(chave, dict.__getitem__(self, chave))
+        super().__setitem__(chave, valor)
+        self._indexar(chave, valor)
+
+    def __delitem__(self, chave):
+        self._desindexar(chave, dict.__getitem__(self, chave))
+        super().__delitem__(chave)
+
+    def popitem(self):
+        chave, valor = super().popitem()
+        self._desindexar(chave, valor)
+        return chave, valor
+
+    def clear(self):
+        super().clear()
+        self.por_mensagem.clear()
+        for indice in self.indices.values():
+            indice.clear()
+
+    def reindexar(self, chave, **campos):
+        """Altera campos indexados de um registro já guardado (o chamador ainda marca o que gravar)."""
+        registro = dict.__getitem__(self, chave)
+        self._desindexar(chave, registro)
+        registro.update(campos)
+        self._indexar(chave, registro)
+
+    def id_por_mensagem(self, message_id):
+        return self.por_mensagem.get(str(message_id).strip())
+
+    def ids_por(self, campo: str, valor) -> list:
+        """Ids com registro[campo] == valor, na ordem de inserção."""
+        return list(self.indices[campo].get(str(valor), ()))
+
+
+class VotosCompactos:
+    """
+    Votos de uma enquete (user_id -> índice da opção) em dois buffers paralelos: array('q') de ids
+    ordenados + bytearray das opções. ~9 bytes por voto em vez de um dict de strings; busca e troca
+    de voto por bisect. Aceita as mesmas operações de dict que o resto do código usa.
+    """
+
+    __slots__ = ("ids", "opcoes")
+
+    def __init__(self, pares=()):
+        pares = sorted((int(uid), opcao) for uid, opcao in (pares.items() if isinstance(pares, dict) else pares))
+        self.ids = array("q", (uid for uid, _ in pares))
+        self.opcoes = bytearray(opcao for _, opcao in pares)
+
+    def _posicao(self, uid: int) -> int:
+        i = bisect.bisect_left(self.ids, uid)
+        return i if i < len(self.ids) and self.ids[i] == uid else -1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, user_id):
+        return self._posicao(int(user_id)) >= 0
+
+    def __getitem__(self, user_id):
+        i = self._posicao(int(user_id))
+        if i < 0:
+            raise KeyError(user_id)
+        return self.opcoes[i]
+
+    def get(self, user_id, padrao=None):
+        i = self._posicao(int(user_id))
+        return self.opcoes[i] if i >= 0 else padrao
+
+    def __setitem__(self, user_id, opcao: int):
+        uid = int(user_id)
+        i = bisect.bisect_left(self.ids, uid)
+        if i < len(self.ids) and self.ids[i] == uid:
+            self.opcoes[i] = opcao
+        else:
+            self.ids.insert(i, uid)
+            self.opcoes.insert(i, opcao)
+
+    def __iter__(self):
+        return (str(uid) for uid in self.ids)
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return ((str(uid), opcao) for uid, opcao in zip(self.ids, self.opcoes))
+
+
+class BancoSQLite:
+    """
+    Conexão de vida longa com o fort_bot.db (WAL + pragmas), compartilhada pela persistência, mais uma
+    conexão só-leitura (ler) para consultas do event loop: no WAL ela lê o último commit enquanto o
+    escritor grava, sem esperar a trava dele.
+    """
+
+    PRAGMAS = (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -8000),
+        ("mmap_size", 32 * 1024 * 1024),
+        ("temp_store", "MEMORY"),
+        ("busy_timeout", 5000),
+    )
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        # cached_statements: o sqlite3 reaproveita o statement preparado sempre que o texto SQL se repete
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, cached_statements=256)
+        self.trava = threading.RLock()
+        for nome, valor in self.PRAGMAS:
+            self.conn.execute(f"PRAGMA {nome} = {valor}")
+        self.leitura = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True, check_same_thread=False, cached_statements=256)
+        self.trava_leitura = threading.Lock()
+        for nome, valor in self.PRAGMAS[2:]:
+            self.leitura.execute(f"PRAGMA {nome} = {valor}")
+
+    def ler(self, sql: str, parametros=()) -> list:
+        """Consulta pela conexão só-leitura: vê só o que já foi commitado."""
+        with self.trava_leitura:
+            return self.leitura.execute(sql, parametros).fetchall()
+
+    def consultar(self, sql: str, parametros=()) -> list:
+        with self.trava:
+            return self.conn.execute(sql, parametros).fetchall()
+
+    def executar(self, sql: str, parametros=()):
+        with self.trava, self.conn:
+            self.conn.execute(sql, parametros)
+
+    def executar_lote(self, operacoes):
+        """Executa [(sql, [params...]), ...] numa única transação."""
+        with self.trava, self.conn:
+            for sql, parametros in operacoes:
+                self.conn.executemany(sql, parametros)
+
+    def fechar(self):
+        with self.trava:
+            try:
+                with self.trava_leitura:
+                    self.leitura.close()
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+
+
+ESQUEMA_NORMALIZADO = (
+    """CREATE TABLE IF NOT EXISTS ships (
+        ship_id TEXT PRIMARY KEY, pessoa1 TEXT NOT NULL, pessoa2 TEXT NOT NULL,
+        likes INTEGER NOT NULL DEFAULT 0, criado_por TEXT, data TEXT)""",
+    "CREATE INDEX IF NOT EXISTS idx_ships_criado_por ON ships (criado_por)",
+    "CREATE INDEX IF NOT EXISTS idx_ships_likes ON ships (likes DESC)",
+    """CREATE TABLE IF NOT EXISTS marriages (
+        marriage_id TEXT PRIMARY KEY, pessoa1 TEXT NOT NULL, pessoa2 TEXT NOT NULL, data_casamento TEXT,
+        aniversarios_comemorados INTEGER NOT NULL DEFAULT 0, luademel INTEGER NOT NULL DEFAULT 1,
+        presentes TEXT NOT NULL DEFAULT '[]', fase TEXT)""",
+    "CREATE INDEX IF NOT EXISTS idx_marriages_pessoa1 ON marriages (pessoa1)",
+    "CREATE INDEX IF NOT EXISTS idx_marriages_pessoa2 ON marriages (pessoa2)",
+    """CREATE TABLE IF NOT EXISTS inventory_items (
+        user_id TEXT NOT NULL, posicao INTEGER NOT NULL, presente TEXT, de TEXT, data TEXT,
+        PRIMARY KEY (user_id, posicao)) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS calls (
+        call_id TEXT PRIMARY KEY, titulo TEXT, data_hora TEXT, local TEXT, descricao TEXT,
+        criador_id TEXT, criador_nome TEXT, channel_id TEXT, message_id TEXT, emoji TEXT,
+        expira_em TEXT, criado_em TEXT, horas_duracao INTEGER, guild_id TEXT)""",
+    "CREATE INDEX IF NOT EXISTS idx_calls_message ON calls (message_id)",
+    "CREATE INDEX IF NOT EXISTS idx_calls_channel ON calls (channel_id)",
+    """CREATE TABLE IF NOT EXISTS call_participants (
+        call_id TEXT NOT NULL, user_id TEXT NOT NULL, entrou_em REAL, PRIMARY KEY (call_id, user_id))""",
+    """CREATE TABLE IF NOT EXISTS polls (
+        poll_id TEXT PRIMARY KEY, pergunta TEXT, opcoes TEXT NOT NULL, criador_id TEXT, criador_nome TEXT,
+        channel_id TEXT, message_id TEXT, criado_em TEXT, expira_em TEXT, guild_id TEXT)""",
+    "CREATE INDEX IF NOT EXISTS idx_polls_message ON polls (message_id)",
+    "CREATE INDEX IF NOT EXISTS idx_polls_channel ON polls (channel_id)",
+    """CREATE TABLE IF NOT EXISTS poll_votes (
+        poll_id TEXT NOT NULL, user_id TEXT NOT NULL, opcao INTEGER NOT NULL,
+        PRIMARY KEY (poll_id, user_id)) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS pascoa_points (user_id TEXT PRIMARY KEY, pontos INTEGER NOT NULL DEFAULT 0)""",
+    "CREATE INDEX IF NOT EXISTS idx_pascoa_points_pontos ON pascoa_points (pontos DESC)",
+    """CREATE TABLE IF NOT EXISTS rp_sheets (
+        user_id TEXT PRIMARY KEY, nome TEXT, idade TEXT, personalidade TEXT, historia TEXT)""",
+)
+
+
+# Cada domínio normalizado: (tipo legado em dados_json, atributo no Fort, carregar, gravar, [(tabela, coluna da chave)]).
+# gravar(chave, valor, detalhes) devolve [(sql, [params...])]; detalhes=None significa "linha inteira".
+
+
+def _carregar_ships(banco) -> dict:
+    return {
+        sid: {"pessoa1": p1, "pessoa2": p2, "likes": likes, "criado_por": criado_por, "data": data}
+        for sid, p1, p2, likes, criado_por, data in banco.consultar("SELECT ship_id, pessoa1, pessoa2, likes, criado_por, data FROM ships")
+    }
+
+
+def _gravar_ship(sid: str, d: dict, detalhes) -> list:
+    linha = (sid, str(d["pessoa1"]), str(d["pessoa2"]), int(d.get("likes", 0)), str(d.get("criado_por", "")), d.get("data"))
+    return [("INSERT OR REPLACE INTO ships (ship_id, pessoa1, pessoa2, likes, criado_por, data) VALUES (?, ?, ?, ?, ?, ?)", [linha])]
+
+
+def _carregar_marriages(banco) -> dict:
+    casamentos = {}
+    for mid, p1, p2, data, aniversarios, luademel, presentes, fase in banco.consultar(
+        "SELECT marriage_id, pessoa1, pessoa2, data_casamento, aniversarios_comemorados, luademel, presentes, fase FROM marriages"
+    ):
+        casamentos[mid] = {
+            "pessoa1": p1,
+            "pessoa2": p2,
+            "data_casamento": data,
+            "aniversarios_comemorados": aniversarios,
+            "luademel": bool(luademel),
+            "presentes": json.loads(presentes),
+        }
+        if fase is not None:
+            casamentos[mid]["fase"] = fase
+    return casamentos
+
+
+def _gravar_marriage(mid: str, d: dict, detalhes) -> list:
+    linha = (
+        mid,
+        str(d["pessoa1"]),
+        str(d["pessoa2"]),
+        d.get("data_casamento"),
+        int(d.get("aniversarios_comemorados", 0)),
+        int(bool(d.get("luademel", True))),
+        json.dumps(d.get("presentes", []), ensure_ascii=False),
+        d.get("fase"),
+    )
+    return [
+        (
+            "INSERT OR REPLACE INTO marriages (marriage_id, pessoa1, pessoa2, data_casamento, aniversarios_comemorados, luademel, presentes, fase) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [linha],
+        )
+    ]
+
+
+def _carregar_inventory(banco) -> dict:
+    inventario = {}
+    for uid, presente, de, data in banco.consultar("SELECT user_id, presente, de, data FROM inventory_items ORDER BY user_id, posicao"):
+        inventario.setdefault(uid, []).append({"presente": presente, "de": de, "data": data})
+    return inventario
+
+
+def _gravar_inventory(uid: str, itens: list, detalhes) -> list:
+    posicoes = sorted(p for p in detalhes if p < len(itens)) if detalhes else range(len(itens))
+    linhas = [(uid, p, itens[p].get("presente"), itens[p].get("de"), itens[p].get("data")) for p in posicoes]
+    operacoes = [("INSERT OR REPLACE INTO inventory_items (user_id, posicao, presente, de, data) VALUES (?, ?, ?, ?, ?)", linhas)]
+    if detalhes is None:
+        operacoes.append(("DELETE FROM inventory_items WHERE user_id = ? AND posicao >= ?", [(uid, len(itens))]))
+    return operacoes
+
+
+_COLUNAS_CALL = ("titulo", "data_hora", "local", "descricao", "criador_id", "criador_nome", "channel_id", "message_id", "emoji", "expira_em", "criado_em", "horas_duracao", "guild_id")
+
+
+def _carregar_calls(banco) -> dict:
+    return {
+        linha[0]: dict(zip(_COLUNAS_CALL, linha[1:]))
+        for linha in banco.consultar(f"SELECT call_id, {', '.join(_COLUNAS_CALL)} FROM calls")
+    }
+
+
+def _gravar_call(call_id: str, d: dict, detalhes) -> list:
+    colunas = ", ".join(_COLUNAS_CALL)
+    marcadores = ", ".join("?" for _ in range(len(_COLUNAS_CALL) + 1))
+    return [(f"INSERT OR REPLACE INTO calls (call_id, {colunas}) VALUES ({marcadores})", [(call_id, *(d.get(c) for c in _COLUNAS_CALL))])]
+
+
+def _carregar_call_participants(banco) -> dict:
+    """call_id -> {user_id: entrou_em} na ordem de confirmação (dict como conjunto ordenado)."""
+    participantes = {}
+    for call_id, uid, entrou_em in banco.consultar("SELECT call_id, user_id, entrou_em FROM call_participants ORDER BY rowid"):
+        participantes.setdefault(call_id, {})[uid] = entrou_em
+    for call_id, in banco.consultar("SELECT call_id FROM calls"):
+        participantes.setdefault(call_id, {})
+    return participantes
+
+
+def _gravar_call_participants(call_id: str, entradas, detalhes) -> list:
+    if not isinstance(entradas, dict):  # lista dos JSONs/blobs legados
+        entradas = dict.fromkeys(entradas)
+    uids = detalhes if detalhes else entradas
+    return [
+        (
+            "INSERT OR IGNORE INTO call_participants (call_id, user_id, entrou_em) VALUES (?, ?, ?)",
+            [(call_id, uid, entradas.get(uid)) for uid in uids],
+        )
+    ]
+
+
+def _carregar_polls(banco) -> dict:
+    enquetes = {}
+    for poll_id, pergunta, opcoes, criador_id, criador_nome, channel_id, message_id, criado_em, expira_em, guild_id in banco.consultar(
+        "SELECT poll_id, pergunta, opcoes, criador_id, criador_nome, channel_id, message_id, criado_em, expira_em, guild_id FROM polls"
+    ):
+        opcoes = json.loads(opcoes)
+        enquetes[poll_id] = {
+            "pergunta": pergunta,
+            "opcoes": opcoes,
+            "votos": [0] * len(opcoes),
+            "votos_usuario": [],
+            "criador_id": criador_id,
+            "criador_nome": criador_nome,
+            "channel_id": channel_id,
+            "message_id": message_id,
+            "criado_em": criado_em,
+            "expira_em": expira_em,
+            "guild_id": guild_id,
+        }
+    for poll_id, uid, opcao in banco.consultar("SELECT poll_id, user_id, opcao FROM poll_votes"):
+        enquete = enquetes.get(poll_id)
+        if enquete and 0 <= opcao < len(enquete["votos"]):
+            enquete["votos_usuario"].append((uid, opcao))
+            enquete["votos"][opcao] += 1
+    for enquete in enquetes.values():
+        enquete["votos_usuario"] = VotosCompactos(enquete["votos_usuario"])  # ordena uma vez só
+    return enquetes
+
+
+def _gravar_poll(poll_id: str, d: dict, detalhes) -> list:
+    """detalhes: "enquete" (só a linha da enquete) e/ou ("voto", user_id) por voto alterado."""
+    operacoes = []
+    if detalhes is None or "enquete" in detalhes:
+        linha = (
+            poll_id,
+            d.get("pergunta"),
+            json.dumps(d.get("opcoes", []), ensure_ascii=False),
+            d.get("criador_id"),
+            d.get("criador_nome"),
+            d.get("channel_id"),
+            d.get("message_id"),
+            d.get("criado_em"),
+            d.get("expira_em"),
+            d.get("guild_id"),
+        )
+        operacoes.append(
+            (
+                "INSERT OR REPLACE INTO polls (poll_id, pergunta, opcoes, criador_id, criador_nome, channel_id, message_id, criado_em, expira_em, guild_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [linha],
+            )
+        )
+    votos = d.get("votos_usuario", {})
+    uids = votos.keys() if detalhes is None else [det[1] for det in detalhes if isinstance(det, tuple) and det[0] == "voto"]
+    linhas = [(poll_id, uid, votos[uid]) for uid in uids if uid in votos]
+    if linhas:
+        operacoes.append(("INSERT OR REPLACE INTO poll_votes (poll_id, user_id, opcao) VALUES (?, ?, ?)", linhas))
+    return operacoes
+
+
+def _carregar_pascoa_points(banco) -> dict:
+    return dict(banco.consultar("SELECT user_id, pontos FROM pascoa_points"))
+
+
+def _gravar_pascoa_points(uid: str, pontos: int, detalhes) -> list:
+    return [("INSERT OR REPLACE INTO pascoa_points (user_id, pontos) VALUES (?, ?)", [(uid, pontos)])]
+
+
+_CAMPOS_FICHA = ("nome", "idade", "personalidade", "historia")
+
+
+def _carregar_rp_sheets(banco) -> dict:
+    return {
+        linha[0]: {k: v for k, v in zip(_CAMPOS_FICHA, linha[1:]) if v is not None}
+        for linha in banco.consultar("SELECT user_id, nome, idade, personalidade, historia FROM rp_sheets")
+    }
+
+
+def _gravar_rp_sheet(uid: str, ficha: dict, detalhes) -> list:
+    return [("INSERT OR REPLACE INTO rp_sheets (user_id, nome, idade, personalidade, historia) VALUES (?, ?, ?, ?, ?)", [(uid, *(ficha.get(k) for k in _CAMPOS_FICHA))])]
+
+
+DOMINIOS_TABELA = (
+    ("ships", "ship_data", _carregar_ships, _gravar_ship, (("ships", "ship_id"),)),
+    ("marriages", "marriage_data", _carregar_marriages, _gravar_marriage, (("marriages", "marriage_id"),)),
+    ("inventory", "user_inventory", _carregar_inventory, _gravar_inventory, (("inventory_items", "user_id"),)),
+    ("calls", "call_data", _carregar_calls, _gravar_call, (("calls", "call_id"),)),
+    ("call_participants", "call_participants", _carregar_call_participants, _gravar_call_participants, (("call_participants", "call_id"),)),
+    ("enquetes", "enquetes", _carregar_polls, _gravar_poll, (("poll_votes", "poll_id"), ("polls", "poll_id"))),
+    ("pascoa_pontos", "pascoa_pontos", _carregar_pascoa_points, _gravar_pascoa_points, (("pascoa_points", "user_id"),)),
+    ("rp_fichas", "rp_fichas", _carregar_rp_sheets, _gravar_rp_sheet, (("rp_sheets", "user_id"),)),
+)
+
+
+MIGRACAO_LOTE = 500
+
+
+class LeitorJSONIncremental:
+    """
+    Percorre um objeto JSON lendo o texto em pedaços (ler(n) -> str, "" no fim).
+    Só um valor por vez fica na memória, então blobs/arquivos legados grandes não são carregados inteiros.
+    """
+
+    def __init__(self, ler, tamanho: int = 64 * 1024):
+        self._ler = ler
+        self._tamanho = tamanho
+        self._decodificador = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._fim = False
+
+    def _mais(self) -> bool:
+        if self._fim:
+            return False
+        pedaco = self._ler(self._tamanho)
+        if not pedaco:
+            self._fim = True
+            return False
+        self._buffer = self._buffer[self._pos :] + pedaco
+        self._pos = 0
+        return True
+
+    def _espiar(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._mais():
+                return ""
+
+    def _consumir(self, esperado: str):
+        if self._espiar() != esperado:
+            raise ValueError(f"JSON inválido: esperado {esperado!r} na posição {self._pos}")
+        self._pos += 1
+
+    def _valor(self):
+        self._espiar()
+        while True:
+            try:
+                valor, fim = self._decodificador.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._mais():
+                    raise
+                continue
+            # um número no fim do buffer pode ter sido cortado no meio
+            if fim == len(self._buffer) and self._mais():
+                continue
+            self._pos = fim
+            return valor
+
+    def itens(self, profundidade: int = 1, _caminho: tuple = ()):
+        """Gera (caminho, valor); com profundidade=2 desce um nível (ex.: calls.json -> ("calls", call_id))."""
+        self._consumir("{")
+        if self._espiar() == "}":
+            self._pos += 1
+            return
+        while True:
+            chave = self._valor()
+            self._consumir(":")
+            if profundidade > 1 and self._espiar() == "{":
+                yield from self.itens(profundidade - 1, _caminho + (chave,))
+            else:
+                yield _caminho + (chave,), self._valor()
+            separador = self._espiar()
+            self._pos += 1
+            if separador == "}":
+                return
+            if separador != ",":
+                raise ValueError(f"JSON inválido: separador {separador!r}")
+
+
+def _leitor_blob(banco, tipo: str):
+    """Lê dados_json.dados em pedaços direto das páginas do SQLite (sem materializar o texto todo)."""
+    linha = banco.consultar("SELECT rowid FROM dados_json WHERE tipo = ?", (tipo,))
+    if not linha:
+        return None
+    rowid = linha[0][0]
+    if hasattr(banco.conn, "blobopen"):
+        blob = banco.conn.blobopen("dados_json", "dados", rowid, readonly=True)
+        decodificador = codecs.getincrementaldecoder("utf-8")()
+
+        def ler(n):
+            pedaco = blob.read(n)
+            texto = decodificador.decode(pedaco, final=not pedaco)
+            if not pedaco:
+                blob.close()
+            return texto
+
+        return ler
+    posicao = 1
+
+    def ler_substr(n):
+        nonlocal posicao
+        pedaco = banco.consultar("SELECT substr(dados, ?, ?) FROM dados_json WHERE rowid = ?", (posicao, n, rowid))[0][0] or ""
+        posicao += n
+        return pedaco
+
+    return ler_substr
+
+
+def _backfill(banco, itens, gravar) -> int:
+    """Grava (chave, valor) em transações de MIGRACAO_LOTE chaves por vez."""
+    total = 0
+    lote = []
+    for chave, valor in itens:
+        lote += gravar(chave, valor, None)
+        total += 1
+        if total % MIGRACAO_LOTE == 0:
+            banco.executar_lote(lote)
+            lote = []
+    if lote:
+        banco.executar_lote(lote)
+    return total
+
+
+def _migracao_tabelas_base(banco):
+    banco.executar("""CREATE TABLE IF NOT EXISTS economia (user_id TEXT PRIMARY KEY, saldo INTEGER)""")
+    banco.executar("""CREATE TABLE IF NOT EXISTS daily_cooldowns (user_id TEXT PRIMARY KEY, data TEXT)""")
+    banco.executar("""CREATE TABLE IF NOT EXISTS divorce_cooldowns (user_id TEXT PRIMARY KEY, data TEXT)""")
+    banco.executar("""CREATE TABLE IF NOT EXISTS dados_json (tipo TEXT PRIMARY KEY, dados TEXT)""")
+
+
+def _migracao_tabelas_normalizadas(banco):
+    for sql in ESQUEMA_NORMALIZADO:
+        banco.executar(sql)
+
+
+def _migracao_backfill_dados_json(banco):
+    for tipo, _, _, gravar, _ in DOMINIOS_TABELA:
+        ler = _leitor_blob(banco, tipo)
+        if ler is None:
+            continue
+        itens = ((caminho[0], valor) for caminho, valor in LeitorJSONIncremental(ler).itens())
+        total = _backfill(banco, itens, gravar)
+        banco.executar("DELETE FROM dados_json WHERE tipo = ?", (tipo,))
+        print(f"   ↳ dados_json[{tipo}] → {total} registro(s)")
+
+
+ARQUIVOS_JSON_LEGADOS = {
+    "inventory.json": _gravar_inventory,
+    "ships.json": _gravar_ship,
+    "marriages.json": _gravar_marriage,
+    "enquetes.json": _gravar_poll,
+}
+
+
+def _importar_arquivo(banco, arquivo: str, operacoes):
+    """Linhas de um arquivo + a marca em importacoes_legado numa transação só (streaming, sem montar lista)."""
+    with banco.trava, banco.conn:
+        for sql, parametros in operacoes:
+            banco.conn.executemany(sql, parametros)
+        banco.conn.execute("INSERT INTO importacoes_legado VALUES (?, ?)", (arquivo, time.time()))
+
+
+def _migracao_importar_json_legado(banco):
+    """
+    Importação única dos .json da versão antiga, arquivo por arquivo: cada um entra com sua marca na
+    mesma transação, então se o bot cair no meio a próxima execução só importa os que faltaram.
+    """
+
+    def gravar_saldo(uid, saldo, detalhes):
+        return [("INSERT OR REPLACE INTO economia VALUES (?, ?)", [(uid, saldo)])]
+
+    def gravar_call_json(caminho, valor, detalhes):
+        secao, call_id = caminho
+        if secao == "calls":
+            return _gravar_call(call_id, valor, None)
+        if secao == "participants":
+            return _gravar_call_participants(call_id, valor, None)
+        return []
+
+    arquivos = (("economy.json", gravar_saldo), *ARQUIVOS_JSON_LEGADOS.items(), ("calls.json", gravar_call_json))
+    blobs = ("anniversary.json", "ship_history.json")
+    if not banco.consultar("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'importacoes_legado'"):
+        # Banco da versão antiga (economia já preenchida, sem marcas): ele já importou tudo, só registra isso.
+        legado = bool(banco.consultar("SELECT 1 FROM economia LIMIT 1"))
+        with banco.trava, banco.conn:
+            banco.conn.execute("BEGIN")
+            banco.conn.execute("CREATE TABLE importacoes_legado (arquivo TEXT PRIMARY KEY, importado_em REAL NOT NULL)")
+            if legado:
+                agora = time.time()
+                banco.conn.executemany(
+                    "INSERT INTO importacoes_legado VALUES (?, ?)", [(arquivo, agora) for arquivo in (*dict(arquivos), *blobs)]
+                )
+    feitos = {arquivo for arquivo, in banco.consultar("SELECT arquivo FROM importacoes_legado")}
+
+    importados = []
+    for arquivo, gravar in arquivos:
+        if arquivo in feitos or not os.path.exists(arquivo):
+            continue
+        with open(arquivo, "r", encoding="utf-8") as f:
+            leitor = LeitorJSONIncremental(f.read)
+            if arquivo == "calls.json":
+                itens = leitor.itens(profundidade=2)
+            else:
+                itens = ((caminho[0], valor) for caminho, valor in leitor.itens())
+            _importar_arquivo(banco, arquivo, (op for chave, valor in itens for op in gravar(chave, valor, None)))
+        importados.append(arquivo)
+    for arquivo in blobs:
+        if arquivo in feitos or not os.path.exists(arquivo):
+            continue
+        with open(arquivo, "r", encoding="utf-8") as f:
+            _importar_arquivo(banco, arquivo, [("INSERT OR REPLACE INTO dados_json VALUES (?, ?)", [(arquivo[: -len(".json")], f.read())])])
+        importados.append(arquivo)
+    if importados:
+        print(f"✅ Dados importados dos JSONs! ({', '.join(importados)})")
+
+
+MOEDA_MOEDAS = "moedas"
+MOEDA_PASCOA = "pascoa"
+
+# Cada moeda tem seu snapshot (economia / pascoa_points) e o id do último evento do ledger já aplicado nele.
+SNAPSHOTS_LEDGER = {
+    MOEDA_MOEDAS: ("user_balances", "economia", "saldo"),
+    MOEDA_PASCOA: ("pascoa_pontos", "pascoa_points", "pontos"),
+}
+
+LEDGER_CHECKPOINT_INTERVALO = float(os.environ.get("FORT_LEDGER_CHECKPOINT", "300"))
+
+SQL_LEDGER = "INSERT INTO ledger (id, user_id, moeda, delta, motivo, contraparte, transferencia, criado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def _migracao_ledger(banco):
+    banco.executar(
+        """CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY, user_id TEXT NOT NULL, moeda TEXT NOT NULL, delta INTEGER NOT NULL,
+            motivo TEXT, contraparte TEXT, criado_em REAL NOT NULL)"""
+    )
+    banco.executar("CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger (user_id, moeda)")
+    banco.executar("""CREATE TABLE IF NOT EXISTS ledger_checkpoint (moeda TEXT PRIMARY KEY, ultimo_id INTEGER NOT NULL, criado_em REAL)""")
+    # Os saldos que já estão no banco viram o snapshot inicial (nenhum evento aplicado ainda).
+    for moeda in SNAPSHOTS_LEDGER:
+        banco.executar("INSERT OR IGNORE INTO ledger_checkpoint VALUES (?, 0, ?)", (moeda, time.time()))
+
+
+def _migracao_ledger_transferencias(banco):
+    # Transferência vira uma linha só: delta sai de user_id e entra em contraparte.
+    colunas = {nome for _, nome, *_ in banco.consultar("PRAGMA table_info(ledger)")}
+    if "transferencia" not in colunas:
+        banco.executar("ALTER TABLE ledger ADD COLUMN transferencia INTEGER NOT NULL DEFAULT 0")
+
+
+def _migracao_particoes_guild(banco):
+    banco.executar("""CREATE TABLE IF NOT EXISTS guild_particoes (guild_id TEXT PRIMARY KEY, semeada_em REAL)""")
+    banco.executar(
+        """CREATE TABLE IF NOT EXISTS guild_pascoa_points (
+            guild_id TEXT NOT NULL, user_id TEXT NOT NULL, pontos INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)) WITHOUT ROWID"""
+    )
+    banco.executar(
+        """CREATE TABLE IF NOT EXISTS guild_economia (
+            guild_id TEXT NOT NULL, user_id TEXT NOT NULL, fluxo INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)) WITHOUT ROWID"""
+    )
+
+
+def _migracao_cooldowns(banco):
+    banco.executar(
+        """CREATE TABLE IF NOT EXISTS cooldowns (
+            user_id TEXT NOT NULL, acao TEXT NOT NULL, canal TEXT NOT NULL DEFAULT '', prazo REAL NOT NULL,
+            PRIMARY KEY (user_id, acao, canal)) WITHOUT ROWID"""
+    )
+    banco.executar("CREATE INDEX IF NOT EXISTS idx_cooldowns_prazo ON cooldowns (prazo)")
+    if banco.consultar("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'divorce_cooldowns'"):
+        linhas = []
+        for user_id, data in banco.consultar("SELECT user_id, data FROM divorce_cooldowns WHERE data IS NOT NULL"):
+            inicio = datetime.fromisoformat(data).replace(tzinfo=BR_TZ)
+            linhas.append((user_id, "divorciar", "", inicio.timestamp() + COOLDOWNS["divorciar"]))
+        banco.executar_lote([("INSERT OR REPLACE INTO cooldowns VALUES (?, ?, ?, ?)", linhas)] if linhas else [])
+        banco.executar("DROP TABLE divorce_cooldowns")
+
+
+def _migracao_daily_cooldowns(banco):
+    """O último /daily (ISO) vira prazos no motor: "daily" até a meia-noite, "daily_streak" até a seguinte."""
+    linhas, agora = [], time.time()
+    for user_id, data in banco.consultar("SELECT user_id, data FROM daily_cooldowns WHERE user_id NOT LIKE '%\\_streak' ESCAPE '\\'"):
+        try:
+            ultimo = datetime.fromisoformat(data)
+        except (TypeError, ValueError):
+            continue
+        prazo = proxima_meia_noite(ultimo if ultimo.tzinfo else ultimo.replace(tzinfo=BR_TZ))
+        linhas += [(user_id, acao, "", p) for acao, p in (("daily", prazo), ("daily_streak", prazo + 86400)) if p > agora]
+    banco.executar_lote([("INSERT OR REPLACE INTO cooldowns VALUES (?, ?, ?, ?)", linhas)] if linhas else [])
+    banco.executar("DELETE FROM daily_cooldowns WHERE user_id NOT LIKE '%\\_streak' ESCAPE '\\'")
+
+
+def _migracao_guild_registros(banco):
+    for tabela in ("calls", "polls"):
+        colunas = {nome for _, nome, *_ in banco.consultar(f"PRAGMA table_info({tabela})")}
+        if "guild_id" not in colunas:
+            banco.executar(f"ALTER TABLE {tabela} ADD COLUMN guild_id TEXT")
+        banco.executar(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_guild ON {tabela} (guild_id)")
+        banco.executar(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_criador ON {tabela} (criador_id)")
+
+
+def _migracao_entrada_participantes(banco):
+    colunas = {nome for _, nome, *_ in banco.consultar("PRAGMA table_info(call_participants)")}
+    if "entrou_em" not in colunas:
+        banco.executar("ALTER TABLE call_participants ADD COLUMN entrou_em REAL")
+
+
+def _migracao_presencas(banco):
+    banco.executar(
+        """CREATE TABLE IF NOT EXISTS chamadas_arquivo (
+            call_id TEXT PRIMARY KEY, guild_id TEXT NOT NULL, channel_id TEXT, titulo TEXT, data_hora TEXT,
+            criador_id TEXT, criado_em TEXT, encerrada_em REAL NOT NULL, presentes INTEGER NOT NULL, ausentes INTEGER NOT NULL)"""
+    )
+    banco.executar("CREATE INDEX IF NOT EXISTS idx_chamadas_arquivo_guild ON chamadas_arquivo (guild_id, encerrada_em)")
+    banco.executar(
+        """CREATE TABLE IF NOT EXISTS presencas (
+            call_id TEXT NOT NULL, user_id TEXT NOT NULL, entrou_em REAL,
+            PRIMARY KEY (call_id, user_id)) WITHOUT ROWID"""
+    )
+    banco.executar("CREATE INDEX IF NOT EXISTS idx_presencas_user ON presencas (user_id, call_id)")
+    banco.executar(
+        """CREATE TABLE IF NOT EXISTS tracinhos (
+            guild_id TEXT NOT NULL, user_id TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0, ultima_ausencia REAL,
+            PRIMARY KEY (guild_id, user_id)) WITHOUT ROWID"""
+    )
+    banco.executar("CREATE INDEX IF NOT EXISTS idx_tracinhos_total ON tracinhos (guild_id, total DESC)")
+
+
+def _migracao_dm_optout(banco):
+    banco.executar("""CREATE TABLE IF NOT EXISTS dm_optout (user_id TEXT PRIMARY KEY, desde REAL NOT NULL)""")
+
+
+def _migracao_segredos(banco):
+    banco.executar("""CREATE TABLE IF NOT EXISTS segredos (nome TEXT PRIMARY KEY, valor BLOB NOT NULL)""")
+    banco.executar("INSERT OR IGNORE INTO segredos VALUES ('jogos', ?)", (secrets.token_bytes(32),))
+
+
+# Ordem importa e cada passo precisa ser idempotente: pode rodar de novo se o bot cair no meio.
+MIGRACOES = (
+    (1, "tabelas base (economia, cooldowns, dados_json)", _migracao_tabelas_base),
+    (2, "tabelas normalizadas", _migracao_tabelas_normalizadas),
+    (3, "backfill dados_json → tabelas normalizadas", _migracao_backfill_dados_json),
+    (4, "importação dos JSONs legados", _migracao_importar_json_legado),
+    (5, "ledger da economia + checkpoints", _migracao_ledger),
+    (6, "ledger: transferências em uma linha", _migracao_ledger_transferencias),
+    (7, "partições por servidor (pontos e fluxo de moedas)", _migracao_particoes_guild),
+    (8, "motor de cooldowns (absorve divorce_cooldowns)", _migracao_cooldowns),
+    (9, "guild_id em chamadas e enquetes", _migracao_guild_registros),
+    (10, "horário de confirmação dos participantes", _migracao_entrada_participantes),
+    (11, "arquivo de presenças + tracinhos", _migracao_presencas),
+    (12, "opt-out de DMs", _migracao_dm_optout),
+    (13, "daily no motor de cooldowns (daily_cooldowns fica só com o streak)", _migracao_daily_cooldowns),
+    (14, "segredo aleatório dos minigames", _migracao_segredos),
+)
+
+
+def aplicar_migracoes(banco) -> int:
+    banco.executar("""CREATE TABLE IF NOT EXISTS schema_version (versao INTEGER PRIMARY KEY, descricao TEXT, aplicada_em TEXT)""")
+    aplicadas = {versao for versao, in banco.consultar("SELECT versao FROM schema_version")}
+    for versao, descricao, migrar in MIGRACOES:
+        if versao in aplicadas:
+            continue
+        print(f"🛠️ Migração {versao}: {descricao}")
+        with banco.trava:
+            migrar(banco)
+            banco.executar(
+                "INSERT OR REPLACE INTO schema_version VALUES (?, ?, ?)",
+                (versao, descricao, datetime.now(BR_TZ).isoformat()),
+            )
+    return max((versao for versao, _, _ in MIGRACOES), default=0)
+
+
+PERSISTENCIA_INTERVALO = float(os.environ.get("FORT_FLUSH_INTERVALO", "0.5"))
+PERSISTENCIA_LOTE_MAX = int(os.environ.get("FORT_FLUSH_LOTE_MAX", "500"))
+# Lotes que falham mesmo sozinhos numa transação vão pra cá (uma linha JSON por lote) em vez de sumirem.
+PERSISTENCIA_QUARENTENA = os.environ.get("FORT_QUARENTENA", "fort_quarentena.jsonl")
+
+
+class EscritorPersistencia:
+    """
+    Write-behind: os handlers enfileiram lotes de (sql, [params...]) e uma thread dedicada
+    grava tudo em commits agrupados, fora do event loop.
+    """
+
+    _PARAR = object()
+
+    def __init__(self, banco: BancoSQLite, intervalo: float = PERSISTENCIA_INTERVALO, lote_max: int = PERSISTENCIA_LOTE_MAX):
+        self.banco = banco
+        self.intervalo = intervalo
+        self.lote_max = lote_max
+        self.fila = queue.Queue()
+        self._thread = threading.Thread(target=self._executar, name="fort-escritor", daemon=True)
+        self.lotes_gravados = 0
+        self.operacoes_gravadas = 0
+        self.erros = 0
+        self.quarentena = 0
+        self.enviados = 0
+        self.processados = 0
+        self.ultima_latencia = 0.0
+        self.maior_latencia = 0.0
+        self.ultima_duracao_commit = 0.0
+
+    def iniciar(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+            atexit.register(self.parar)
+
+    def enviar(self, operacoes: list):
+        if operacoes:
+            self.enviados += 1
+            self.fila.put((time.monotonic(), operacoes))
+
+    async def alcancar(self, limite: float = 5.0) -> bool:
+        """
+        Espera (sem bloquear o loop) só os lotes já enviados até agora serem gravados — o que chegar
+        depois não conta, então não fica preso sob carga contínua. False se estourar o limite.
+        """
+        marco = self.enviados
+        prazo = time.monotonic() + limite
+        while self.processados < marco:
+            if time.monotonic() > prazo:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    @property
+    def ocioso(self) -> bool:
+        """Nada enfileirado nem em gravação: tudo que já foi enviado está commitado."""
+        return self.fila.unfinished_tasks == 0
+
+    def parar(self, timeout: float = 30.0):
+        if self._thread.is_alive():
+            self.fila.put(self._PARAR)
+            self._thread.join(timeout)
+
+    @property
+    def profundidade(self) -> int:
+        return self.fila.qsize()
+
+    def metricas(self) -> dict:
+        return {
+            "fila": self.profundidade,
+            "lotes_gravados": self.lotes_gravados,
+            "operacoes_gravadas": self.operacoes_gravadas,
+            "erros": self.erros,
+            "quarentena": self.quarentena,
+            "ultima_latencia_ms": round(self.ultima_latencia * 1000, 1),
+            "maior_latencia_ms": round(self.maior_latencia * 1000, 1),
+            "ultimo_commit_ms": round(self.ultima_duracao_commit * 1000, 1),
+        }
+
+    def _executar(self):
+        parar = False
+        while not parar:
+            item = self.fila.get()
+            if item is self._PARAR:
+                self.fila.task_done()
+                break
+            grupo = [item]
+            total = len(item[1])
+            limite = time.monotonic() + self.intervalo
+            while total < self.lote_max:
+                restante = limite - time.monotonic()
+                try:
+                    proximo = self.fila.get(timeout=restante) if restante > 0 else self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is self._PARAR:
+                    self.fila.task_done()
+                    parar = True
+                    break
+                grupo.append(proximo)
+                total += len(proximo[1])
+            self._gravar(grupo, total)
+            self.processados += len(grupo)
+            for _ in grupo:
+                self.fila.task_done()
+
+    def _gravar(self, grupo: list, total: int):
+        inicio = time.monotonic()
+        try:
+            self.banco.executar_lote([op for _, operacoes in grupo for op in operacoes])
+        except Exception as e:
+            # O commit agrupado voltou atrás inteiro; regrava lote a lote para só o culpado ficar de fora.
+            self.erros += 1
+            print(f"⚠️ Commit agrupado falhou ({e}); regravando {len(grupo)} lote(s) separadamente")
+            for _, operacoes in grupo:
+                try:
+                    self.banco.executar_lote(operacoes)
+                except Exception as e:
+                    self._quarentenar(operacoes, e)
+                    total -= len(operacoes)
+        fim = time.monotonic()
+        self.lotes_gravados += 1
+        self.operacoes_gravadas += total
+        self.ultima_duracao_commit = fim - inicio
+        self.ultima_latencia = fim - grupo[0][0]
+        self.maior_latencia = max(self.maior_latencia, self.ultima_latencia)
+
+    def _quarentenar(self, operacoes: list, erro: Exception):
+        self.quarentena += 1
+        eventos = sum(len(parametros) for sql, parametros in operacoes if sql == SQL_LEDGER)
+        print(f"❌ Lote com {len(operacoes)} operação(ões) ({eventos} evento(s) do ledger) falhou de novo: {erro} — salvo em {PERSISTENCIA_QUARENTENA}")
+        traceback.print_exc()
+        try:
+            with open(PERSISTENCIA_QUARENTENA, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"em": time.time(), "erro": str(erro), "operacoes": operacoes}, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"❌ Não consegui gravar a quarentena: {e}")
+
+
+class RankingPascoa:
+    """
+    Índice do ranking de Páscoa: Fenwick tree que conta usuários por pontuação + usuários agrupados
+    por pontuação. Posição e k-ésimo colocado saem em O(log n) sem ordenar o dict inteiro.
+    """
+
+    def __init__(self, pontos: dict = None):
+        self.arvore = [0] * 1025
+        self.pontos = {}
+        self.por_pontos = {}
+        self.total = 0
+        for uid, p in (pontos or {}).items():
+            self.atualizar(uid, p)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def _somar(self, i: int, delta: int):
+        while i < len(self.arvore):
+            self.arvore[i] += delta
+            i += i & -i
+
+    def _prefixo(self, i: int) -> int:
+        """Quantos usuários têm pontuação <= i."""
+        i = min(i, len(self.arvore) - 1)
+        soma = 0
+        while i > 0:
+            soma += self.arvore[i]
+            i -= i & -i
+        return soma
+
+    def _kesimo(self, k: int) -> int:
+        """Menor pontuação p tal que _prefixo(p) >= k."""
+        pos, passo = 0, 1 << (len(self.arvore) - 1).bit_length()
+        while passo:
+            if pos + passo < len(self.arvore) and self.arvore[pos + passo] < k:
+                pos += passo
+                k -= self.arvore[pos]
+            passo >>= 1
+        return pos + 1
+
+    def _crescer(self, pontos: int):
+        tamanho = len(self.arvore) - 1
+        while tamanho < pontos:
+            tamanho *= 2
+        self.arvore = [0] * (tamanho + 1)
+        for p, uids in self.por_pontos.items():
+            self._somar(p, len(uids))
+
+    def atualizar(self, uid: str, pontos: int):
+        antigo = self.pontos.pop(uid, 0)
+        if antigo > 0:
+            grupo = self.por_pontos[antigo]
+            del grupo[uid]
+            if not grupo:
+                del self.por_pontos[antigo]
+            self._somar(antigo, -1)
+            self.total -= 1
+        if pontos > 0:
+            if pontos >= len(self.arvore):
+                self._crescer(pontos)
+            self.pontos[uid] = pontos
+            self.por_pontos.setdefault(pontos, {})[uid] = None
+            self._somar(pontos, 1)
+            self.total += 1
+
+    def posicao(self, uid: str) -> Optional[int]:
+        """1 + quantos têm mais pontos (empates dividem a posição)."""
+        pontos = self.pontos.get(uid)
+        if pontos is None:
+            return None
+        return self.total - self._prefixo(pontos) + 1
+
+    def maiores(self):
+        """Gera (uid, pontos) do maior para o menor, uma faixa de pontuação por vez."""
+        restantes = self.total
+        while restantes > 0:
+            pontos = self._kesimo(restantes)
+            uids = list(self.por_pontos.get(pontos, ()))
+            for uid in uids:
+                yield uid, pontos
+            restantes -= len(uids)
+
+    def top(self, k: int) -> list:
+        return list(itertools.islice(self.maiores(), k))
+
+
+PARTICOES_MAX = int(os.environ.get("FORT_PARTICOES_MAX", "64"))
+
+
+class ParticaoGuild:
+    """Pontos de Páscoa e fluxo de moedas de um servidor. A carteira em si continua global."""
+
+    def __init__(self, guild_id: str, pontos=(), fluxo=()):
+        self.guild_id = guild_id
+        self.pontos = DadosRastreados(pontos)
+        self.fluxo = DadosRastreados(fluxo)
+        self.ranking = RankingPascoa(self.pontos)
+
+    def registrar(self, uid: str, moeda: str, delta: int):
+        if moeda == MOEDA_PASCOA:
+            self.pontos[uid] = self.pontos.get(uid, 0) + delta
+            self.ranking.atualizar(uid, self.pontos[uid])
+        else:
+            self.fluxo[uid] = self.fluxo.get(uid, 0) + delta
+
+    def operacoes(self) -> list:
+        operacoes = []
+        for tabela, coluna, dados in (("guild_pascoa_points", "pontos", self.pontos), ("guild_economia", "fluxo", self.fluxo)):
+            if dados.sujo:
+                alterados, _, _ = dados.coletar()
+                operacoes.append((
+                    f"INSERT OR REPLACE INTO {tabela} (guild_id, user_id, {coluna}) VALUES (?, ?, ?)",
+                    [(self.guild_id, uid, valor) for uid, valor in alterados.items()],
+                ))
+        return operacoes
+
+
+class ParticoesGuild:
+    """Carrega a partição de cada servidor sob demanda e descarta as menos usadas (LRU)."""
+
+    def __init__(self, bot, maximo: int = PARTICOES_MAX):
+        self.bot = bot
+        self.maximo = maximo
+        self.carregadas = OrderedDict()
+        # guild_id -> (pontos, fluxo) enfileirados ao descarregar e talvez ainda não commitados;
+        # recarregar sobrepõe isso ao que o banco tem, sem esperar o escritor.
+        self.pendentes = {}
+
+    def __contains__(self, guild_id) -> bool:
+        return str(guild_id) in self.carregadas
+
+    def obter(self, guild_id) -> ParticaoGuild:
+        gid = str(guild_id)
+        particao = self.carregadas.get(gid)
+        if particao is not None:
+            self.carregadas.move_to_end(gid)
+            return particao
+        particao = self.carregadas[gid] = self._carregar(gid)
+        while len(self.carregadas) > self.maximo:
+            self.descarregar(next(iter(self.carregadas)))
+        return particao
+
+    def descarregar(self, guild_id):
+        particao = self.carregadas.pop(str(guild_id), None)
+        if particao is not None:
+            pontos, fluxo = self.pendentes.setdefault(particao.guild_id, ({}, {}))
+            pontos.update((uid, particao.pontos[uid]) for uid in particao.pontos.alterados)
+            fluxo.update((uid, particao.fluxo[uid]) for uid in particao.fluxo.alterados)
+            self.bot.escritor.enviar(particao.operacoes())
+
+    def operacoes(self) -> list:
+        return [op for particao in self.carregadas.values() for op in particao.operacoes()]
+
+    def _carregar(self, gid: str) -> ParticaoGuild:
+        banco = self.bot.banco
+        if self.pendentes and self.bot.escritor.ocioso:
+            self.pendentes.clear()
+        pontos = dict(banco.ler("SELECT user_id, pontos FROM guild_pascoa_points WHERE guild_id = ?", (gid,)))
+        fluxo = dict(banco.ler("SELECT user_id, fluxo FROM guild_economia WHERE guild_id = ?", (gid,)))
+        pendente = self.pendentes.get(gid)
+        if pendente:
+            pontos.update(pendente[0])
+            fluxo.update(pendente[1])
+        particao = ParticaoGuild(gid, pontos, fluxo)
+        if not pendente and not banco.ler("SELECT 1 FROM guild_particoes WHERE guild_id = ?", (gid,)):
+            self._semear(particao)
+        return particao
+
+    def _semear(self, particao: ParticaoGuild):
+        """Primeira vez que o servidor aparece: parte dos pontos globais de quem é membro dele."""
+        guild = self.bot.get_guild(int(particao.guild_id))
+        for membro in guild.members if guild else ():
+            pontos = self.bot.pascoa_pontos.get(str(membro.id), 0)
+            if pontos > 0 and not membro.bot:
+                particao.registrar(str(membro.id), MOEDA_PASCOA, pontos)
+        self.bot.escritor.enviar(
+            particao.operacoes() + [("INSERT OR REPLACE INTO guild_particoes VALUES (?, ?)", [(particao.guild_id, time.time())])]
+        )
+
+
+# Duração padrão (segundos) de cada cooldown; daily, daily_streak e pascoa_daily vencem à meia-noite e
+# são ativados com prazo explícito.
+COOLDOWNS = {
+    "pascoa_quiz": 30 * 60,
+    "pascoa_cacaninja": 25 * 60,
+    "pascoa_roleta": 25 * 60,
+    "pascoa_maratona": 20 * 60,
+    "pascoa_boss": 30 * 60,
+    "pascoa_campo": 20 * 60,
+    "pascoa_caca": 60 * 60,
+    "pascoa_ovo": 20 * 60,
+    "divorciar": 7 * 24 * 3600,
+}
+
+
+def proxima_meia_noite(momento: datetime) -> float:
+    dia = momento.astimezone(BR_TZ).date() + timedelta(days=1)
+    return datetime(dia.year, dia.month, dia.day, tzinfo=BR_TZ).timestamp()
+
+
+class MotorCooldowns:
+    """
+    Cooldowns como prazo em epoch (float) por (usuário, ação, canal). Consulta é um get no dict;
+    um heap de prazos descarta o que venceu, e as mudanças vão pro banco em lote via save_data.
+    """
+
+    def __init__(self, prazos=()):
+        self.prazos = {}
+        self.heap = []
+        self.alterados = set()
+        for uid, acao, canal, prazo in prazos:
+            self._definir((uid, acao, canal), prazo)
+        self.alterados.clear()
+
+    def __len__(self) -> int:
+        return len(self.prazos)
+
+    def _definir(self, chave: tuple, prazo: float):
+        self.prazos[chave] = prazo
+        heapq.heappush(self.heap, (prazo, chave))
+        self.alterados.add(chave)
+
+    def restante(self, user_id, acao: str, canal=None) -> float:
+        """Segundos que faltam (0.0 se livre)."""
+        prazo = self.prazos.get((str(user_id), acao, str(canal or "")))
+        return max(0.0, prazo - time.time()) if prazo else 0.0
+
+    def ativar(self, user_id, acao: str, canal=None, segundos: float = None, prazo: float = None):
+        if prazo is None:
+            prazo = time.time() + (COOLDOWNS[acao] if segundos is None else segundos)
+        self._definir((str(user_id), acao, str(canal or "")), prazo)
+
+    def limpar_expirados(self) -> int:
+        agora = time.time()
+        removidos = 0
+        while self.heap and self.heap[0][0] <= agora:
+            prazo, chave = heapq.heappop(self.heap)
+            # Entradas antigas de uma chave reativada ficam no heap; só apaga se o prazo ainda é o vigente.
+            if self.prazos.get(chave) == prazo:
+                del self.prazos[chave]
+                self.alterados.discard(chave)
+                removidos += 1
+        return removidos
+
+    def operacoes(self) -> list:
+        operacoes = []
+        if self.limpar_expirados():
+            operacoes.append(("DELETE FROM cooldowns WHERE prazo <= ?", [(time.time(),)]))
+        if self.alterados:
+            operacoes.append((
+                "INSERT OR REPLACE INTO cooldowns (user_id, acao, canal, prazo) VALUES (?, ?, ?, ?)",
+                [(*chave, self.prazos[chave]) for chave in self.alterados],
+            ))
+            self.alterados = set()
+        return operacoes
+
+
+EDICAO_JANELA = float(os.environ.get("FORT_EDICAO_JANELA", "2.0"))
+
+
+class CoalescedorEdicoes:
+    """
+    No máximo uma edição por mensagem a cada `janela` segundos. A primeira sai na hora; cliques
+    dentro da janela só trocam a edição pendente, que roda no fim da janela com o estado mais novo.
+    """
+
+    def __init__(self, janela: float = EDICAO_JANELA):
+        self.janela = janela
+        self.pendentes = {}
+        self.tarefas = {}
+        self.edicoes = 0
+        self.coalescidas = 0
+
+    def agendar(self, chave, editar):
+        """`editar` é uma função sem argumentos que devolve a corrotina da edição."""
+        if chave in self.pendentes:
+            self.coalescidas += 1
+        self.pendentes[chave] = editar
+        if chave not in self.tarefas:
+            self.tarefas[chave] = asyncio.create_task(self._drenar(chave))
+
+    def cancelar(self, chave):
+        self.pendentes.pop(chave, None)
+
+    async def _drenar(self, chave):
+        try:
+            while True:
+                editar = self.pendentes.pop(chave, None)
+                if editar is None:
+                    break
+                try:
+                    await editar()
+                except Exception as e:
+                    print(f"Erro ao atualizar embed: {e}")
+                self.edicoes += 1
+                await asyncio.sleep(self.janela)
+        finally:
+            self.tarefas.pop(chave, None)
+
+    def metricas(self) -> dict:
+        return {"pendentes": len(self.pendentes), "edicoes": self.edicoes, "coalescidas": self.coalescidas}
+
+
+class AgendadorPrazos:
+    """
+    Prazos (epoch) num heap com uma única task motora, no lugar de uma task dormindo por prazo.
+    Cancelar ou reagendar só troca o registro vigente da chave; o que sobra no heap é ignorado ao sair.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.vigentes = {}
+        self.disparados = 0
+        self._seq = itertools.count()
+        self._acordar = asyncio.Event()
+        self._motor = None
+        self._execucoes = set()
+
+    def __len__(self) -> int:
+        return len(self.vigentes)
+
+    def __contains__(self, chave) -> bool:
+        return chave in self.vigentes
+
+    def iniciar(self):
+        if self._motor is None or self._motor.done():
+            self._motor = asyncio.create_task(self._rodar())
+
+    def agendar(self, chave, prazo: float, callback):
+        """`callback` é uma função sem argumentos que devolve a corrotina a rodar no prazo."""
+        seq = next(self._seq)
+        self.vigentes[chave] = (prazo, seq, callback)
+        heapq.heappush(self.heap, (prazo, seq, chave))
+        if self.heap[0][1] == seq:
+            self._acordar.set()
+
+    def reagendar(self, chave, prazo: float) -> bool:
+        atual = self.vigentes.get(chave)
+        if atual is None:
+            return False
+        self.agendar(chave, prazo, atual[2])
+        return True
+
+    def cancelar(self, chave) -> bool:
+        if self.vigentes.pop(chave, None) is None:
+            return False
+        if len(self.heap) > 2 * len(self.vigentes) + 64:
+            self.heap = [(p, seq, c) for p, seq, c in self.heap if self.vigentes.get(c, (None, None))[1] == seq]
+            heapq.heapify(self.heap)
+        return True
+
+    def metricas(self) -> dict:
+        proximo = min((p for p, _, _ in self.vigentes.values()), default=None)
+        return {
+            "pendentes": len(self.vigentes),
+            "heap": len(self.heap),
+            "disparados": self.disparados,
+            "em_execucao": len(self._execucoes),
+            "proximo_em_s": round(proximo - time.time(), 1) if proximo else None,
+        }
+
+    async def _rodar(self):
+        while True:
+            espera = self.heap[0][0] - time.time() if self.heap else None
+            if espera is None or espera > 0:
+                self._acordar.clear()
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, seq, chave = heapq.heappop(self.heap)
+            atual = self.vigentes.get(chave)
+            if atual is None or atual[1] != seq:
+                continue
+            del self.vigentes[chave]
+            self.disparados += 1
+            tarefa = asyncio.create_task(self._executar(chave, atual[2]))
+            self._execucoes.add(tarefa)
+            tarefa.add_done_callback(self._execucoes.discard)
+
+    async def _executar(self, chave, callback):
+        try:
+            await callback()
+        except Exception as e:
+            print(f"❌ Erro no prazo {chave}: {e}")
+            traceback.print_exc()
+
+
+ENCERRAMENTO_CONCORRENCIA = int(os.environ.get("FORT_ENCERRAMENTO_CONCORRENCIA", "3"))
+ENCERRAMENTO_JITTER = float(os.environ.get("FORT_ENCERRAMENTO_JITTER", "2.0"))
+ENCERRAMENTO_TENTATIVAS = 5
+
+
+def limite_atingido(erro: Exception) -> bool:
+    return isinstance(erro, discord.HTTPException) and erro.status == 429
+
+
+class FilaEncerramentos:
+    """
+    Encerramentos de chamada/enquete (editar a mensagem + avisar no canal) com concorrência limitada
+    e um atraso aleatório antes de cada um, para o pico das 23:59 não virar uma rajada de 429.
+    Um 429 devolve o item à fila por um timer do loop depois do retry_after (ou backoff exponencial),
+    sem ocupar trabalhador. Cada item leva um set de etapas já feitas que sobrevive às retentativas,
+    então o encerramento continua de onde parou em vez de repetir a edição ou o aviso.
+    """
+
+    def __init__(self, concorrencia: int = ENCERRAMENTO_CONCORRENCIA, jitter: float = ENCERRAMENTO_JITTER, tentativas: int = ENCERRAMENTO_TENTATIVAS):
+        self.concorrencia = concorrencia
+        self.jitter = jitter
+        self.tentativas = tentativas
+        self.fila = asyncio.Queue()
+        self.trabalhadores = []
+        self.enfileirados = 0
+        self.concluidos = 0
+        self.falhas = 0
+        self.retentativas = 0
+        self.em_andamento = 0
+        self.aguardando = 0
+        self._rajada = None
+
+    def iniciar(self):
+        if not self.trabalhadores:
+            self.trabalhadores = [asyncio.create_task(self._trabalhar()) for _ in range(self.concorrencia)]
+
+    def enviar(self, chave, executar):
+        """`executar(etapas)` devolve a corrotina do encerramento; `etapas` é o set de etapas já concluídas."""
+        if self._rajada is None:
+            self._rajada = (time.monotonic(), self.concluidos + self.falhas)
+        self.enfileirados += 1
+        self.fila.put_nowait((chave, executar, 1, set()))
+
+    def metricas(self) -> dict:
+        return {
+            "fila": self.fila.qsize(),
+            "em_andamento": self.em_andamento,
+            "aguardando_429": self.aguardando,
+            "enfileirados": self.enfileirados,
+            "concluidos": self.concluidos,
+            "falhas": self.falhas,
+            "retentativas_429": self.retentativas,
+        }
+
+    async def _trabalhar(self):
+        while True:
+            chave, executar, tentativa, etapas = await self.fila.get()
+            terminou = True
+            try:
+                self.em_andamento += 1
+                try:
+                    await asyncio.sleep(random.uniform(0, self.jitter))
+                    await executar(etapas)
+                    self.concluidos += 1
+                finally:
+                    self.em_andamento -= 1
+            except Exception as e:
+                if limite_atingido(e) and tentativa < self.tentativas:
+                    self.retentativas += 1
+                    terminou = False
+                    espera = getattr(e, "retry_after", None) or e.response.headers.get("Retry-After") or 2 ** tentativa
+                    self.aguardando += 1
+                    asyncio.get_running_loop().call_later(
+                        min(float(espera), 60.0) + random.uniform(0, self.jitter), self._recolocar, (chave, executar, tentativa + 1, etapas)
+                    )
+                else:
+                    self.falhas += 1
+                    print(f"❌ Falha ao encerrar {chave}: {e}")
+            finally:
+                self.fila.task_done()
+                if terminou:
+                    self._progresso()
+
+    def _recolocar(self, item):
+        self.aguardando -= 1
+        self.fila.put_nowait(item)
+
+    def _progresso(self):
+        if self._rajada is None:
+            return
+        inicio, base = self._rajada
+        feitos = self.concluidos + self.falhas - base
+        if self.fila.empty() and self.em_andamento == 0 and self.aguardando == 0:
+            self._rajada = None
+            if feitos >= 10:
+                print(f"✅ {feitos} encerramento(s) em {time.monotonic() - inicio:.1f}s ({self.falhas} falha(s) no total, {self.retentativas} retentativa(s) por 429)")
+        elif feitos and feitos % 25 == 0:
+            print(f"⏳ Encerramentos: {feitos} feitos, {self.fila.qsize()} na fila")
+
+
+DM_CONCORRENCIA = int(os.environ.get("FORT_DM_CONCORRENCIA", "2"))
+DM_FILA_MAX = int(os.environ.get("FORT_DM_FILA_MAX", "2000"))
+DM_TENTATIVAS = 4
+
+
+class FilaDMs:
+    """
+    Entrega de DMs em segundo plano: poucos trabalhadores, retentativa com backoff em 429/5xx e
+    opt-out por usuário. Quem clica no botão não espera o DM; fila cheia descarta em vez de acumular.
+    """
+
+    def __init__(self, concorrencia: int = DM_CONCORRENCIA, maximo: int = DM_FILA_MAX, tentativas: int = DM_TENTATIVAS):
+        self.concorrencia = concorrencia
+        self.tentativas = tentativas
+        self.fila = asyncio.Queue(maxsize=maximo)
+        self.trabalhadores = []
+        self.recolocando = set()
+        self.optout = set()
+        self.enfileiradas = 0
+        self.entregues = 0
+        self.falhas = 0
+        self.retentativas = 0
+        self.descartadas = 0
+        self.ignoradas = 0
+
+    def iniciar(self):
+        if not self.trabalhadores:
+            self.trabalhadores = [asyncio.create_task(self._trabalhar()) for _ in range(self.concorrencia)]
+
+    def enviar(self, destinatario, **conteudo) -> bool:
+        """destinatario: User/Member (tem .send); conteudo: kwargs do send. False se não entrou na fila."""
+        if str(destinatario.id) in self.optout:
+            self.ignoradas += 1
+            return False
+        try:
+            self.fila.put_nowait((destinatario, conteudo, 1))
+        except asyncio.QueueFull:
+            self.descartadas += 1
+            return False
+        self.enfileiradas += 1
+        return True
+
+    def metricas(self) -> dict:
+        return {
+            "fila": self.fila.qsize(),
+            "aguardando_retentativa": len(self.recolocando),
+            "enfileiradas": self.enfileiradas,
+            "entregues": self.entregues,
+            "falhas": self.falhas,
+            "retentativas": self.retentativas,
+            "descartadas": self.descartadas,
+            "ignoradas_optout": self.ignoradas,
+            "optout": len(self.optout),
+        }
+
+    async def _trabalhar(self):
+        while True:
+            destinatario, conteudo, tentativa = await self.fila.get()
+            try:
+                await destinatario.send(**conteudo)
+                self.entregues += 1
+            except discord.Forbidden:
+                self.falhas += 1  # DM fechada: não adianta tentar de novo
+            except discord.HTTPException as e:
+                if (e.status == 429 or e.status >= 500) and tentativa < self.tentativas:
+                    self.retentativas += 1
+                    espera = getattr(e, "retry_after", None) or 2 ** tentativa
+                    tarefa = asyncio.create_task(self._recolocar(min(float(espera), 60.0), (destinatario, conteudo, tentativa + 1)))
+                    self.recolocando.add(tarefa)
+                    tarefa.add_done_callback(self.recolocando.discard)
+                else:
+                    self.falhas += 1
+            except Exception as e:
+                self.falhas += 1
+                print(f"❌ Erro ao enviar DM para {destinatario.id}: {e}")
+            finally:
+                self.fila.task_done()
+
+    async def _recolocar(self, espera: float, item):
+        await asyncio.sleep(espera + random.uniform(0, 1))
+        try:
+            self.fila.put_nowait(item)
+        except asyncio.QueueFull:
+            self.descartadas += 1
+
+
+# Botões de enquete/chamada são DynamicItem: o id vem do custom_id (mesmo formato de antes), então os
+# botões continuam valendo depois de reiniciar e nenhuma View fica guardada por mensagem.
+ID_REGISTRO = r"(?P<id>\d+-\d+)"
+
+
+class EnqueteButton(discord.ui.DynamicItem[Button], template=rf"enquete_{ID_REGISTRO}_(?P<opcao>\d+)"):
+    def __init__(self, enquete_id: str, opcao_index: int, opcao_texto: str = ""):
         super().__init__(
-            style=discord.ButtonStyle.primary,
-            label=opcao_texto[:30],
-            emoji=self.get_emoji(opcao_index),
-            custom_id=f"enquete_{enquete_id}_{opcao_index}",
+            Button(
+                style=discord.ButtonStyle.primary,
+                label=opcao_texto[:30] or None,
+                emoji=emoji_opcao(opcao_index),
+                custom_id=f"enquete_{enquete_id}_{opcao_index}",
+            )
         )
         self.enquete_id = enquete_id
         self.opcao_index = opcao_index
-        self.opcao_texto = opcao_texto
 
-    def get_emoji(self, index):
-        emojis = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
-        return emojis[index] if index < len(emojis) else "✅"
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        return cls(match["id"], int(match["opcao"]))
 
     async def callback(self, interaction: discord.Interaction):
         if self.enquete_id not in bot.enquetes:
@@ -85,43 +1711,122 @@ class EnqueteButton(Button):
 
         enquete = bot.enquetes[self.enquete_id]
         user_id = str(interaction.user.id)
+        if self.opcao_index >= len(enquete["opcoes"]):
+            await interaction.response.send_message("❌ Opção inválida!", ephemeral=True)
+            return
+        opcao_texto = enquete["opcoes"][self.opcao_index]
 
         if user_id in enquete["votos_usuario"]:
             voto_antigo = enquete["votos_usuario"][user_id]
             enquete["votos"][voto_antigo] -= 1
             enquete["votos_usuario"][user_id] = self.opcao_index
             enquete["votos"][self.opcao_index] += 1
-            mensagem = f"✅ Seu voto foi alterado para **{self.opcao_texto}**!"
+            mensagem = f"✅ Seu voto foi alterado para **{opcao_texto}**!"
         else:
             enquete["votos"][self.opcao_index] += 1
             enquete["votos_usuario"][user_id] = self.opcao_index
-            mensagem = f"✅ Seu voto foi registrado em **{self.opcao_texto}**!"
+            mensagem = f"✅ Seu voto foi registrado em **{opcao_texto}**!"
+        bot.enquetes.marcar(self.enquete_id, ("voto", user_id))
+        bot.save_enquetes()
 
         await interaction.response.send_message(mensagem, ephemeral=True)
-        await self.atualizar_embed(interaction, enquete)
-
-    async def atualizar_embed(self, interaction: discord.Interaction, enquete):
-        total_votos = sum(enquete["votos"])
-        descricao = f"**{enquete['pergunta']}**\n\n"
-        for i, opcao in enumerate(enquete["opcoes"]):
-            votos = enquete["votos"][i]
-            porcentagem = (votos / total_votos * 100) if total_votos > 0 else 0
-            barra = "█" * int(porcentagem // 5) + "░" * (20 - int(porcentagem // 5))
-            descricao += f"**{self.get_emoji(i)} {opcao}**\n"
-            descricao += f"`{barra}` **{votos} votos** ({porcentagem:.1f}%)\n\n"
-        descricao += f"\n📊 **Total de votos:** {total_votos}"
+        enquete_id = self.enquete_id
+        bot.edicoes.agendar(enquete["message_id"], lambda: atualizar_embed_enquete(enquete_id))
+
+
+def emoji_opcao(index: int) -> str:
+    emojis = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
+    return emojis[index] if index < len(emojis) else "✅"
+
+
+BARRAS_ENQUETE = tuple("█" * i + "░" * (20 - i) for i in range(21))
+
+
+class RenderEnquete:
+    """
+    Texto de uma enquete montado uma vez por mudança: pergunta e rótulos das opções ficam guardados
+    e cada linha de opção só é refeita quando os votos dela ou o seu 0,1% mudam.
+    """
+
+    def __init__(self, enquete: dict):
+        self.enquete = enquete
+        self.opcoes = None
+        self.rotulos = []
+        self.linhas = []
+        self.chaves = []
+
+    def _estatico(self):
+        opcoes = self.enquete["opcoes"]
+        if self.opcoes != opcoes:
+            self.opcoes = list(opcoes)
+            self.rotulos = [f"**{emoji_opcao(i)} {opcao}**" for i, opcao in enumerate(opcoes)]
+            self.linhas = [None] * len(opcoes)
+            self.chaves = [None] * len(opcoes)
+
+    @staticmethod
+    def _parciais(votos: int, total: int) -> tuple:
+        permil = (votos * 1000 * 2 + total) // (total * 2) if total else 0
+        return permil, f"{permil // 10}.{permil % 10}"
+
+    def linhas_opcoes(self) -> list:
+        self._estatico()
+        votos = self.enquete["votos"]
+        total = sum(votos)
+        for i, v in enumerate(votos):
+            permil, porcentagem = self._parciais(v, total)
+            if self.chaves[i] != (v, permil):
+                self.chaves[i] = (v, permil)
+                barra = BARRAS_ENQUETE[v * 20 // total if total else 0]
+                self.linhas[i] = f"{self.rotulos[i]}\n`{barra}` **{v} votos** ({porcentagem}%)\n"
+        return self.linhas
+
+    def resultados(self) -> str:
+        """Pergunta + "opção - N votos (x%)", usado em resultados e no encerramento."""
+        votos = self.enquete["votos"]
+        total = sum(votos)
+        linhas = [f"**{opcao}** - {v} votos ({self._parciais(v, total)[1]}%)" for opcao, v in zip(self.enquete["opcoes"], votos)]
+        return f"**{self.enquete['pergunta']}**\n\n" + "\n".join(linhas)
+
+    def embed_ativa(self, enquete_id: str) -> discord.Embed:
+        enquete = self.enquete
+        descricao = f"**{enquete['pergunta']}**\n\n" + "\n".join(self.linhas_opcoes())
+        descricao += f"\n📊 **Total de votos:** {sum(enquete['votos'])}"
         descricao += f"\n👥 **Participantes:** {len(enquete['votos_usuario'])}"
+        if enquete.get("expira_em"):
+            expira = datetime.fromisoformat(enquete["expira_em"]).replace(tzinfo=BR_TZ)
+            if expira > datetime.now(BR_TZ):
+                descricao += f"\n⏰ **Expira:** {expira.strftime('%d/%m/%Y %H:%M')} (Brasília)"
         embed = discord.Embed(title="📊 **ENQUETE**", description=descricao, color=discord.Color.blue())
-        embed.set_footer(text=f"Criada por {enquete['criador_nome']} | ID: {self.enquete_id}")
+        embed.set_footer(text=f"Criada por {enquete['criador_nome']} | ID: {enquete_id}")
         embed.timestamp = datetime.now(BR_TZ)
-        try:
-            canal = bot.get_channel(int(enquete["channel_id"]))
-            if canal:
-                msg = await canal.fetch_message(int(enquete["message_id"]))
-                if msg:
-                    await msg.edit(embed=embed)
-        except Exception as e:
-            print(f"Erro ao atualizar embed: {e}")
+        return embed
+
+    def embed_encerrada(self, rodape: str) -> discord.Embed:
+        embed = discord.Embed(title="📊 **ENQUETE ENCERRADA**", description=self.resultados(), color=discord.Color.dark_gray())
+        embed.add_field(name="📊 Total de votos", value=str(sum(self.enquete["votos"])), inline=True)
+        embed.add_field(name="👥 Participantes", value=str(len(self.enquete["votos_usuario"])), inline=True)
+        embed.set_footer(text=rodape)
+        embed.timestamp = datetime.now(BR_TZ)
+        return embed
+
+
+def render_enquete(enquete_id: str) -> RenderEnquete:
+    enquete = bot.enquetes[enquete_id]
+    render = bot.renders_enquete.get(enquete_id)
+    if render is None or render.enquete is not enquete:
+        render = bot.renders_enquete[enquete_id] = RenderEnquete(enquete)
+    return render
+
+
+async def atualizar_embed_enquete(enquete_id: str):
+    """Reedita a enquete com os totais do momento (chamado pelo coalescedor, no máximo uma vez por janela)."""
+    enquete = bot.enquetes.get(enquete_id)
+    if not enquete:
+        return
+    try:
+        await bot.mensagem(enquete["channel_id"], enquete["message_id"]).edit(embed=render_enquete(enquete_id).embed_ativa(enquete_id))
+    except Exception as e:
+        print(f"Erro ao atualizar embed: {e}")
 
 
 class EnqueteView(View):
@@ -133,15 +1838,21 @@ class EnqueteView(View):
         self.add_item(EncerrarEnqueteButton(enquete_id))
 
 
-class EncerrarEnqueteButton(Button):
+class EncerrarEnqueteButton(discord.ui.DynamicItem[Button], template=rf"encerrar_enquete_{ID_REGISTRO}"):
     def __init__(self, enquete_id: str):
         super().__init__(
-            style=discord.ButtonStyle.danger,
-            label="🔒 Encerrar Enquete",
-            custom_id=f"encerrar_enquete_{enquete_id}",
+            Button(
+                style=discord.ButtonStyle.danger,
+                label="🔒 Encerrar Enquete",
+                custom_id=f"encerrar_enquete_{enquete_id}",
+            )
         )
         self.enquete_id = enquete_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        return cls(match["id"])
+
     async def callback(self, interaction: discord.Interaction):
         if self.enquete_id not in bot.enquetes:
             await interaction.response.send_message("❌ Enquete não encontrada!", ephemeral=True)
@@ -150,29 +1861,16 @@ class EncerrarEnqueteButton(Button):
         if str(interaction.user.id) != enquete["criador_id"] and not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message("❌ Apenas o criador ou administradores podem encerrar a enquete!", ephemeral=True)
             return
-        total_votos = sum(enquete["votos"])
-        resultados = []
-        for i, opcao in enumerate(enquete["opcoes"]):
-            votos = enquete["votos"][i]
-            porcentagem = (votos / total_votos * 100) if total_votos > 0 else 0
-            resultados.append(f"**{opcao}** - {votos} votos ({porcentagem:.1f}%)")
-        embed_final = discord.Embed(
-            title="📊 **ENQUETE ENCERRADA**",
-            description=f"**{enquete['pergunta']}**\n\n" + "\n".join(resultados),
-            color=discord.Color.dark_gray(),
-        )
-        embed_final.add_field(name="📊 Total de votos", value=str(total_votos), inline=True)
-        embed_final.add_field(name="👥 Participantes", value=str(len(enquete["votos_usuario"])), inline=True)
-        embed_final.set_footer(text=f"Encerrada por {interaction.user.name}")
-        embed_final.timestamp = datetime.now(BR_TZ)
+        embed_final = render_enquete(self.enquete_id).embed_encerrada(f"Encerrada por {interaction.user.name}")
         try:
-            canal = bot.get_channel(int(enquete["channel_id"]))
-            if canal:
-                msg = await canal.fetch_message(int(enquete["message_id"]))
-                if msg:
-                    await msg.edit(embed=embed_final, view=None)
+            msg = bot.mensagem(enquete["channel_id"], enquete["message_id"], interaction)
+            await msg.edit(embed=embed_final, view=None)
         except Exception as e:
             print(f"Erro ao encerrar: {e}")
+        bot.edicoes.cancelar(enquete["message_id"])
+        bot.esquecer_mensagem(enquete["message_id"])
+        bot.agendador.cancelar(("enquete", self.enquete_id))
+        bot.renders_enquete.pop(self.enquete_id, None)
         del bot.enquetes[self.enquete_id]
         bot.save_enquetes()
         await interaction.response.send_message("✅ Enquete encerrada com sucesso!", ephemeral=True)
@@ -188,10 +1886,6 @@ class CriarEnqueteModal(Modal):
         self.add_item(self.opcoes)
         self.add_item(self.duracao)
 
-    def get_emoji(self, index):
-        emojis = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
-        return emojis[index] if index < len(emojis) else "✅"
-
     async def on_submit(self, interaction: discord.Interaction):
         pergunta = self.pergunta.value
         opcoes_raw = self.opcoes.value
@@ -209,7 +1903,7 @@ class CriarEnqueteModal(Modal):
             expira_em = datetime.now(BR_TZ) + timedelta(hours=duracao)
         descricao = f"**{pergunta}**\n\n"
         for i, opcao in enumerate(opcoes):
-            descricao += f"{self.get_emoji(i)} **{opcao}**\n"
+            descricao += f"{emoji_opcao(i)} **{opcao}**\n"
         descricao += "\n📊 **Total de votos:** 0\n👥 **Participantes:** 0"
         if expira_em:
             descricao += f"\n⏰ **Expira:** {expira_em.strftime('%d/%m/%Y %H:%M')} (Brasília)"
@@ -225,18 +1919,18 @@ class CriarEnqueteModal(Modal):
             "pergunta": pergunta,
             "opcoes": opcoes,
             "votos": [0] * len(opcoes),
-            "votos_usuario": {},
+            "votos_usuario": VotosCompactos(),
             "criador_id": str(interaction.user.id),
             "criador_nome": interaction.user.name,
             "channel_id": str(interaction.channel.id),
             "message_id": str(message.id),
             "criado_em": datetime.now(BR_TZ).isoformat(),
             "expira_em": expira_em.isoformat() if expira_em else None,
+            "guild_id": str(interaction.guild_id),
         }
         bot.save_enquetes()
         if expira_em:
-            task = asyncio.create_task(bot.encerrar_enquete_automatico(enquete_id, expira_em))
-            bot.enquete_tasks[enquete_id] = task
+            bot.agendar_enquete(enquete_id, expira_em)
 
 
 class AdicionarOpcaoModal(Modal):
@@ -246,10 +1940,6 @@ class AdicionarOpcaoModal(Modal):
         self.nova_opcao = TextInput(label="📝 Nova Opção", placeholder="Digite a nova opção", required=True, max_length=100)
         self.add_item(self.nova_opcao)
 
-    def get_emoji(self, index):
-        emojis = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
-        return emojis[index] if index < len(emojis) else "✅"
-
     async def on_submit(self, interaction: discord.Interaction):
         if self.enquete_id not in bot.enquetes:
             await interaction.response.send_message("❌ Enquete não encontrada!", ephemeral=True)
@@ -264,36 +1954,17 @@ class AdicionarOpcaoModal(Modal):
         nova_opcao = self.nova_opcao.value.strip()
         enquete["opcoes"].append(nova_opcao)
         enquete["votos"].append(0)
+        bot.enquetes.marcar(self.enquete_id, "enquete")
         bot.save_enquetes()
         await interaction.response.send_message(f"✅ Opção **{nova_opcao}** adicionada!", ephemeral=True)
         await self.recriar_view(interaction, enquete)
 
     async def recriar_view(self, interaction: discord.Interaction, enquete):
         try:
-            canal = bot.get_channel(int(enquete["channel_id"]))
-            if canal:
-                msg = await canal.fetch_message(int(enquete["message_id"]))
-                if msg:
-                    nova_view = EnqueteView(self.enquete_id, enquete["opcoes"])
-                    total_votos = sum(enquete["votos"])
-                    descricao = f"**{enquete['pergunta']}**\n\n"
-                    for i, opcao in enumerate(enquete["opcoes"]):
-                        votos = enquete["votos"][i]
-                        porcentagem = (votos / total_votos * 100) if total_votos > 0 else 0
-                        barra = "█" * int(porcentagem // 5) + "░" * (20 - int(porcentagem // 5))
-                        emoji = self.get_emoji(i)
-                        descricao += f"{emoji} **{opcao}**\n"
-                        descricao += f"`{barra}` **{votos} votos** ({porcentagem:.1f}%)\n\n"
-                    descricao += f"\n📊 **Total de votos:** {total_votos}"
-                    descricao += f"\n👥 **Participantes:** {len(enquete['votos_usuario'])}"
-                    if enquete.get("expira_em"):
-                        expira = datetime.fromisoformat(enquete["expira_em"]).replace(tzinfo=BR_TZ)
-                        if expira > datetime.now(BR_TZ):
-                            descricao += f"\n⏰ **Expira:** {expira.strftime('%d/%m/%Y %H:%M')} (Brasília)"
-                    embed = discord.Embed(title="📊 **ENQUETE**", description=descricao, color=discord.Color.blue())
-                    embed.set_footer(text=f"Criada por {enquete['criador_nome']} | ID: {self.enquete_id}")
-                    embed.timestamp = datetime.now(BR_TZ)
-                    await msg.edit(embed=embed, view=nova_view)
+            msg = bot.mensagem(enquete["channel_id"], enquete["message_id"], interaction)
+            nova_view = EnqueteView(self.enquete_id, enquete["opcoes"])
+            bot.edicoes.cancelar(enquete["message_id"])
+            await msg.edit(embed=render_enquete(self.enquete_id).embed_ativa(self.enquete_id), view=nova_view)
         except Exception as e:
             print(f"Erro ao recriar view: {e}")
 
@@ -307,37 +1978,39 @@ class GerenciarEnqueteView(View):
         self.add_item(EncerrarEnqueteButton(enquete_id))
 
 
-class AdicionarOpcaoButton(Button):
+class AdicionarOpcaoButton(discord.ui.DynamicItem[Button], template=rf"add_opcao_{ID_REGISTRO}"):
     def __init__(self, enquete_id: str):
-        super().__init__(style=discord.ButtonStyle.success, label="➕ Adicionar Opção", emoji="➕", custom_id=f"add_opcao_{enquete_id}")
+        super().__init__(Button(style=discord.ButtonStyle.success, label="➕ Adicionar Opção", emoji="➕", custom_id=f"add_opcao_{enquete_id}"))
         self.enquete_id = enquete_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        return cls(match["id"])
+
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.send_modal(AdicionarOpcaoModal(self.enquete_id))
 
 
-class ResultadosButton(Button):
+class ResultadosButton(discord.ui.DynamicItem[Button], template=rf"resultados_{ID_REGISTRO}"):
     def __init__(self, enquete_id: str):
-        super().__init__(style=discord.ButtonStyle.secondary, label="📊 Ver Resultados", emoji="📊", custom_id=f"resultados_{enquete_id}")
+        super().__init__(Button(style=discord.ButtonStyle.secondary, label="📊 Ver Resultados", emoji="📊", custom_id=f"resultados_{enquete_id}"))
         self.enquete_id = enquete_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        return cls(match["id"])
+
     async def callback(self, interaction: discord.Interaction):
         if self.enquete_id not in bot.enquetes:
             await interaction.response.send_message("❌ Enquete não encontrada!", ephemeral=True)
             return
         enquete = bot.enquetes[self.enquete_id]
-        total_votos = sum(enquete["votos"])
-        resultados = []
-        for i, opcao in enumerate(enquete["opcoes"]):
-            votos = enquete["votos"][i]
-            porcentagem = (votos / total_votos * 100) if total_votos > 0 else 0
-            resultados.append(f"**{opcao}** - {votos} votos ({porcentagem:.1f}%)")
         embed = discord.Embed(
             title="📊 Resultados da Enquete",
-            description=f"**{enquete['pergunta']}**\n\n" + "\n".join(resultados),
+            description=render_enquete(self.enquete_id).resultados(),
             color=discord.Color.green(),
         )
-        embed.add_field(name="Total de Votos", value=str(total_votos), inline=True)
+        embed.add_field(name="Total de Votos", value=str(sum(enquete["votos"])), inline=True)
         embed.add_field(name="Participantes", value=str(len(enquete["votos_usuario"])), inline=True)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -349,180 +2022,283 @@ class Fort(discord.Client):
         intents.members = True
         super().__init__(intents=intents)
         self.tree = app_commands.CommandTree(self)
-        self.user_balances = {}
-        self.user_inventory = {}
-        self.daily_cooldowns = {}
-        self.ship_data = {}
-        self.marriage_data = {}
-        self.divorce_cooldowns = {}
-        self.anniversary_data = {}
-        self.ship_history = {}
-        self.call_data = {}
-        self.call_participants = {}
-        self.enquetes = {}
-        self.enquete_tasks = {}
-        self.pascoa_pontos = {}
-        self.pascoa_ovos = {}
-        self.pascoa_daily = {}
-        self.pascoa_coelho = {}
-        self.pascoa_memoria = {}
-        self.pascoa_quiz_cd = {}
-        self.pascoa_corrida = {}
-        self.pascoa_cacaninja_cd = {}
-        self.pascoa_roleta_cd = {}
-        self.pascoa_maratona_cd = {}
-        self.pascoa_boss_cd = {}
-        self.pascoa_campo_cd = {}
-        self.pascoa_campo_state = {}
-        self.rp_fichas = {}
-        self.rp_acoes_cd = {}
-        self.active_tasks = {}
+        self.user_balances = DadosRastreados()
+        self.user_inventory = DadosRastreados()
+        self.daily_cooldowns = DadosRastreados()
+        self.ship_data = DadosRastreados()
+        self.marriage_data = DadosRastreados()
+        self.anniversary_data = DadosRastreados()
+        self.ship_history = DadosRastreados()
+        self.call_data = RegistrosIndexados()
+        self.call_participants = DadosRastreados()
+        self.enquetes = RegistrosIndexados()
+        self.pascoa_pontos = DadosRastreados()
+        self.cooldowns = MotorCooldowns()
+        self.jogadas = OrderedDict()
+        self.rp_fichas = DadosRastreados()
+        self.ranking_pascoa = RankingPascoa()
+        self.agendador = AgendadorPrazos()
+        self.encerramentos = FilaEncerramentos()
+        self.dms = FilaDMs()
+        self.ledger_seq = 0
+        self.ledger_checkpoint_seq = 0
+        self.tarefa_checkpoint = None
+        self.particoes = ParticoesGuild(self)
+        self.edicoes = CoalescedorEdicoes()
+        self.renders_chamada = {}
+        self.renders_enquete = {}
+        self.mensagens = OrderedDict()
+        self.banco = BancoSQLite("fort_bot.db")
+        atexit.register(self.banco.fechar)
+        self.escritor = EscritorPersistencia(self.banco)
         self.init_database()
+        self.escritor.iniciar()
         self.load_data()
 
+    MENSAGENS_CACHE_MAX = 1024
+
+    def mensagem(self, channel_id, message_id, interaction: discord.Interaction = None):
+        """
+        Handle para editar uma mensagem sem o GET do fetch_message: a própria mensagem da interação
+        quando é ela, senão um PartialMessage guardado por message_id (LRU).
+        """
+        mid = int(message_id)
+        if interaction is not None and interaction.message is not None and interaction.message.id == mid:
+            return interaction.message
+        handle = self.mensagens.get(mid)
+        if handle is None:
+            handle = self.mensagens[mid] = self.get_partial_messageable(int(channel_id)).get_partial_message(mid)
+            if len(self.mensagens) > self.MENSAGENS_CACHE_MAX:
+                self.mensagens.popitem(last=False)
+        else:
+            self.mensagens.move_to_end(mid)
+        return handle
+
+    def esquecer_mensagem(self, message_id):
+        self.mensagens.pop(int(message_id), None)
+
+    JOGADAS_MAX = 1024
+
+    def jogada_nova(self, chave) -> bool:
+        """False se esse estado de jogo (mensagem + custom_id sem a casa) já foi processado — clique duplo."""
+        if chave in self.jogadas:
+            return False
+        self.jogadas[chave] = None
+        if len(self.jogadas) > self.JOGADAS_MAX:
+            self.jogadas.popitem(last=False)
+        return True
+
     def init_database(self):
-        conn = sqlite3.connect("fort_bot.db")
-        c = conn.cursor()
-        c.execute("""CREATE TABLE IF NOT EXISTS economia (user_id TEXT PRIMARY KEY, saldo INTEGER)""")
-        c.execute("""CREATE TABLE IF NOT EXISTS daily_cooldowns (user_id TEXT PRIMARY KEY, data TEXT)""")
-        c.execute("""CREATE TABLE IF NOT EXISTS divorce_cooldowns (user_id TEXT PRIMARY KEY, data TEXT)""")
-        c.execute("""CREATE TABLE IF NOT EXISTS dados_json (tipo TEXT PRIMARY KEY, dados TEXT)""")
-        conn.commit()
-        conn.close()
-        print("✅ Banco de dados SQLite inicializado!")
+        versao = aplicar_migracoes(self.banco)
+        print(f"✅ Banco de dados SQLite inicializado! (schema v{versao})")
+
+    DOMINIOS_JSON = (
+        ("anniversary", "anniversary_data"),
+        ("ship_history", "ship_history"),
+    )
 
     def load_data(self):
-        conn = sqlite3.connect("fort_bot.db")
-        c = conn.cursor()
-        c.execute("SELECT user_id, saldo FROM economia")
-        self.user_balances = {user_id: saldo for user_id, saldo in c.fetchall()}
-        c.execute("SELECT user_id, data FROM daily_cooldowns")
-        self.daily_cooldowns = {user_id: data for user_id, data in c.fetchall()}
-        c.execute("SELECT user_id, data FROM divorce_cooldowns")
-        self.divorce_cooldowns = {}
-        for user_id, data in c.fetchall():
-            self.divorce_cooldowns[user_id] = datetime.fromisoformat(data).replace(tzinfo=BR_TZ) if data else None
-        c.execute("SELECT tipo, dados FROM dados_json")
-        for tipo, dados_json in c.fetchall():
-            dados = json.loads(dados_json)
-            if tipo == "inventory":
-                self.user_inventory = dados
-            elif tipo == "ships":
-                self.ship_data = dados
-            elif tipo == "marriages":
-                self.marriage_data = dados
-            elif tipo == "anniversary":
-                self.anniversary_data = dados
-            elif tipo == "ship_history":
-                self.ship_history = dados
-            elif tipo == "calls":
-                self.call_data = dados
-            elif tipo == "call_participants":
-                self.call_participants = dados
-            elif tipo == "enquetes":
-                self.enquetes = dados
-            elif tipo == "pascoa_pontos":
-                self.pascoa_pontos = dados
-            elif tipo == "rp_fichas":
-                self.rp_fichas = dados
-        conn.close()
-        self.import_from_json_if_empty()
-
-    def import_from_json_if_empty(self):
-        if not self.user_balances:
-            try:
-                arquivos = [
-                    "economy.json",
-                    "inventory.json",
-                    "ships.json",
-                    "marriages.json",
-                    "anniversary.json",
-                    "ship_history.json",
-                    "calls.json",
-                    "enquetes.json",
-                ]
-                for arquivo in arquivos:
-                    if os.path.exists(arquivo):
-                        with open(arquivo, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-                            if arquivo == "economy.json":
-                                self.user_balances = data
-                            elif arquivo == "inventory.json":
-                                self.user_inventory = data
-                            elif arquivo == "ships.json":
-                                self.ship_data = data
-                            elif arquivo == "marriages.json":
-                                self.marriage_data = data
-                            elif arquivo == "anniversary.json":
-                                self.anniversary_data = data
-                            elif arquivo == "ship_history.json":
-                                self.ship_history = data
-                            elif arquivo == "calls.json":
-                                self.call_data = data.get("calls", {})
-                                self.call_participants = data.get("participants", {})
-                            elif arquivo == "enquetes.json":
-                                self.enquetes = data
-                print("✅ Dados importados dos JSONs!")
-                self.save_data()
-            except Exception as e:
-                print(f"⚠️ Erro ao importar JSONs: {e}")
+        self.user_balances = DadosRastreados(self.banco.consultar("SELECT user_id, saldo FROM economia"))
+        self.daily_cooldowns = DadosRastreados(self.banco.consultar("SELECT user_id, data FROM daily_cooldowns"))
+        self.cooldowns = MotorCooldowns(
+            self.banco.consultar("SELECT user_id, acao, canal, prazo FROM cooldowns WHERE prazo > ?", (time.time(),))
+        )
+        for _, atributo, carregar, _, _ in DOMINIOS_TABELA:
+            classe = RegistrosIndexados if atributo in ("call_data", "enquetes") else DadosRastreados
+            setattr(self, atributo, classe(carregar(self.banco)))
+        self.dms.optout = {uid for uid, in self.banco.consultar("SELECT user_id FROM dm_optout")}
+        self.segredo_jogos = SEGREDO_JOGOS or self.banco.consultar("SELECT valor FROM segredos WHERE nome = 'jogos'")[0][0]
+        self._reaplicar_ledger()
+        self.ranking_pascoa = RankingPascoa(self.pascoa_pontos)
+        atributos = dict(self.DOMINIOS_JSON)
+        for tipo, dados_json in self.banco.consultar("SELECT tipo, dados FROM dados_json"):
+            if tipo in atributos:
+                setattr(self, atributos[tipo], DadosRastreados(json.loads(dados_json)))
 
     def save_data(self):
-        conn = sqlite3.connect("fort_bot.db")
-        c = conn.cursor()
-        for user_id, saldo in self.user_balances.items():
-            c.execute("INSERT OR REPLACE INTO economia VALUES (?, ?)", (user_id, saldo))
-        for user_id, data in self.daily_cooldowns.items():
-            c.execute("INSERT OR REPLACE INTO daily_cooldowns VALUES (?, ?)", (user_id, data))
-        for user_id, data in self.divorce_cooldowns.items():
-            data_str = data.isoformat() if data else None
-            c.execute("INSERT OR REPLACE INTO divorce_cooldowns VALUES (?, ?)", (user_id, data_str))
-        dados_para_salvar = [
-            ("inventory", self.user_inventory),
-            ("ships", self.ship_data),
-            ("marriages", self.marriage_data),
-            ("anniversary", self.anniversary_data),
-            ("ship_history", self.ship_history),
-            ("calls", self.call_data),
-            ("call_participants", self.call_participants),
-            ("enquetes", self.enquetes),
-            ("pascoa_pontos", self.pascoa_pontos),
-            ("rp_fichas", self.rp_fichas),
-        ]
-        for tipo, dados in dados_para_salvar:
-            c.execute("INSERT OR REPLACE INTO dados_json VALUES (?, ?)", (tipo, json.dumps(dados, ensure_ascii=False)))
-        conn.commit()
-        conn.close()
+        """Enfileira no escritor só as linhas/domínios que mudaram desde o último flush (ver DadosRastreados)."""
+        tabelas = (
+            ("daily_cooldowns", self.daily_cooldowns, lambda v: v),
+        )
+        operacoes = []
+        for tabela, dados, converter in tabelas:
+            if not dados.sujo:
+                continue
+            alterados, removidos, _ = dados.coletar()
+            if alterados:
+                operacoes.append((f"INSERT OR REPLACE INTO {tabela} VALUES (?, ?)", [(k, converter(v)) for k, v in alterados.items()]))
+            if removidos:
+                operacoes.append((f"DELETE FROM {tabela} WHERE user_id = ?", [(k,) for k in removidos]))
+        operacoes += self._operacoes_dominios([(tipo, getattr(self, atributo)) for tipo, atributo in self.DOMINIOS_JSON])
+        operacoes += self._operacoes_tabelas()
+        operacoes += self.particoes.operacoes()
+        operacoes += self.cooldowns.operacoes()
+        self.escritor.enviar(operacoes)
+
+    def _operacoes_tabelas(self, atributos=None) -> list:
+        """Linhas a gravar/apagar nas tabelas normalizadas (só chaves, votos ou participantes que mudaram)."""
+        operacoes = []
+        for _, atributo, _, gravar, chaves in DOMINIOS_TABELA:
+            dados = getattr(self, atributo)
+            # Saldos só vão pro snapshot via checkpoint_ledger; o que vale entre checkpoints é o ledger.
+            if atributo in self.ATRIBUTOS_LEDGER or (atributos is not None and atributo not in atributos) or not dados.sujo:
+                continue
+            alterados, removidos, detalhes = dados.coletar()
+            if removidos:
+                for tabela, coluna in chaves:
+                    operacoes.append((f"DELETE FROM {tabela} WHERE {coluna} = ?", [(k,) for k in removidos]))
+            for chave, valor in alterados.items():
+                operacoes += gravar(chave, valor, None)
+            for chave, partes in detalhes.items():
+                operacoes += gravar(chave, dados[chave], partes)
+        return operacoes
+
+    def _operacoes_dominios(self, dominios) -> list:
+        operacoes = []
+        for tipo, dados in dominios:
+            if dados.sujo:
+                dados.coletar()
+                operacoes.append(("INSERT OR REPLACE INTO dados_json VALUES (?, ?)", [(tipo, json.dumps(dados, ensure_ascii=False))]))
+        return operacoes
 
     def save_enquetes(self):
-        conn = sqlite3.connect("fort_bot.db")
-        c = conn.cursor()
-        c.execute("INSERT OR REPLACE INTO dados_json VALUES (?, ?)", ("enquetes", json.dumps(self.enquetes, ensure_ascii=False)))
-        conn.commit()
-        conn.close()
-
-    def save_pascoa(self):
-        conn = sqlite3.connect("fort_bot.db")
-        c = conn.cursor()
-        c.execute("INSERT OR REPLACE INTO dados_json VALUES (?, ?)", ("pascoa_pontos", json.dumps(self.pascoa_pontos, ensure_ascii=False)))
-        conn.commit()
-        conn.close()
+        self.escritor.enviar(self._operacoes_tabelas(("enquetes",)))
 
     def save_rp(self):
-        conn = sqlite3.connect("fort_bot.db")
-        c = conn.cursor()
-        c.execute("INSERT OR REPLACE INTO dados_json VALUES (?, ?)", ("rp_fichas", json.dumps(self.rp_fichas, ensure_ascii=False)))
-        conn.commit()
-        conn.close()
+        self.escritor.enviar(self._operacoes_tabelas(("rp_fichas",)))
 
-    def add_pascoa_pontos(self, user_id: str, pontos: int):
+    def add_pascoa_pontos(self, user_id: str, pontos: int, motivo: str = "pascoa", guild_id=None):
         uid = str(user_id)
-        if uid not in self.pascoa_pontos:
-            self.pascoa_pontos[uid] = 0
-        self.pascoa_pontos[uid] += pontos
-        self.save_pascoa()
+        self.ranking_pascoa.atualizar(uid, self.movimentar(uid, pontos, motivo, moeda=MOEDA_PASCOA, guild_id=guild_id))
+
+    ATRIBUTOS_LEDGER = frozenset(atributo for atributo, _, _ in SNAPSHOTS_LEDGER.values())
+
+    def movimentar(self, user_id, delta: int, motivo: str, contraparte=None, moeda: str = MOEDA_MOEDAS, guild_id=None) -> int:
+        """Único caminho para mexer em saldo: aplica na visão em memória e anexa o evento ao ledger."""
+        uid = str(user_id)
+        # Obtém a partição antes de mexer no global: se ela for semeada agora, não conta o delta duas vezes.
+        particao = self.particoes.obter(guild_id) if guild_id else None
+        saldos = getattr(self, SNAPSHOTS_LEDGER[moeda][0])
+        saldos[uid] = saldos.get(uid, 0) + delta
+        if particao is not None:
+            particao.registrar(uid, moeda, delta)
+        self._anexar_ledger(uid, moeda, delta, motivo, contraparte)
+        return saldos[uid]
+
+    def _anexar_ledger(self, uid: str, moeda: str, delta: int, motivo: str, contraparte=None, transferencia: bool = False):
+        self.ledger_seq += 1
+        evento = (self.ledger_seq, uid, moeda, delta, motivo, str(contraparte) if contraparte else None, int(transferencia), time.time())
+        self.escritor.enviar([(SQL_LEDGER, [evento])])
+
+    # Conferir o saldo e debitar são síncronos e sem nenhum await no meio: nenhum outro handler roda no
+    # event loop entre os dois, então o par é atômico sem trava. Não coloque await aqui dentro.
+
+    def debitar_se_suficiente(self, user_id, valor: int, motivo: str, contraparte=None, guild_id=None) -> bool:
+        uid = str(user_id)
+        if self.user_balances.get(uid, 0) < valor:
+            return False
+        self.movimentar(uid, -valor, motivo, contraparte, guild_id=guild_id)
+        return True
+
+    def transferir_saldo(self, de, para, valor: int, motivo: str, guild_id=None) -> bool:
+        de, para = str(de), str(para)
+        if valor <= 0 or de == para or self.user_balances.get(de, 0) < valor:
+            return False
+        self.user_balances[de] = self.user_balances.get(de, 0) - valor
+        self.user_balances[para] = self.user_balances.get(para, 0) + valor
+        if guild_id:
+            particao = self.particoes.obter(guild_id)
+            particao.registrar(de, MOEDA_MOEDAS, -valor)
+            particao.registrar(para, MOEDA_MOEDAS, valor)
+        self._anexar_ledger(de, MOEDA_MOEDAS, -valor, motivo, para, transferencia=True)
+        return True
+
+    def checkpoint_ledger(self):
+        """Grava os saldos alterados no snapshot e avança o checkpoint, tudo na mesma transação."""
+        if self.ledger_checkpoint_seq == self.ledger_seq and not any(getattr(self, a).sujo for a in self.ATRIBUTOS_LEDGER):
+            return
+        operacoes = []
+        agora = time.time()
+        for moeda, (atributo, tabela, coluna) in SNAPSHOTS_LEDGER.items():
+            alterados, removidos, _ = getattr(self, atributo).coletar()
+            if alterados:
+                operacoes.append((f"INSERT OR REPLACE INTO {tabela} (user_id, {coluna}) VALUES (?, ?)", list(alterados.items())))
+            if removidos:
+                operacoes.append((f"DELETE FROM {tabela} WHERE user_id = ?", [(k,) for k in removidos]))
+            operacoes.append(("UPDATE ledger_checkpoint SET ultimo_id = ?, criado_em = ? WHERE moeda = ?", [(self.ledger_seq, agora, moeda)]))
+        # Os eventos até ledger_seq já estão na fila antes deste lote, então o checkpoint nunca passa na frente deles.
+        self.escritor.enviar(operacoes)
+        self.ledger_checkpoint_seq = self.ledger_seq
+
+    def _reaplicar_ledger(self):
+        """Parte do último snapshot e soma só os eventos do ledger posteriores ao checkpoint."""
+        checkpoints = dict(self.banco.consultar("SELECT moeda, ultimo_id FROM ledger_checkpoint"))
+        eventos = 0
+        for moeda, (atributo, _, _) in SNAPSHOTS_LEDGER.items():
+            saldos = getattr(self, atributo)
+            desde = checkpoints.get(moeda, 0)
+            for user_id, delta, n in self.banco.consultar(
+                """SELECT user_id, SUM(delta), COUNT(*) FROM ledger WHERE id > ? AND moeda = ? GROUP BY user_id
+                UNION ALL
+                SELECT contraparte, -SUM(delta), 0 FROM ledger WHERE id > ? AND moeda = ? AND transferencia = 1 GROUP BY contraparte""",
+                (desde, moeda, desde, moeda),
+            ):
+                saldos[user_id] = saldos.get(user_id, 0) + delta
+                eventos += n
+        self.ledger_seq = self.banco.consultar("SELECT COALESCE(MAX(id), 0) FROM ledger")[0][0]
+        self.ledger_checkpoint_seq = min(checkpoints.values(), default=0)
+        if eventos:
+            print(f"📒 Ledger: {eventos} evento(s) reaplicado(s) desde o último checkpoint")
+
+    async def checkpoint_ledger_periodico(self):
+        while not self.is_closed():
+            await asyncio.sleep(LEDGER_CHECKPOINT_INTERVALO)
+            self.checkpoint_ledger()
+
+    def agendar_chamada(self, call_id: str, expira_em: datetime):
+        self.agendador.agendar(
+            ("chamada", call_id),
+            expira_em.timestamp(),
+            lambda: self._enfileirar_encerramento(("chamada", call_id), lambda etapas: encerrar_chamada_apos_tempo(call_id, etapas)),
+        )
+        self.agendar_lembretes(call_id, expira_em)
+
+    def agendar_lembretes(self, call_id: str, expira_em: datetime):
+        """Um lembrete por antecedência de LEMBRETES_CHAMADA antes do início (data_hora), se ainda cabe antes de expirar."""
+        call = self.call_data.get(call_id)
+        if not call:
+            return
+        criado_em = datetime.fromisoformat(call["criado_em"]).replace(tzinfo=BR_TZ) if call.get("criado_em") else datetime.now(BR_TZ)
+        inicio = interpretar_data_hora_chamada(call.get("data_hora") or "", criado_em)
+        if inicio is None:
+            return
+        agora = time.time()
+        for minutos in LEMBRETES_CHAMADA:
+            prazo = inicio.timestamp() - minutos * 60
+            if agora < prazo < expira_em.timestamp():
+                self.agendador.agendar(("lembrete", call_id, minutos), prazo, lambda m=minutos: enviar_lembrete_chamada(call_id, m))
+
+    def cancelar_lembretes(self, call_id: str):
+        for minutos in LEMBRETES_CHAMADA:
+            self.agendador.cancelar(("lembrete", call_id, minutos))
+
+    def agendar_enquete(self, enquete_id: str, expira_em: datetime):
+        self.agendador.agendar(
+            ("enquete", enquete_id),
+            expira_em.timestamp(),
+            lambda: self._enfileirar_encerramento(("enquete", enquete_id), lambda etapas: self.encerrar_enquete_automatico(enquete_id)),
+        )
+
+    async def _enfileirar_encerramento(self, chave, executar):
+        self.encerramentos.enviar(chave, executar)
 
     async def setup_hook(self):
+        self.agendador.iniciar()
+        self.add_dynamic_items(EnqueteButton, EncerrarEnqueteButton, AdicionarOpcaoButton, ResultadosButton, CallButton, PascoaMemoryButton, CampoOvoButton)
+        self.encerramentos.iniciar()
+        self.dms.iniciar()
+        self.checkpoint_ledger()
+        self.tarefa_checkpoint = asyncio.create_task(self.checkpoint_ledger_periodico())
         await self.tree.sync()
         print("✅ Comandos sincronizados!")
         await self.restaurar_chamadas_ativas()
@@ -539,8 +2315,7 @@ class Fort(discord.Client):
                     if expira <= agora:
                         enquetes_remover.append(enquete_id)
                     else:
-                        task = asyncio.create_task(self.encerrar_enquete_automatico(enquete_id, expira))
-                        self.enquete_tasks[enquete_id] = task
+                        self.agendar_enquete(enquete_id, expira)
             except Exception as e:
                 print(f"❌ Erro ao restaurar enquete {enquete_id}: {e}")
                 enquetes_remover.append(enquete_id)
@@ -550,58 +2325,38 @@ class Fort(discord.Client):
         if enquetes_remover:
             self.save_enquetes()
 
-    async def encerrar_enquete_automatico(self, enquete_id: str, expira_em: datetime):
+    async def encerrar_enquete_automatico(self, enquete_id: str):
         try:
-            agora = datetime.now(BR_TZ)
-            tempo_restante = (expira_em - agora).total_seconds()
-            if tempo_restante > 0:
-                await asyncio.sleep(tempo_restante)
             if enquete_id not in self.enquetes:
                 return
             enquete = self.enquetes[enquete_id]
-            total_votos = sum(enquete["votos"])
-            resultados = []
-            for i, opcao in enumerate(enquete["opcoes"]):
-                votos = enquete["votos"][i]
-                porcentagem = (votos / total_votos * 100) if total_votos > 0 else 0
-                resultados.append(f"**{opcao}** - {votos} votos ({porcentagem:.1f}%)")
-            embed_final = discord.Embed(
-                title="📊 **ENQUETE ENCERRADA**",
-                description=f"**{enquete['pergunta']}**\n\n" + "\n".join(resultados),
-                color=discord.Color.dark_gray(),
-            )
-            embed_final.add_field(name="📊 Total de votos", value=str(total_votos), inline=True)
-            embed_final.add_field(name="👥 Participantes", value=str(len(enquete["votos_usuario"])), inline=True)
-            embed_final.set_footer(text="Encerrada automaticamente por tempo limite")
-            embed_final.timestamp = datetime.now(BR_TZ)
+            embed_final = render_enquete(enquete_id).embed_encerrada("Encerrada automaticamente por tempo limite")
+            self.edicoes.cancelar(enquete["message_id"])
             try:
-                canal = self.get_channel(int(enquete["channel_id"]))
-                if canal:
-                    msg = await canal.fetch_message(int(enquete["message_id"]))
-                    if msg:
-                        await msg.edit(embed=embed_final, view=None)
+                msg = self.mensagem(enquete["channel_id"], enquete["message_id"])
+                await msg.edit(embed=embed_final, view=None)
             except Exception as e:
+                if limite_atingido(e):
+                    raise
                 print(f"Erro ao encerrar enquete: {e}")
+            self.esquecer_mensagem(enquete["message_id"])
+            self.renders_enquete.pop(enquete_id, None)
             del self.enquetes[enquete_id]
-            if enquete_id in self.enquete_tasks:
-                del self.enquete_tasks[enquete_id]
             self.save_enquetes()
         except asyncio.CancelledError:
             pass
         except Exception as e:
+            if limite_atingido(e):
+                raise
             print(f"❌ Erro ao encerrar enquete: {e}")
 
     async def restaurar_chamadas_ativas(self):
-        agora = datetime.now(BR_TZ)
         calls_remover = []
         for call_id, call_data in self.call_data.items():
             try:
+                # As que venceram com o bot fora do ar disparam já: o encerramento arquiva presenças e tracinhos.
                 expira_em = datetime.fromisoformat(call_data["expira_em"]).replace(tzinfo=BR_TZ)
-                if expira_em <= agora:
-                    calls_remover.append(call_id)
-                else:
-                    task = asyncio.create_task(encerrar_chamada_apos_tempo(call_id, expira_em))
-                    self.active_tasks[call_id] = task
+                self.agendar_chamada(call_id, expira_em)
             except Exception as e:
                 print(f"❌ Erro ao restaurar chamada {call_id}: {e}")
                 calls_remover.append(call_id)
@@ -613,6 +2368,19 @@ class Fort(discord.Client):
         if calls_remover:
             self.save_data()
 
+    async def close(self):
+        if self.tarefa_checkpoint:
+            self.tarefa_checkpoint.cancel()
+        await super().close()
+        self.save_data()
+        self.checkpoint_ledger()
+        await asyncio.to_thread(self.escritor.parar)
+        self.banco.fechar()
+        print(f"💾 Persistência finalizada: {self.escritor.metricas()}")
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.particoes.descarregar(guild.id)
+
     async def on_ready(self):
         print(f"✅ Bot {self.user} ligado com sucesso!")
         print(f"📊 Servidores: {len(self.guilds)}")
@@ -620,8 +2388,23 @@ class Fort(discord.Client):
         print(f"🐣 Sistema de Páscoa: ATIVO")
         print(f"🎭 Sistema de RP: ATIVO")
         print(f"⏰ Horário atual: {datetime.now(BR_TZ).strftime('%d/%m/%Y %H:%M:%S')}")
+        self.preencher_guild_registros()
         await self.change_presence(activity=discord.Game(name="🐣 Páscoa | Fort Bot"))
 
+    def preencher_guild_registros(self):
+        """Chamadas/enquetes de antes do guild_id: descobre o servidor pelo canal (só dá com o cache pronto)."""
+        preenchidos = 0
+        for registros, detalhe in ((self.call_data, None), (self.enquetes, "enquete")):
+            for rid in [r for r, d in registros.items() if not d.get("guild_id")]:
+                canal = self.get_channel(int(registros[rid]["channel_id"]))
+                if canal is not None and getattr(canal, "guild", None) is not None:
+                    registros.reindexar(rid, guild_id=str(canal.guild.id))
+                    registros.marcar(rid, detalhe)
+                    preenchidos += 1
+        if preenchidos:
+            print(f"🗂️ guild_id preenchido em {preenchidos} chamada(s)/enquete(s)")
+            self.save_data()
+
 
 bot = Fort()
 
@@ -639,15 +2422,14 @@ CHAMADA_INTRO_PADRAO = (
 )
 
 
-def montar_descricao_embed_chamada(
+def montar_texto_fixo_chamada(
     data_atual: str,
     texto_intro: str,
     data_hora: str,
     emoji_botao: str,
     timing_text: str,
-    num_presentes: int,
 ) -> str:
-    """Texto completo do embed de chamada (layout original da House)."""
+    """Parte do embed de chamada que não depende dos presentes (layout original da House)."""
     return f"""﹒⬚﹒⇆﹒🍑 ᆞ
 
 ५ᅟ𐙚 ⎯ᅟ︶︶︶﹒୧﹐atividade ❞ {data_atual}
@@ -668,24 +2450,113 @@ Para confirmar sua presença, reaja com o emoji indicado abaixo e sinta-se à vo
 ५ᅟ𐙚 ⎯ᅟᅟ❝ 🍑﹒ᥫ᭡﹐୨`﹒ꔫ﹐︶︶︶﹒୧﹐🍑 ❞
 ㅤ𔘓 ㅤׄㅤ ㅤׅ ㅤׄ 魂 🌷 𝅼ㅤׄㅤㅤ𔘓 ◖
 
-**{timing_text}**
-**✅ PRESENTES: {num_presentes}**"""
+**{timing_text}**"""
+
+
+def montar_descricao_embed_chamada(
+    data_atual: str,
+    texto_intro: str,
+    data_hora: str,
+    emoji_botao: str,
+    timing_text: str,
+    num_presentes: int,
+) -> str:
+    """Texto completo do embed de chamada."""
+    return montar_texto_fixo_chamada(data_atual, texto_intro, data_hora, emoji_botao, timing_text) + f"\n**✅ PRESENTES: {num_presentes}**"
 
 
 CHAMADA_EMBED_TITLE = "🌿ᩚ📦 𝐇𝐎𝐔𝐒𝐄 ִ 𝐂̷̸𝐇𝐀𝐌𝐀𝐃𝐀 ꒥꒦ 📄"
 
 
-class CallButton(Button):
-    def __init__(self, call_id: str, emoji: str, expira_em: datetime):
-        super().__init__(style=discord.ButtonStyle.success, label="Confirmar Presença", emoji=emoji, custom_id=f"call_{call_id}")
+class RenderChamada:
+    """
+    Partes do embed de uma chamada guardadas entre edições: o texto fixo (refeito só quando o dia muda)
+    e as até 10 primeiras menções, completadas só enquanto faltarem. Quem confirma entra numa fila
+    (entrou) que só é consumida enquanto sobra vaga, então reeditar custa o mesmo com 5 ou 5.000 presentes.
+    """
+
+    MENCOES = 10
+
+    def __init__(self, call: dict, participantes: dict):
+        self.call = call
+        self.dia = None
+        self.fixo = ""
+        self.mencoes = []
+        self.a_resolver = deque(participantes)
+
+    def entrou(self, pid: str):
+        if len(self.mencoes) < self.MENCOES:
+            self.a_resolver.append(pid)
+
+    def _texto_fixo(self) -> str:
+        dia = datetime.now(BR_TZ).strftime("%d.%m")
+        if dia != self.dia:
+            call = self.call
+            if call.get("horas_duracao"):
+                expira_em = datetime.fromisoformat(call["expira_em"]).replace(tzinfo=BR_TZ)
+                timing_text = f"⏰ Expira em {call['horas_duracao']} hora(s) (às {expira_em.strftime('%H:%M')} Brasília)"
+            else:
+                timing_text = "🌙 Expira HOJE às 23:59 (MEIA-NOITE Brasília)"
+            intro = (call.get("descricao") or "").strip() or CHAMADA_INTRO_PADRAO
+            self.fixo = montar_texto_fixo_chamada(dia, intro, call["data_hora"], call["emoji"], timing_text)
+            self.dia = dia
+        return self.fixo
+
+    def _lista(self, guild: discord.Guild, participantes: dict) -> str:
+        while len(self.mencoes) < self.MENCOES and self.a_resolver:
+            pid = self.a_resolver.popleft()
+            member = guild.get_member(int(pid)) if pid in participantes else None
+            if member:
+                self.mencoes.append(member.mention)
+        if len(self.mencoes) == self.MENCOES:
+            self.a_resolver.clear()
+        if not self.mencoes:
+            return "Ninguém confirmou ainda"
+        texto = "\n".join(self.mencoes)
+        if len(participantes) > len(self.mencoes):
+            texto += f"\n... e mais {len(participantes) - len(self.mencoes)}"
+        return texto
+
+    def embed(self, guild: discord.Guild, participantes: dict) -> discord.Embed:
+        embed = discord.Embed(
+            title=CHAMADA_EMBED_TITLE,
+            description=self._texto_fixo() + f"\n**✅ PRESENTES: {len(participantes)}**",
+            color=discord.Color.from_str("#FF69B4"),
+        )
+        embed.add_field(name="📋 LISTA DE PRESENTES", value=self._lista(guild, participantes), inline=False)
+        if guild.icon:
+            embed.set_thumbnail(url=guild.icon.url)
+        embed.set_footer(text="Clique no botão abaixo para confirmar sua presença!")
+        embed.timestamp = datetime.now(BR_TZ)
+        return embed
+
+
+async def atualizar_embed_chamada(call_id: str):
+    """Reedita a mensagem da chamada com a lista atual (chamado pelo coalescedor, não por clique)."""
+    call = bot.call_data.get(call_id)
+    if not call:
+        return
+    channel = bot.get_channel(int(call["channel_id"]))
+    if not channel:
+        return
+    participantes = bot.call_participants.get(call_id, {})
+    render = bot.renders_chamada.get(call_id)
+    if render is None or render.call is not call:
+        render = bot.renders_chamada[call_id] = RenderChamada(call, participantes)
+    embed = render.embed(channel.guild, participantes)
+    await bot.mensagem(channel.id, call["message_id"]).edit(embed=embed)
+
+
+class CallButton(discord.ui.DynamicItem[Button], template=rf"call_{ID_REGISTRO}"):
+    def __init__(self, call_id: str, emoji: str = "✅"):
+        super().__init__(Button(style=discord.ButtonStyle.success, label="Confirmar Presença", emoji=emoji, custom_id=f"call_{call_id}"))
         self.call_id = call_id
-        self.expira_em = expira_em
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        return cls(match["id"], item.emoji)
 
     async def callback(self, interaction: discord.Interaction):
-        agora = datetime.now(BR_TZ)
-        if agora > self.expira_em:
-            await interaction.response.send_message("⏰ **Esta chamada EXPIROU!**", ephemeral=True)
-            return
         try:
             user_id = str(interaction.user.id)
             call_id = self.call_id
@@ -693,77 +2564,33 @@ class CallButton(Button):
                 await interaction.response.send_message("❌ Chamada não existe!", ephemeral=True)
                 return
             call = bot.call_data[call_id]
+            if datetime.now(BR_TZ) > datetime.fromisoformat(call["expira_em"]).replace(tzinfo=BR_TZ):
+                await interaction.response.send_message("⏰ **Esta chamada EXPIROU!**", ephemeral=True)
+                return
             if call_id not in bot.call_participants:
-                bot.call_participants[call_id] = []
+                bot.call_participants[call_id] = {}
             if user_id in bot.call_participants[call_id]:
                 await interaction.response.send_message("❌ Você já confirmou!", ephemeral=True)
                 return
             await interaction.response.defer(ephemeral=True)
-            bot.call_participants[call_id].append(user_id)
+            bot.call_participants[call_id][user_id] = time.time()
+            bot.call_participants.marcar(call_id, user_id)
             bot.save_data()
-            try:
-                channel = bot.get_channel(int(call["channel_id"]))
-                if channel:
-                    message = await channel.fetch_message(int(call["message_id"]))
-                    if message:
-                        participantes_text = ""
-                        if bot.call_participants[call_id]:
-                            participantes_list = []
-                            for pid in bot.call_participants[call_id]:
-                                member = interaction.guild.get_member(int(pid))
-                                if member:
-                                    participantes_list.append(member.mention)
-                            if participantes_list:
-                                participantes_text = "\n".join(participantes_list[:10])
-                                if len(participantes_list) > 10:
-                                    participantes_text += f"\n... e mais {len(participantes_list) - 10}"
-                        else:
-                            participantes_text = "Ninguém confirmou ainda"
-                        data_atual = datetime.now(BR_TZ).strftime("%d.%m")
-                        if call.get("horas_duracao"):
-                            timing_text = f"⏰ Expira em {call['horas_duracao']} hora(s) (às {self.expira_em.strftime('%H:%M')} Brasília)"
-                        else:
-                            timing_text = "🌙 Expira HOJE às 23:59 (MEIA-NOITE Brasília)"
-                        intro = (call.get("descricao") or "").strip() or CHAMADA_INTRO_PADRAO
-                        descricao_completa = montar_descricao_embed_chamada(
-                            data_atual,
-                            intro,
-                            call["data_hora"],
-                            call["emoji"],
-                            timing_text,
-                            len(bot.call_participants[call_id]),
-                        )
-                        embed = discord.Embed(
-                            title=CHAMADA_EMBED_TITLE,
-                            description=descricao_completa,
-                            color=discord.Color.from_str("#FF69B4"),
-                        )
-                        embed.add_field(
-                            name="📋 LISTA DE PRESENTES",
-                            value=participantes_text if participantes_text else "Ninguém confirmou ainda",
-                            inline=False,
-                        )
-                        if interaction.guild.icon:
-                            embed.set_thumbnail(url=interaction.guild.icon.url)
-                        embed.set_footer(text="Clique no botão abaixo para confirmar sua presença!")
-                        embed.timestamp = datetime.now(BR_TZ)
-                        await message.edit(embed=embed)
-            except Exception as e:
-                print(f"Erro ao atualizar embed: {e}")
-            try:
-                embed_privado = discord.Embed(
-                    title="✅ PRESENÇA CONFIRMADA!",
-                    description=f"**{call['titulo']}**",
-                    color=discord.Color.green(),
-                )
-                embed_privado.add_field(name="📅 Data/Hora", value=call["data_hora"], inline=True)
-                embed_privado.add_field(name="📍 Local", value=call["local"], inline=True)
-                embed_privado.add_field(name="👤 Organizador", value=f"<@{call['criador_id']}>", inline=True)
-                embed_privado.add_field(name="📊 Total", value=f"{len(bot.call_participants[call_id])} confirmados", inline=True)
-                embed_privado.set_footer(text="Obrigado por confirmar! 🎉")
-                await interaction.user.send(embed=embed_privado)
-            except Exception:
-                pass
+            render = bot.renders_chamada.get(call_id)
+            if render is not None:
+                render.entrou(user_id)
+            bot.edicoes.agendar(call["message_id"], lambda: atualizar_embed_chamada(call_id))
+            embed_privado = discord.Embed(
+                title="✅ PRESENÇA CONFIRMADA!",
+                description=f"**{call['titulo']}**",
+                color=discord.Color.green(),
+            )
+            embed_privado.add_field(name="📅 Data/Hora", value=call["data_hora"], inline=True)
+            embed_privado.add_field(name="📍 Local", value=call["local"], inline=True)
+            embed_privado.add_field(name="👤 Organizador", value=f"<@{call['criador_id']}>", inline=True)
+            embed_privado.add_field(name="📊 Total", value=f"{len(bot.call_participants[call_id])} confirmados", inline=True)
+            embed_privado.set_footer(text="Obrigado por confirmar! 🎉 (/chamada_dm para não receber)")
+            bot.dms.enviar(interaction.user, embed=embed_privado)
             await interaction.followup.send(
                 f"✅ Presença confirmada! Total: {len(bot.call_participants[call_id])}",
                 ephemeral=True,
@@ -777,63 +2604,236 @@ class CallButton(Button):
 
 
 class CallView(View):
-    def __init__(self, call_id: str, emoji: str, expira_em: datetime):
+    def __init__(self, call_id: str, emoji: str):
         super().__init__(timeout=None)
-        self.add_item(CallButton(call_id, emoji, expira_em))
+        self.add_item(CallButton(call_id, emoji))
+
+
+LEMBRETES_CHAMADA = tuple(int(m) for m in os.environ.get("FORT_LEMBRETES_CHAMADA", "30,5").split(",") if m.strip())
 
+MESES = ("janeiro", "fevereiro", "marco", "abril", "maio", "junho", "julho", "agosto", "setembro", "outubro", "novembro", "dezembro")
+DIAS_SEMANA = frozenset(("segunda", "terca", "terça", "quarta", "quinta", "sexta", "sabado", "sábado", "domingo"))
+# Em ordem: ISO (2026-10-20), numérica (20/10, 20/10/2026) e por extenso (20 de outubro de 2026, 20 out).
+_DATAS_CHAMADA = (
+    re.compile(r"(?<!\d)(?P<a>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})(?!\d)"),
+    re.compile(r"(?<!\d)(?P<d>\d{1,2})[/.-](?P<m>\d{1,2})(?:[/.-](?P<a>\d{4}|\d{2}))?(?!\d)"),
+    re.compile(r"(?<!\d)(?P<d>\d{1,2})\s*(?:de\s+)?(?P<m>[^\W\d_]{3,})\.?(?:\s*(?:de\s+)?(?P<a>\d{4}))?(?!\d)", re.IGNORECASE),
+)
+_HORA_CHAMADA = re.compile(r"(?<![\d/.-])(\d{1,2})\s*(?:h|:)\s*(\d{2})?(?!\d)", re.IGNORECASE)
+
+
+def numero_mes(palavra: str) -> Optional[int]:
+    """1..12 para "fevereiro", "fev", "Março", "set."; None se não for mês."""
+    palavra = palavra.lower().replace("ç", "c").rstrip(".")
+    if len(palavra) >= 3:
+        for numero, mes in enumerate(MESES, 1):
+            if mes.startswith(palavra):
+                return numero
+    return None
 
-async def encerrar_chamada_apos_tempo(call_id: str, expira_em: datetime):
+
+def interpretar_data_hora_chamada(texto: str, referencia: datetime) -> Optional[datetime]:
+    """
+    Lê o data_hora livre da chamada em horário de Brasília. Com referência em 18/10/2026 12:00:
+
+        "20h", "hoje às 20:30"                 -> 18/10/2026 20:00 / 20:30
+        "amanhã 9h"                            -> 19/10/2026 09:00
+        "25/12 19h30", "25/12/2026 20:00"      -> 25/12/2026 19:30 / 20:00
+        "2026-10-20 10:00"                     -> 20/10/2026 10:00
+        "21 de Fevereiro de 2027 às 22:00"     -> 21/02/2027 22:00
+        "5 de janeiro 20h"                     -> 05/01/2027 20:00 (data sem ano que já passou é do ano seguinte)
+        "1h30"                                 -> None (sem data e já passou: não chuta o dia seguinte)
+        "sexta 20h", "30/02 20h", "dia 5, 20h" -> None (tem cara de data mas não foi entendida)
+
+    None também se não achar horário. Na dúvida não agenda lembrete, em vez de agendar no dia errado.
+    """
+    hora = _HORA_CHAMADA.search(texto)
+    if not hora or int(hora.group(1)) > 23 or int(hora.group(2) or 0) > 59:
+        return None
+    sem_hora = texto[: hora.start()] + " " + texto[hora.end() :]
+    data = mes = None
+    for padrao in _DATAS_CHAMADA:
+        for achado in padrao.finditer(sem_hora):
+            mes = int(achado["m"]) if achado["m"].isdigit() else numero_mes(achado["m"])
+            if mes:
+                data = achado
+                break
+        if data:
+            break
+    resto = (sem_hora[: data.start()] + " " + sem_hora[data.end() :] if data else sem_hora).lower()
+    palavras = re.findall(r"[^\W\d_]+", resto)
+    if re.search(r"\d", resto) or any(p in DIAS_SEMANA or numero_mes(p) for p in palavras):
+        return None
     try:
-        agora = datetime.now(BR_TZ)
-        tempo_restante = (expira_em - agora).total_seconds()
-        if tempo_restante > 0:
-            await asyncio.sleep(tempo_restante)
+        if data:
+            ano = int(data["a"]) if data["a"] else referencia.year
+            ano = ano + 2000 if ano < 100 else ano
+            dia = datetime(ano, mes, int(data["d"]), tzinfo=BR_TZ)
+            if not data["a"] and dia.date() < referencia.date():
+                dia = dia.replace(year=ano + 1)
+        else:
+            dia = datetime(referencia.year, referencia.month, referencia.day, tzinfo=BR_TZ)
+            if "amanhã" in palavras or "amanha" in palavras:
+                dia += timedelta(days=1)
+    except ValueError:
+        return None
+    inicio = dia.replace(hour=int(hora.group(1)), minute=int(hora.group(2) or 0))
+    if not data and inicio < referencia:
+        return None
+    return inicio
+
+
+def dividir_mencoes(cabecalho: str, mencoes, limite: int = 2000) -> list:
+    """Agrupa as menções em mensagens de até `limite` caracteres; o cabeçalho vai só na primeira."""
+    mensagens = []
+    atual = cabecalho
+    for mencao in mencoes:
+        if len(atual) + 1 + len(mencao) > limite:
+            mensagens.append(atual)
+            atual = mencao
+        else:
+            atual = f"{atual}\n{mencao}" if atual else mencao
+    if atual:
+        mensagens.append(atual)
+    return mensagens
+
+
+async def enviar_lembrete_chamada(call_id: str, minutos: int):
+    """Uma mensagem no canal (quebrada em pedaços de 2000) mencionando só quem confirmou."""
+    await bot.wait_until_ready()
+    call = bot.call_data.get(call_id)
+    participantes = bot.call_participants.get(call_id, {})
+    if not call or not participantes:
+        return
+    channel = bot.get_channel(int(call["channel_id"]))
+    if not channel:
+        return
+    cabecalho = f"🔔 **{call['titulo']}** começa em {minutos} minuto(s) ({call['data_hora']})! Presentes confirmados:"
+    try:
+        for i, texto in enumerate(dividir_mencoes(cabecalho, (f"<@{pid}>" for pid in participantes))):
+            await channel.send(
+                texto,
+                reference=bot.mensagem(channel.id, call["message_id"]).to_reference(fail_if_not_exists=False) if i == 0 else None,
+                allowed_mentions=discord.AllowedMentions(everyone=False, roles=False, users=True),
+            )
+    except Exception as e:
+        print(f"❌ Erro ao enviar lembrete da chamada {call_id}: {e}")
+
+
+TRACINHOS_LIMITE = 7
+
+
+def operacoes_arquivo_chamada(call_id: str, call: dict, participantes: dict, guild: Optional[discord.Guild]) -> list:
+    """
+    Arquiva a chamada encerrada e soma um tracinho a cada membro ausente (membros do servidor que já
+    estavam nele quando a chamada foi criada, menos bots e presentes). Nada do histórico é relido.
+    """
+    agora = time.time()
+    ausentes = []
+    if guild is not None:
+        criada = datetime.fromisoformat(call["criado_em"]).replace(tzinfo=BR_TZ) if call.get("criado_em") else None
+        for member in guild.members:
+            if member.bot or str(member.id) in participantes:
+                continue
+            if criada is not None and member.joined_at is not None and member.joined_at > criada:
+                continue
+            ausentes.append(str(member.id))
+    guild_id = str(guild.id) if guild is not None else call.get("guild_id") or ""
+    operacoes = [
+        (
+            "INSERT OR REPLACE INTO chamadas_arquivo VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(call_id, guild_id, call.get("channel_id"), call.get("titulo"), call.get("data_hora"), call.get("criador_id"), call.get("criado_em"), agora, len(participantes), len(ausentes))],
+        ),
+        ("INSERT OR IGNORE INTO presencas (call_id, user_id, entrou_em) VALUES (?, ?, ?)", [(call_id, uid, t) for uid, t in participantes.items()]),
+    ]
+    if ausentes:
+        operacoes.append(
+            (
+                "INSERT INTO tracinhos (guild_id, user_id, total, ultima_ausencia) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET total = total + 1, ultima_ausencia = excluded.ultima_ausencia",
+                [(guild_id, uid, agora) for uid in ausentes],
+            )
+        )
+    return operacoes
+
+
+def tracinhos_membro(guild_id, user_id) -> int:
+    linha = bot.banco.ler("SELECT total FROM tracinhos WHERE guild_id = ? AND user_id = ?", (str(guild_id), str(user_id)))
+    return linha[0][0] if linha else 0
+
+
+def presenca_ultimas_chamadas(guild_id, user_id, ultimas: int) -> tuple:
+    """(presenças, chamadas consideradas) nas últimas `ultimas` chamadas encerradas do servidor."""
+    return bot.banco.ler(
+        "SELECT COUNT(p.user_id), COUNT(*) FROM "
+        "(SELECT call_id FROM chamadas_arquivo WHERE guild_id = ? ORDER BY encerrada_em DESC LIMIT ?) c "
+        "LEFT JOIN presencas p ON p.call_id = c.call_id AND p.user_id = ?",
+        (str(guild_id), ultimas, str(user_id)),
+    )[0]
+
+
+async def encerrar_chamada_apos_tempo(call_id: str, etapas: set = None):
+    """etapas: "editar"/"avisar" já feitas numa tentativa anterior (retentativa por 429 pula essas)."""
+    etapas = set() if etapas is None else etapas
+    try:
+        await bot.wait_until_ready()
         if call_id not in bot.call_data:
             return
         call = bot.call_data[call_id]
-        participantes = bot.call_participants.get(call_id, [])
+        participantes = bot.call_participants.get(call_id, {})
+        bot.edicoes.cancelar(call["message_id"])
+        bot.renders_chamada.pop(call_id, None)
+        bot.cancelar_lembretes(call_id)
         channel = bot.get_channel(int(call["channel_id"]))
         if channel:
             try:
-                message = await channel.fetch_message(int(call["message_id"]))
-                if message:
-                    motivo = f"APÓS {call['horas_duracao']} HORA(S)" if call.get("horas_duracao") else "À MEIA-NOITE (23:59 Brasília)"
-                    participantes_text = ""
-                    if participantes:
-                        participantes_list = []
-                        for pid in participantes[:20]:
-                            member = channel.guild.get_member(int(pid))
-                            if member:
-                                participantes_list.append(f"• {member.mention}")
-                        if participantes_list:
-                            participantes_text = "\n".join(participantes_list)
-                            if len(participantes) > 20:
-                                participantes_text += f"\n... e mais {len(participantes) - 20}"
-                    else:
-                        participantes_text = "Ninguém compareceu 😢"
-                    embed_final = discord.Embed(
-                        title="📦 𝐇𝐎𝐔𝐒𝐄 ִ 𝐂̷̸𝐇𝐀𝐌𝐀𝐃𝐀 [ENCERRADA]",
-                        description=f"**CHAMADA ENCERRADA {motivo}**\n\nTotal de presentes: **{len(participantes)}**",
-                        color=discord.Color.dark_gray(),
-                    )
-                    embed_final.add_field(name="✅ LISTA FINAL", value=participantes_text[:1024], inline=False)
-                    encerrado_em = datetime.now(BR_TZ)
-                    embed_final.set_footer(text=f"Encerrada em {encerrado_em.strftime('%d/%m/%Y %H:%M')} (Brasília)")
-                    embed_final.timestamp = encerrado_em
+                message = bot.mensagem(channel.id, call["message_id"])
+                motivo = f"APÓS {call['horas_duracao']} HORA(S)" if call.get("horas_duracao") else "À MEIA-NOITE (23:59 Brasília)"
+                participantes_text = ""
+                if participantes:
+                    participantes_list = []
+                    for pid in itertools.islice(participantes, 20):
+                        member = channel.guild.get_member(int(pid))
+                        if member:
+                            participantes_list.append(f"• {member.mention}")
+                    if participantes_list:
+                        participantes_text = "\n".join(participantes_list)
+                        if len(participantes) > 20:
+                            participantes_text += f"\n... e mais {len(participantes) - 20}"
+                else:
+                    participantes_text = "Ninguém compareceu 😢"
+                embed_final = discord.Embed(
+                    title="📦 𝐇𝐎𝐔𝐒𝐄 ִ 𝐂̷̸𝐇𝐀𝐌𝐀𝐃𝐀 [ENCERRADA]",
+                    description=f"**CHAMADA ENCERRADA {motivo}**\n\nTotal de presentes: **{len(participantes)}**",
+                    color=discord.Color.dark_gray(),
+                )
+                embed_final.add_field(name="✅ LISTA FINAL", value=participantes_text[:1024], inline=False)
+                encerrado_em = datetime.now(BR_TZ)
+                embed_final.set_footer(text=f"Encerrada em {encerrado_em.strftime('%d/%m/%Y %H:%M')} (Brasília)")
+                embed_final.timestamp = encerrado_em
+                if "editar" not in etapas:
                     await message.edit(embed=embed_final, view=None)
+                    etapas.add("editar")
+                if "avisar" not in etapas:
                     await channel.send(f"⏰ **Chamada encerrada!** Total de {len(participantes)} presente(s)! 📊")
+                    etapas.add("avisar")
             except Exception as e:
+                if limite_atingido(e):
+                    raise
                 print(f"❌ Erro ao editar mensagem: {e}")
+        bot.esquecer_mensagem(call["message_id"])
+        guild = channel.guild if channel else bot.get_guild(int(call["guild_id"])) if call.get("guild_id") else None
+        bot.escritor.enviar(operacoes_arquivo_chamada(call_id, call, participantes, guild))
         if call_id in bot.call_data:
             del bot.call_data[call_id]
         if call_id in bot.call_participants:
             del bot.call_participants[call_id]
-        if call_id in bot.active_tasks:
-            del bot.active_tasks[call_id]
         bot.save_data()
     except asyncio.CancelledError:
         pass
     except Exception as e:
+        if limite_atingido(e):
+            raise
         print(f"❌ Erro ao encerrar chamada: {e}")
         traceback.print_exc()
 
@@ -888,7 +2888,7 @@ async def chamada(
         embed.set_thumbnail(url=interaction.guild.icon.url)
     embed.set_footer(text="Clique no botão abaixo para confirmar sua presença!")
     embed.timestamp = datetime.now(BR_TZ)
-    view = CallView(call_id, emoji, expira_em)
+    view = CallView(call_id, emoji)
     await interaction.response.send_message(
         content="@everyone",
         embed=embed,
@@ -909,8 +2909,9 @@ async def chamada(
         "expira_em": expira_em.isoformat(),
         "criado_em": datetime.now(BR_TZ).isoformat(),
         "horas_duracao": horas_duracao,
+        "guild_id": str(interaction.guild_id),
     }
-    bot.call_participants[call_id] = []
+    bot.call_participants[call_id] = {}
     bot.save_data()
     confirm_msg = (
         f"⏰ Expira em {horas_duracao} hora(s) (às {expira_em.strftime('%H:%M')} Brasília)"
@@ -922,20 +2923,20 @@ async def chamada(
     embed_confirm.add_field(name="📅 Data/Hora", value=data_hora, inline=True)
     embed_confirm.add_field(name="⏱️ Expira em", value=expira_em.strftime("%d/%m/%Y %H:%M") + " (Brasília)", inline=True)
     await interaction.followup.send(embed=embed_confirm, ephemeral=True)
-    bot.active_tasks[call_id] = asyncio.create_task(encerrar_chamada_apos_tempo(call_id, expira_em))
+    bot.agendar_chamada(call_id, expira_em)
 
 
 @bot.tree.command(name="chamada_info", description="ℹ️ Ver informações de uma chamada")
 async def chamada_info(interaction: discord.Interaction, message_id: str = None):
     if not message_id:
-        calls = [(cid, data) for cid, data in bot.call_data.items() if data.get("channel_id") == str(interaction.channel.id)]
+        calls = [(cid, bot.call_data[cid]) for cid in bot.call_data.ids_por("channel_id", interaction.channel.id)]
         if not calls:
             await interaction.response.send_message("❌ Nenhuma chamada no canal!", ephemeral=True)
             return
         calls.sort(key=lambda x: x[1]["criado_em"], reverse=True)
         embed = discord.Embed(title="📋 Últimas Chamadas", color=discord.Color.blue())
         for cid, data in calls[:5]:
-            participantes = len(bot.call_participants.get(cid, []))
+            participantes = len(bot.call_participants.get(cid, {}))
             expira_em = datetime.fromisoformat(data["expira_em"]).replace(tzinfo=BR_TZ)
             status = "🟢 Ativa" if expira_em > datetime.now(BR_TZ) else "🔴 Encerrada"
             embed.add_field(
@@ -945,16 +2946,12 @@ async def chamada_info(interaction: discord.Interaction, message_id: str = None)
             )
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
-    call_id = None
-    for cid, data in bot.call_data.items():
-        if data["message_id"] == message_id:
-            call_id = cid
-            break
+    call_id = bot.call_data.id_por_mensagem(message_id)
     if not call_id:
         await interaction.response.send_message("❌ Chamada não encontrada!", ephemeral=True)
         return
     data = bot.call_data[call_id]
-    participantes = bot.call_participants.get(call_id, [])
+    participantes = bot.call_participants.get(call_id, {})
     expira_em = datetime.fromisoformat(data["expira_em"]).replace(tzinfo=BR_TZ)
     status = "🟢 Ativa" if expira_em > datetime.now(BR_TZ) else "🔴 Encerrada"
     embed = discord.Embed(title=f"📊 {data['titulo']}", color=discord.Color.blue())
@@ -965,7 +2962,7 @@ async def chamada_info(interaction: discord.Interaction, message_id: str = None)
     embed.add_field(name="📊 Status", value=status, inline=True)
     if participantes:
         lista = ""
-        for pid in participantes[:15]:
+        for pid in itertools.islice(participantes, 15):
             member = interaction.guild.get_member(int(pid))
             if member:
                 lista += f"• {member.mention}\n"
@@ -974,14 +2971,90 @@ async def chamada_info(interaction: discord.Interaction, message_id: str = None)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
+EXPORTACAO_LOTE = 1000
+EXPORTACAO_MEMORIA = 1024 * 1024
+
+
+async def gerar_exportacao(colunas: tuple, linhas, formato: str):
+    """
+    Escreve `linhas` (iterável de tuplas) em CSV ou NDJSON num SpooledTemporaryFile (vai pro disco
+    acima de 1 MB), de EXPORTACAO_LOTE em EXPORTACAO_LOTE linhas, cedendo o loop entre os lotes.
+    Devolve (arquivo binário posicionado no início, quantidade de linhas).
+    """
+    arquivo = tempfile.SpooledTemporaryFile(max_size=EXPORTACAO_MEMORIA, mode="w+b")
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8", newline="")
+    escritor_csv = csv.writer(texto)
+    if formato == "csv":
+        escritor_csv.writerow(colunas)
+    total = 0
+    while True:
+        lote = list(itertools.islice(linhas, EXPORTACAO_LOTE))
+        if not lote:
+            break
+        if formato == "csv":
+            escritor_csv.writerows(lote)
+        else:
+            for linha in lote:
+                texto.write(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n")
+        total += len(lote)
+        await asyncio.sleep(0)
+    texto.flush()
+    texto.detach()
+    arquivo.seek(0)
+    return arquivo, total
+
+
+FORMATOS_EXPORTACAO = [app_commands.Choice(name="CSV", value="csv"), app_commands.Choice(name="NDJSON", value="ndjson")]
+
+
+async def enviar_exportacao(interaction: discord.Interaction, tipo: str, rid: str, data: dict, formato: str):
+    """Anexa (ephemeral) os votos da enquete ou as presenças da chamada; só criador ou admin."""
+    if str(interaction.user.id) != data["criador_id"] and not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Só o criador ou admin pode exportar!", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    guild = interaction.guild
+
+    def nome(uid):
+        member = guild.get_member(uid) if guild else None
+        return member.display_name if member else ""
+
+    if tipo == "enquete":
+        # Cópia crua dos buffers (sem formatar nada): a exportação cede o loop entre lotes e um memoryview
+        # vivo travaria o array — o próximo voto novo (ids.insert) daria BufferError.
+        votos = data["votos_usuario"]
+        ids, escolhas, opcoes = array("q", votos.ids), bytes(votos.opcoes), list(data["opcoes"])
+        colunas = ("user_id", "nome", "opcao_index", "opcao")
+        linhas = ((str(uid), nome(uid), o, opcoes[o] if o < len(opcoes) else "") for uid, o in zip(ids, escolhas))
+    else:
+        participantes = list(bot.call_participants.get(rid, {}).items())
+        colunas = ("posicao", "user_id", "nome", "entrou_em")
+        linhas = (
+            (i, uid, nome(int(uid)), datetime.fromtimestamp(t, BR_TZ).isoformat() if t else "")
+            for i, (uid, t) in enumerate(participantes, 1)
+        )
+    arquivo, total = await gerar_exportacao(colunas, linhas, formato)
+    with arquivo:
+        await interaction.followup.send(
+            f"📤 {total} linha(s) exportada(s).",
+            file=discord.File(arquivo, filename=f"{tipo}_{rid}.{formato}"),
+            ephemeral=True,
+        )
+
+
 @bot.tree.command(name="chamada_lista", description="📋 Ver lista completa de participantes")
-async def chamada_lista(interaction: discord.Interaction, message_id: str):
-    call_id = next((cid for cid, data in bot.call_data.items() if data["message_id"] == message_id), None)
+@app_commands.describe(exportar="Receber a lista completa como arquivo (criador/admin)")
+@app_commands.choices(exportar=FORMATOS_EXPORTACAO)
+async def chamada_lista(interaction: discord.Interaction, message_id: str, exportar: Optional[str] = None):
+    call_id = bot.call_data.id_por_mensagem(message_id)
     if not call_id:
         await interaction.response.send_message("❌ Chamada não encontrada!", ephemeral=True)
         return
     data = bot.call_data[call_id]
-    participantes = bot.call_participants.get(call_id, [])
+    if exportar:
+        await enviar_exportacao(interaction, "chamada", call_id, data, exportar)
+        return
+    participantes = bot.call_participants.get(call_id, {})
     if not participantes:
         await interaction.response.send_message("📋 Ninguém confirmou ainda!", ephemeral=True)
         return
@@ -1005,7 +3078,7 @@ async def chamada_lista(interaction: discord.Interaction, message_id: str):
 
 @bot.tree.command(name="chamada_cancelar", description="❌ Cancelar uma chamada")
 async def chamada_cancelar(interaction: discord.Interaction, message_id: str):
-    call_id = next((cid for cid, data in bot.call_data.items() if data["message_id"] == message_id), None)
+    call_id = bot.call_data.id_por_mensagem(message_id)
     if not call_id:
         await interaction.response.send_message("❌ Chamada não encontrada!", ephemeral=True)
         return
@@ -1013,22 +3086,23 @@ async def chamada_cancelar(interaction: discord.Interaction, message_id: str):
     if str(interaction.user.id) != data["criador_id"] and not interaction.user.guild_permissions.administrator:
         await interaction.response.send_message("❌ Só o criador ou admin pode cancelar!", ephemeral=True)
         return
-    if call_id in bot.active_tasks:
-        bot.active_tasks[call_id].cancel()
-        del bot.active_tasks[call_id]
+    bot.agendador.cancelar(("chamada", call_id))
+    bot.cancelar_lembretes(call_id)
+    bot.edicoes.cancelar(data["message_id"])
+    bot.renders_chamada.pop(call_id, None)
     try:
         channel = bot.get_channel(int(data["channel_id"]))
         if channel:
-            msg = await channel.fetch_message(int(message_id))
-            if msg:
-                embed_cancel = discord.Embed(
-                    title="❌ CHAMADA CANCELADA",
-                    description=f"**{data['titulo']}** cancelada por {interaction.user.mention}",
-                    color=discord.Color.red(),
-                )
-                await msg.edit(content=None, embed=embed_cancel, view=None)
+            msg = bot.mensagem(channel.id, message_id)
+            embed_cancel = discord.Embed(
+                title="❌ CHAMADA CANCELADA",
+                description=f"**{data['titulo']}** cancelada por {interaction.user.mention}",
+                color=discord.Color.red(),
+            )
+            await msg.edit(content=None, embed=embed_cancel, view=None)
     except Exception:
         pass
+    bot.esquecer_mensagem(message_id)
     del bot.call_data[call_id]
     if call_id in bot.call_participants:
         del bot.call_participants[call_id]
@@ -1040,17 +3114,17 @@ async def chamada_cancelar(interaction: discord.Interaction, message_id: str):
 async def chamada_listar_ativas(interaction: discord.Interaction):
     agora = datetime.now(BR_TZ)
     ativas = []
-    for call_id, data in bot.call_data.items():
-        if data.get("channel_id") == str(interaction.channel.id):
-            expira_em = datetime.fromisoformat(data["expira_em"]).replace(tzinfo=BR_TZ)
-            if expira_em > agora:
-                ativas.append((call_id, data, expira_em))
+    for call_id in bot.call_data.ids_por("channel_id", interaction.channel.id):
+        data = bot.call_data[call_id]
+        expira_em = datetime.fromisoformat(data["expira_em"]).replace(tzinfo=BR_TZ)
+        if expira_em > agora:
+            ativas.append((call_id, data, expira_em))
     if not ativas:
         await interaction.response.send_message("📋 Nenhuma chamada ativa neste canal!", ephemeral=True)
         return
     embed = discord.Embed(title="📋 Chamadas Ativas", description=f"Total: {len(ativas)}", color=discord.Color.green())
     for call_id, data, expira_em in ativas:
-        participantes = len(bot.call_participants.get(call_id, []))
+        participantes = len(bot.call_participants.get(call_id, {}))
         tempo_restante = expira_em - agora
         horas = int(tempo_restante.total_seconds() // 3600)
         minutos = int((tempo_restante.total_seconds() % 3600) // 60)
@@ -1062,18 +3136,84 @@ async def chamada_listar_ativas(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
+@bot.tree.command(name="chamada_dm", description="✉️ Receber ou não o DM de confirmação das chamadas")
+@app_commands.describe(receber="Receber DM ao confirmar presença")
+async def chamada_dm(interaction: discord.Interaction, receber: bool):
+    uid = str(interaction.user.id)
+    if receber:
+        bot.dms.optout.discard(uid)
+        bot.escritor.enviar([("DELETE FROM dm_optout WHERE user_id = ?", [(uid,)])])
+        await interaction.response.send_message("✅ Você voltará a receber o DM de confirmação.", ephemeral=True)
+    else:
+        bot.dms.optout.add(uid)
+        bot.escritor.enviar([("INSERT OR REPLACE INTO dm_optout (user_id, desde) VALUES (?, ?)", [(uid, time.time())])])
+        await interaction.response.send_message("🔕 Você não receberá mais o DM de confirmação.", ephemeral=True)
+
+
+@bot.tree.command(name="chamada_relatorio", description="📊 Presenças e tracinhos (admin)")
+@app_commands.describe(membro="Ver só este membro", ultimas="Quantas chamadas recentes considerar (padrão: 10)")
+async def chamada_relatorio(interaction: discord.Interaction, membro: Optional[discord.Member] = None, ultimas: int = 10):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Só administradores!", ephemeral=True)
+        return
+    ultimas = max(1, min(ultimas, 100))
+    await interaction.response.defer(ephemeral=True)
+    # O arquivo de uma chamada é enfileirado antes dela sumir da memória: basta o escritor alcançar esse ponto.
+    await bot.escritor.alcancar()
+    guild_id = interaction.guild_id
+    if membro:
+        presencas, chamadas = await asyncio.to_thread(presenca_ultimas_chamadas, guild_id, membro.id, ultimas)
+        tracinhos = await asyncio.to_thread(tracinhos_membro, guild_id, membro.id)
+        embed = discord.Embed(title="📊 Relatório de Presença", description=membro.mention, color=discord.Color.blue())
+        embed.add_field(name="📝 Tracinhos", value=f"{tracinhos}/{TRACINHOS_LIMITE}", inline=True)
+        taxa = f"{presencas}/{chamadas} ({presencas / chamadas * 100:.0f}%)" if chamadas else "Nenhuma chamada encerrada"
+        embed.add_field(name=f"✅ Presença (últimas {ultimas})", value=taxa, inline=True)
+        if tracinhos >= TRACINHOS_LIMITE:
+            embed.add_field(name="⚠️ Atenção", value="Atingiu o limite de tracinhos!", inline=False)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+    recentes = await asyncio.to_thread(
+        bot.banco.ler,
+        "SELECT titulo, data_hora, presentes, ausentes FROM chamadas_arquivo WHERE guild_id = ? ORDER BY encerrada_em DESC LIMIT ?",
+        (str(guild_id), ultimas),
+    )
+    maiores = await asyncio.to_thread(
+        bot.banco.ler,
+        "SELECT user_id, total FROM tracinhos WHERE guild_id = ? AND total > 0 ORDER BY total DESC LIMIT 15",
+        (str(guild_id),),
+    )
+    embed = discord.Embed(title="📊 Relatório de Chamadas", color=discord.Color.blue())
+    if recentes:
+        presentes = sum(r[2] for r in recentes)
+        total = presentes + sum(r[3] for r in recentes)
+        embed.description = f"Últimas {len(recentes)} chamada(s): **{presentes / total * 100 if total else 0:.0f}%** de presença"
+        linhas = [f"📢 {titulo[:30]} ({data_hora}) — ✅ {p} | ❌ {a}" for titulo, data_hora, p, a in recentes[:10]]
+        embed.add_field(name="📋 Chamadas recentes", value="\n".join(linhas)[:1024], inline=False)
+    else:
+        embed.description = "Nenhuma chamada encerrada ainda."
+    if maiores:
+        linhas = [f"{'⚠️' if t >= TRACINHOS_LIMITE else '•'} <@{uid}> — {t} tracinho(s)" for uid, t in maiores]
+        embed.add_field(name="📝 Mais tracinhos", value="\n".join(linhas), inline=False)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
 @bot.tree.command(name="enquete", description="📊 Criar uma enquete dinâmica")
 async def enquete_criar(interaction: discord.Interaction):
     await interaction.response.send_modal(CriarEnqueteModal())
 
 
 @bot.tree.command(name="enquete_info", description="ℹ️ Ver informações de uma enquete")
-async def enquete_info(interaction: discord.Interaction, message_id: str):
-    enquete_id = next((eid for eid, data in bot.enquetes.items() if data.get("message_id") == message_id), None)
+@app_commands.describe(exportar="Receber quem votou em quê como arquivo (criador/admin)")
+@app_commands.choices(exportar=FORMATOS_EXPORTACAO)
+async def enquete_info(interaction: discord.Interaction, message_id: str, exportar: Optional[str] = None):
+    enquete_id = bot.enquetes.id_por_mensagem(message_id)
     if not enquete_id:
         await interaction.response.send_message("❌ Enquete não encontrada!", ephemeral=True)
         return
     data = bot.enquetes[enquete_id]
+    if exportar:
+        await enviar_exportacao(interaction, "enquete", enquete_id, data, exportar)
+        return
     total_votos = sum(data["votos"])
     embed = discord.Embed(title="📊 Informações da Enquete", description=f"**{data['pergunta']}**", color=discord.Color.blue())
     embed.add_field(name="📝 Opções", value=str(len(data["opcoes"])), inline=True)
@@ -1086,15 +3226,15 @@ async def enquete_info(interaction: discord.Interaction, message_id: str):
 async def enquete_listar(interaction: discord.Interaction):
     agora = datetime.now(BR_TZ)
     ativas = []
-    for eid, data in bot.enquetes.items():
-        if data.get("channel_id") == str(interaction.channel.id):
-            expira = data.get("expira_em")
-            if expira:
-                expira_dt = datetime.fromisoformat(expira).replace(tzinfo=BR_TZ)
-                if expira_dt > agora:
-                    ativas.append((eid, data, expira_dt))
-            else:
-                ativas.append((eid, data, None))
+    for eid in bot.enquetes.ids_por("channel_id", interaction.channel.id):
+        data = bot.enquetes[eid]
+        expira = data.get("expira_em")
+        if expira:
+            expira_dt = datetime.fromisoformat(expira).replace(tzinfo=BR_TZ)
+            if expira_dt > agora:
+                ativas.append((eid, data, expira_dt))
+        else:
+            ativas.append((eid, data, None))
     if not ativas:
         await interaction.response.send_message("📋 Nenhuma enquete ativa neste canal!", ephemeral=True)
         return
@@ -1112,7 +3252,7 @@ async def enquete_listar(interaction: discord.Interaction):
 
 @bot.tree.command(name="enquete_gerenciar", description="⚙️ Gerenciar uma enquete")
 async def enquete_gerenciar(interaction: discord.Interaction, message_id: str):
-    enquete_id = next((eid for eid, data in bot.enquetes.items() if data.get("message_id") == message_id), None)
+    enquete_id = bot.enquetes.id_por_mensagem(message_id)
     if not enquete_id:
         await interaction.response.send_message("❌ Enquete não encontrada!", ephemeral=True)
         return
@@ -1193,11 +3333,9 @@ class QuizPascoaView(View):
             if acertou:
                 pontos = random.randint(15, 25)
                 moedas = random.randint(100, 200)
-                bot.add_pascoa_pontos(str(interaction.user.id), pontos)
+                bot.add_pascoa_pontos(str(interaction.user.id), pontos, "pascoa_quiz", guild_id=interaction.guild_id)
                 uid = str(interaction.user.id)
-                if uid not in bot.user_balances:
-                    bot.user_balances[uid] = 0
-                bot.user_balances[uid] += moedas
+                bot.movimentar(uid, moedas, "pascoa_quiz", guild_id=interaction.guild_id)
                 bot.save_data()
                 embed = discord.Embed(
                     title="🎉 CORRETO!",
@@ -1218,81 +3356,117 @@ class QuizPascoaView(View):
         return callback
 
 
-class PascoaMemoryButton(Button):
-    def __init__(self, game_id: str, index: int):
-        super().__init__(style=discord.ButtonStyle.secondary, label="🥚", row=min(index // 5, 4))
-        self.game_id = game_id
+# Estado dos jogos vai no próprio custom_id (um DynamicItem atende todas as mensagens; nada fica no bot).
+# O tabuleiro não: sai de um RNG semeado com o id do jogo + bot.segredo_jogos, então o custom_id não entrega a resposta.
+JOGO_OCIOSO = 120
+
+
+def base36(n: int) -> str:
+    digitos = ""
+    while True:
+        n, r = divmod(n, 36)
+        digitos = "0123456789abcdefghijklmnopqrstuvwxyz"[r] + digitos
+        if not n:
+            return digitos
+
+
+def sorteio_jogo(tipo: str, jogo: str) -> random.Random:
+    digest = hashlib.blake2b(f"{tipo}:{jogo}".encode(), key=bot.segredo_jogos, digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+
+async def validar_jogada(interaction: discord.Interaction, uid: str) -> bool:
+    """Dono do jogo, jogo não ocioso há mais de JOGO_OCIOSO s e estado ainda não processado (clique duplo)."""
+    if str(interaction.user.id) != uid:
+        await interaction.response.send_message("❌ Não é seu jogo!", ephemeral=True)
+        return False
+    msg = interaction.message
+    if (datetime.now(timezone.utc) - (msg.edited_at or msg.created_at)).total_seconds() > JOGO_OCIOSO:
+        await interaction.response.edit_message(view=None)
+        await interaction.followup.send("⏰ Jogo expirado.", ephemeral=True)
+        return False
+    if not bot.jogada_nova((msg.id, interaction.data.get("custom_id", "").rsplit(":", 1)[0])):
+        await interaction.response.send_message("⏳ Calma, uma jogada por vez!", ephemeral=True)
+        return False
+    return True
+
+
+MEMORIA_EMOJIS = ["🐣", "🐇", "🌷", "🍫", "🌸", "🎀"]
+
+
+def tabuleiro_memoria(jogo: str) -> list:
+    board = MEMORIA_EMOJIS * 2
+    sorteio_jogo("memoria", jogo).shuffle(board)
+    return board
+
+
+class PascoaMemoryButton(discord.ui.DynamicItem[Button], template=r"pmem:(?P<uid>\d+):(?P<jogo>[0-9a-z]+):(?P<jogada>[0-9a-f]+):(?P<achados>[0-9a-f]+):(?P<primeiro>-|\d+):(?P<index>\d+)"):
+    """custom_id = pmem:dono:jogo:nº da jogada:máscara das casas achadas (hex):primeira casa virada:esta casa."""
+
+    def __init__(self, uid: str, jogo: str, jogada: int, achados: int, primeiro: Optional[int], index: int, label: str = "🥚", disabled: bool = False):
+        super().__init__(
+            Button(
+                style=discord.ButtonStyle.secondary,
+                label=label,
+                disabled=disabled,
+                row=min(index // 5, 4),
+                custom_id=f"pmem:{uid}:{jogo}:{jogada:x}:{achados:x}:{'-' if primeiro is None else primeiro}:{index}",
+            )
+        )
+        self.uid = uid
+        self.jogo = jogo
+        self.jogada = jogada
+        self.achados = achados
+        self.primeiro = primeiro
         self.index = index
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        primeiro = None if match["primeiro"] == "-" else int(match["primeiro"])
+        return cls(match["uid"], match["jogo"], int(match["jogada"], 16), int(match["achados"], 16), primeiro, int(match["index"]))
+
     async def callback(self, interaction: discord.Interaction):
-        game = bot.pascoa_memoria.get(self.game_id)
-        if not game or game.get("done"):
-            await interaction.response.send_message("❌ Jogo encerrado.", ephemeral=True)
-            return
-        if str(interaction.user.id) != game["user_id"]:
-            await interaction.response.send_message("❌ Não é seu jogo!", ephemeral=True)
+        if not await validar_jogada(interaction, self.uid):
             return
-        if self.index in game["matched"] or self.index == game.get("first_pick"):
+        achados, index = self.achados, self.index
+        if achados >> index & 1 or index == self.primeiro:
             await interaction.response.send_message("❌ Escolha outra casa.", ephemeral=True)
             return
-        labels = game["labels"]
-        if game["first_pick"] is None:
-            game["first_pick"] = self.index
-            self.label = labels[self.index]
-            self.disabled = True
-            await interaction.response.edit_message(view=self.view)
+        labels = tabuleiro_memoria(self.jogo)
+        uid, jogo, jogada = self.uid, self.jogo, self.jogada + 1
+        if self.primeiro is None:
+            await interaction.response.edit_message(view=PascoaMemoryView(uid, jogo, jogada, achados, index))
             return
-        i1, i2 = game["first_pick"], self.index
-        game["first_pick"] = None
-        b1 = next(b for b in self.view.children if isinstance(b, PascoaMemoryButton) and b.index == i1)
-        b2 = self
-        b1.label = labels[i1]
-        b2.label = labels[i2]
-        b1.disabled = True
-        b2.disabled = True
-        uid = game["user_id"]
+        i1, i2 = self.primeiro, index
         if labels[i1] == labels[i2]:
-            game["matched"].update([i1, i2])
-            game["pairs"] += 1
-            bot.add_pascoa_pontos(uid, 12)
-            if uid not in bot.user_balances:
-                bot.user_balances[uid] = 0
-            bot.user_balances[uid] += random.randint(20, 60)
+            achados |= (1 << i1) | (1 << i2)
+            bot.add_pascoa_pontos(uid, 12, "pascoa_memoria", guild_id=interaction.guild_id)
+            bot.movimentar(uid, random.randint(20, 60), "pascoa_memoria", guild_id=interaction.guild_id)
             bot.save_data()
-            total_pairs = len(labels) // 2
-            if game["pairs"] >= total_pairs:
-                game["done"] = True
-                bot.add_pascoa_pontos(uid, 25)
+            if achados == (1 << len(labels)) - 1:
+                bot.add_pascoa_pontos(uid, 25, "pascoa_memoria", guild_id=interaction.guild_id)
                 bot.save_data()
-                for child in self.view.children:
-                    if isinstance(child, PascoaMemoryButton):
-                        child.disabled = True
                 embed = discord.Embed(
                     title="🐣 Memória de Páscoa — vitória!",
                     description="Todos os pares encontrados! +25 pts bônus.",
                     color=discord.Color.gold(),
                 )
-                await interaction.response.edit_message(embed=embed, view=self.view)
-                self.view.stop()
+                await interaction.response.edit_message(embed=embed, view=PascoaMemoryView(uid, jogo, jogada, achados, None, fim=True))
                 return
-            await interaction.response.edit_message(view=self.view)
+            await interaction.response.edit_message(view=PascoaMemoryView(uid, jogo, jogada, achados, None))
             return
-        await interaction.response.defer()
-        await interaction.edit_original_response(view=self.view)
+        await interaction.response.edit_message(view=PascoaMemoryView(uid, jogo, jogada, achados, None, mostrar=(i1, i2)))
         await asyncio.sleep(1.2)
-        b1.label = "🥚"
-        b2.label = "🥚"
-        b1.disabled = False
-        b2.disabled = False
-        await interaction.edit_original_response(view=self.view)
+        await interaction.edit_original_response(view=PascoaMemoryView(uid, jogo, jogada, achados, None))
 
 
 class PascoaMemoryView(View):
-    def __init__(self, game_id: str, size: int):
-        super().__init__(timeout=120)
-        self.game_id = game_id
-        for i in range(size):
-            self.add_item(PascoaMemoryButton(game_id, i))
+    def __init__(self, uid: str, jogo: str, jogada: int = 0, achados: int = 0, primeiro: Optional[int] = None, mostrar=(), fim: bool = False):
+        super().__init__(timeout=None)
+        labels = tabuleiro_memoria(jogo)
+        for i, label in enumerate(labels):
+            aberto = achados >> i & 1 or i == primeiro or i in mostrar
+            self.add_item(PascoaMemoryButton(uid, jogo, jogada, achados, primeiro, i, label if aberto else "🥚", disabled=bool(aberto or fim or mostrar)))
 
 
 PASCOA_ANAGRAMAS = [
@@ -1329,10 +3503,8 @@ class AnagramPascoaView(View):
             if lbl == correct:
                 pts = random.randint(18, 28)
                 moedas = random.randint(80, 180)
-                bot.add_pascoa_pontos(owner, pts)
-                if owner not in bot.user_balances:
-                    bot.user_balances[owner] = 0
-                bot.user_balances[owner] += moedas
+                bot.add_pascoa_pontos(owner, pts, "pascoa_anagrama", guild_id=interaction.guild_id)
+                bot.movimentar(owner, moedas, "pascoa_anagrama", guild_id=interaction.guild_id)
                 bot.save_data()
                 emb = discord.Embed(
                     title="✅ Acertou!",
@@ -1359,18 +3531,15 @@ async def pascoa_daily(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     agora = datetime.now(BR_TZ)
     hoje = agora.date()
-    if user_id in bot.pascoa_daily:
-        ultimo = datetime.fromisoformat(bot.pascoa_daily[user_id]).date()
-        if hoje == ultimo:
-            proximo = datetime(agora.year, agora.month, agora.day, 0, 0, 0, tzinfo=BR_TZ) + timedelta(days=1)
-            restante = proximo - agora
-            horas = int(restante.total_seconds() // 3600)
-            minutos = int((restante.total_seconds() % 3600) // 60)
-            await interaction.response.send_message(
-                f"🐇 Você já coletou hoje!\n⏰ Próximo em **{horas}h {minutos}m**",
-                ephemeral=True,
-            )
-            return
+    restante = bot.cooldowns.restante(user_id, "pascoa_daily")
+    if restante:
+        horas = int(restante // 3600)
+        minutos = int((restante % 3600) // 60)
+        await interaction.response.send_message(
+            f"🐇 Você já coletou hoje!\n⏰ Próximo em **{horas}h {minutos}m**",
+            ephemeral=True,
+        )
+        return
     pontos_base = random.randint(10, 30)
     moedas_base = random.randint(200, 600)
     bonus = ""
@@ -1387,11 +3556,9 @@ async def pascoa_daily(interaction: discord.Interaction):
         bonus = "🌸 **Bônus!** +10 pts +150 moedas!"
     total_pontos = pontos_base + extra_pontos
     total_moedas = moedas_base + extra_moedas
-    bot.add_pascoa_pontos(user_id, total_pontos)
-    if user_id not in bot.user_balances:
-        bot.user_balances[user_id] = 0
-    bot.user_balances[user_id] += total_moedas
-    bot.pascoa_daily[user_id] = agora.isoformat()
+    bot.add_pascoa_pontos(user_id, total_pontos, "pascoa_daily", guild_id=interaction.guild_id)
+    bot.movimentar(user_id, total_moedas, "pascoa_daily", guild_id=interaction.guild_id)
+    bot.cooldowns.ativar(user_id, "pascoa_daily", prazo=(datetime(hoje.year, hoje.month, hoje.day, tzinfo=BR_TZ) + timedelta(days=1)).timestamp())
     bot.save_data()
     pontos_total = bot.pascoa_pontos.get(user_id, 0)
     deco = easter_header()
@@ -1414,15 +3581,10 @@ async def pascoa_daily(interaction: discord.Interaction):
 @bot.tree.command(name="pascoa_quiz", description="🧠 Quiz de Páscoa (cooldown 30min)")
 async def pascoa_quiz(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
-    agora = datetime.now(BR_TZ)
-    if user_id in bot.pascoa_quiz_cd:
-        ultimo = datetime.fromisoformat(bot.pascoa_quiz_cd[user_id])
-        if ultimo.tzinfo is None:
-            ultimo = ultimo.replace(tzinfo=BR_TZ)
-        if agora - ultimo < timedelta(minutes=30):
-            restante = timedelta(minutes=30) - (agora - ultimo)
-            await interaction.response.send_message(f"🧠 Aguarde **{int(restante.total_seconds() // 60)} min**.", ephemeral=True)
-            return
+    restante = bot.cooldowns.restante(user_id, "pascoa_quiz")
+    if restante:
+        await interaction.response.send_message(f"🧠 Aguarde **{int(restante // 60)} min**.", ephemeral=True)
+        return
     pergunta_data = random.choice(QUIZ_PASCOA)
     view = QuizPascoaView(user_id, pergunta_data, pergunta_data["opcoes"], pergunta_data["correta"])
     deco = easter_header()
@@ -1432,33 +3594,20 @@ async def pascoa_quiz(interaction: discord.Interaction):
         color=discord.Color.from_str("#FF69B4"),
     )
     embed.set_footer(text="⏰ 30 segundos!")
-    bot.pascoa_quiz_cd[user_id] = agora.isoformat()
+    bot.cooldowns.ativar(user_id, "pascoa_quiz")
     await interaction.response.send_message(embed=embed, view=view)
 
 
 @bot.tree.command(name="pascoa_memoria", description="🧠 Jogo da memória — ganhe pontos!")
 async def pascoa_memoria(interaction: discord.Interaction):
-    user_id = str(interaction.user.id)
-    pairs = 6
-    emojis = ["🐣", "🐇", "🌷", "🍫", "🌸", "🎀"]
-    board = emojis[:pairs] * 2
-    random.shuffle(board)
-    game_id = str(interaction.id)
-    bot.pascoa_memoria[game_id] = {
-        "user_id": user_id,
-        "labels": board,
-        "first_pick": None,
-        "matched": set(),
-        "pairs": 0,
-        "done": False,
-    }
     embed = discord.Embed(
         title="🧠 Memória de Páscoa",
         description="Clique em duas 🥚. Forme **6 pares**! ⏱️ 2 min.",
         color=discord.Color.from_str("#FF69B4"),
     )
     embed.set_image(url=random.choice(GIFS_OVO))
-    await interaction.response.send_message(embed=embed, view=PascoaMemoryView(game_id, len(board)))
+    jogo = base36(interaction.id)
+    await interaction.response.send_message(embed=embed, view=PascoaMemoryView(str(interaction.user.id), jogo))
 
 
 @bot.tree.command(name="pascoa_anagrama", description="🔤 Adivinhe a palavra (4 opções)")
@@ -1500,13 +3649,11 @@ class NinjaEggButton(Button):
             if self.rnd >= 3:
                 bonus = 55
                 total = new_pts + bonus
-                bot.add_pascoa_pontos(self.uid, total)
-                if self.uid not in bot.user_balances:
-                    bot.user_balances[self.uid] = 0
+                bot.add_pascoa_pontos(self.uid, total, "pascoa_cacaninja", guild_id=interaction.guild_id)
                 moedas_bonus = random.randint(120, 280)
-                bot.user_balances[self.uid] += moedas_bonus
+                bot.movimentar(self.uid, moedas_bonus, "pascoa_cacaninja", guild_id=interaction.guild_id)
                 bot.save_data()
-                bot.pascoa_cacaninja_cd[self.uid] = datetime.now(BR_TZ).isoformat()
+                bot.cooldowns.ativar(self.uid, "pascoa_cacaninja")
                 emb = discord.Embed(
                     title="🏆 LENDÁRIO! Você limpou as 3 rodadas!",
                     description=f"**+{total}** pts de Páscoa (com bônus final)\n**+{moedas_bonus}** moedas\n_O coelho te nomeou caçador oficial._ 🐇✨",
@@ -1528,9 +3675,9 @@ class NinjaEggButton(Button):
             if nh <= 0:
                 consolo = self.pts // 4 if self.pts > 0 else 0
                 if consolo:
-                    bot.add_pascoa_pontos(self.uid, consolo)
+                    bot.add_pascoa_pontos(self.uid, consolo, "pascoa_cacaninja", guild_id=interaction.guild_id)
                 bot.save_data()
-                bot.pascoa_cacaninja_cd[self.uid] = datetime.now(BR_TZ).isoformat()
+                bot.cooldowns.ativar(self.uid, "pascoa_cacaninja")
                 lose_txt = f"Sem vidas! Fim de jogo.\n**+{consolo}** pts de consolação." if consolo else "Sem vidas! Fim de jogo.\nTreine o olhar e volte após o cooldown."
                 emb = discord.Embed(
                     title="💀 O coelho riu e sumiu no mato…",
@@ -1580,13 +3727,11 @@ class RoletaCoelhoView(View):
             weights = [0.18, 0.34, 0.28, 0.14, 0.06]
             texto, pts, moedas = random.choices(outcomes, weights=weights, k=1)[0]
             if pts:
-                bot.add_pascoa_pontos(uid, pts)
+                bot.add_pascoa_pontos(uid, pts, "pascoa_roleta", guild_id=interaction.guild_id)
             if moedas:
-                if uid not in bot.user_balances:
-                    bot.user_balances[uid] = 0
-                bot.user_balances[uid] += moedas
+                bot.movimentar(uid, moedas, "pascoa_roleta", guild_id=interaction.guild_id)
             bot.save_data()
-            bot.pascoa_roleta_cd[uid] = datetime.now(BR_TZ).isoformat()
+            bot.cooldowns.ativar(uid, "pascoa_roleta")
             cor = discord.Color.gold() if pts >= 28 else discord.Color.from_str("#FF69B4") if pts else discord.Color.dark_gray()
             emb = discord.Embed(
                 title="🎰 Roleta parou em…",
@@ -1605,16 +3750,11 @@ class RoletaCoelhoView(View):
 @bot.tree.command(name="pascoa_cacaninja", description="🥷 3 rodadas, 5 ovos — ache o dourado (3 ❤️)")
 async def pascoa_cacaninja(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
-    agora = datetime.now(BR_TZ)
-    raw = bot.pascoa_cacaninja_cd.get(user_id)
-    if raw:
-        ult = datetime.fromisoformat(raw)
-        if ult.tzinfo is None:
-            ult = ult.replace(tzinfo=BR_TZ)
-        if agora - ult < timedelta(minutes=25):
-            m = int((timedelta(minutes=25) - (agora - ult)).total_seconds() // 60)
-            await interaction.response.send_message(f"🥷 O coelho escondeu os ovos de novo. Volte em **{m} min**.", ephemeral=True)
-            return
+    restante = bot.cooldowns.restante(user_id, "pascoa_cacaninja")
+    if restante:
+        m = int(restante // 60)
+        await interaction.response.send_message(f"🥷 O coelho escondeu os ovos de novo. Volte em **{m} min**.", ephemeral=True)
+        return
     game_key = str(interaction.id)
     emb = discord.Embed(
         title="🥷 Caça-Ninja do Coelho",
@@ -1634,16 +3774,11 @@ async def pascoa_cacaninja(interaction: discord.Interaction):
 @bot.tree.command(name="pascoa_roleta", description="🎰 Roleta do coelho — prêmios variados (cooldown 25min)")
 async def pascoa_roleta(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
-    agora = datetime.now(BR_TZ)
-    raw = bot.pascoa_roleta_cd.get(user_id)
-    if raw:
-        ult = datetime.fromisoformat(raw)
-        if ult.tzinfo is None:
-            ult = ult.replace(tzinfo=BR_TZ)
-        if agora - ult < timedelta(minutes=25):
-            m = int((timedelta(minutes=25) - (agora - ult)).total_seconds() // 60)
-            await interaction.response.send_message(f"🎰 A roleta esfriando… **{m} min**.", ephemeral=True)
-            return
+    restante = bot.cooldowns.restante(user_id, "pascoa_roleta")
+    if restante:
+        m = int(restante // 60)
+        await interaction.response.send_message(f"🎰 A roleta esfriando… **{m} min**.", ephemeral=True)
+        return
     emb = discord.Embed(
         title="🎰 Roleta do Coelho da Páscoa",
         description="Um giro, um destino. Pode sair **nada**, ovos comuns ou **jackpot raro**.\n\nClique em **GIRAR** quando estiver pronto(a).",
@@ -1659,7 +3794,7 @@ def _boss_hp_bar(hp: int, max_hp: int = 100) -> str:
 
 
 async def _maratona_finish_cd(uid: str):
-    bot.pascoa_maratona_cd[uid] = datetime.now(BR_TZ).isoformat()
+    bot.cooldowns.ativar(uid, "pascoa_maratona")
 
 
 def _make_marathon_callback(user_id: str, questions: list, q_index: int, pick: int, correta_idx: int, pts: int, acertos: int):
@@ -1674,9 +3809,8 @@ def _make_marathon_callback(user_id: str, questions: list, q_index: int, pick: i
                 bonus = 55
                 total = novo_pts + bonus
                 moedas = random.randint(100, 220)
-                bot.add_pascoa_pontos(user_id, total)
-                bot.user_balances.setdefault(user_id, 0)
-                bot.user_balances[user_id] += moedas
+                bot.add_pascoa_pontos(user_id, total, "pascoa_maratona", guild_id=interaction.guild_id)
+                bot.movimentar(user_id, moedas, "pascoa_maratona", guild_id=interaction.guild_id)
                 bot.save_data()
                 await _maratona_finish_cd(user_id)
                 emb = discord.Embed(
@@ -1698,7 +3832,7 @@ def _make_marathon_callback(user_id: str, questions: list, q_index: int, pick: i
                 await interaction.response.edit_message(embed=emb, view=nv)
         else:
             consolo = max(4, pts // 3) if pts else 3
-            bot.add_pascoa_pontos(user_id, consolo)
+            bot.add_pascoa_pontos(user_id, consolo, "pascoa_maratona", guild_id=interaction.guild_id)
             bot.save_data()
             await _maratona_finish_cd(user_id)
             certa = questions[q_index]["opcoes"][correta_idx]
@@ -1774,11 +3908,10 @@ class BossAtaqueButton(Button):
         if nb <= 0:
             pts = random.randint(70, 110)
             moedas = random.randint(180, 350)
-            bot.add_pascoa_pontos(self.uid, pts)
-            bot.user_balances.setdefault(self.uid, 0)
-            bot.user_balances[self.uid] += moedas
+            bot.add_pascoa_pontos(self.uid, pts, "pascoa_boss", guild_id=interaction.guild_id)
+            bot.movimentar(self.uid, moedas, "pascoa_boss", guild_id=interaction.guild_id)
             bot.save_data()
-            bot.pascoa_boss_cd[self.uid] = datetime.now(BR_TZ).isoformat()
+            bot.cooldowns.ativar(self.uid, "pascoa_boss")
             emb = discord.Embed(
                 title="🎊 COELHO BOSS DERROTADO!",
                 description="\n".join(linhas)
@@ -1790,9 +3923,9 @@ class BossAtaqueButton(Button):
             await interaction.response.edit_message(embed=emb, view=None)
             return
         if hearts <= 0:
-            bot.pascoa_boss_cd[self.uid] = datetime.now(BR_TZ).isoformat()
+            bot.cooldowns.ativar(self.uid, "pascoa_boss")
             consolo = random.randint(8, 18)
-            bot.add_pascoa_pontos(self.uid, consolo)
+            bot.add_pascoa_pontos(self.uid, consolo, "pascoa_boss", guild_id=interaction.guild_id)
             bot.save_data()
             emb = discord.Embed(
                 title="💀 Você desmaiou de cansaço…",
@@ -1822,69 +3955,51 @@ class PascoaBossView(View):
             self.add_item(BossAtaqueButton(uid, boss_hp, hearts, t))
 
 
-class CampoOvoButton(Button):
-    def __init__(self, game_id: str, index: int):
-        super().__init__(style=discord.ButtonStyle.secondary, label="🥚", row=index // 4)
-        self.game_id = game_id
+def podres_campo(jogo: str) -> set:
+    return set(sorteio_jogo("campo", jogo).sample(range(6), 2))
+
+
+class CampoOvoButton(discord.ui.DynamicItem[Button], template=r"pcampo:(?P<uid>\d+):(?P<jogo>[0-9a-z]+):(?P<bons>[0-9a-f]+):(?P<index>\d+)"):
+    """custom_id = pcampo:dono:jogo:máscara dos ovos bons já abertos (hex):este ovo."""
+
+    def __init__(self, uid: str, jogo: str, bons: int, index: int, label: str = "🥚", style=discord.ButtonStyle.secondary, disabled: bool = False):
+        super().__init__(
+            Button(style=style, label=label, disabled=disabled, row=index // 4, custom_id=f"pcampo:{uid}:{jogo}:{bons:x}:{index}")
+        )
+        self.uid = uid
+        self.jogo = jogo
+        self.bons = bons
         self.index = index
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match: re.Match):
+        return cls(match["uid"], match["jogo"], int(match["bons"], 16), int(match["index"]))
+
     async def callback(self, interaction: discord.Interaction):
-        st = bot.pascoa_campo_state.get(self.game_id)
-        if not st:
-            await interaction.response.send_message("❌ Jogo expirado.", ephemeral=True)
+        if not await validar_jogada(interaction, self.uid):
             return
-        if str(interaction.user.id) != st["uid"]:
-            await interaction.response.send_message("❌ Não é seu campo!", ephemeral=True)
-            return
-        uid = st["uid"]
-        if self.index in st["revelados"]:
+        uid = self.uid
+        if self.bons >> self.index & 1:
             await interaction.response.send_message("❌ Você já abriu esse ovo!", ephemeral=True)
             return
-        st["revelados"].add(self.index)
-        if self.index in st["podres"]:
-            for child in self.view.children:
-                if isinstance(child, CampoOvoButton):
-                    child.disabled = True
-                    if child.index in st["podres"]:
-                        child.label = "🤢"
-                        child.style = discord.ButtonStyle.danger
-                    elif child.index in st["bons_coletados"]:
-                        child.label = "✨"
-                        child.style = discord.ButtonStyle.success
-                    else:
-                        child.label = "🥚"
-            bot.pascoa_campo_cd[uid] = datetime.now(BR_TZ).isoformat()
-            del bot.pascoa_campo_state[self.game_id]
+        if self.index in podres_campo(self.jogo):
+            bot.cooldowns.ativar(uid, "pascoa_campo")
             emb = discord.Embed(
                 title="🤢 ERA OVO PODRE!",
                 description="**BOOM** — cheiro horrível. Fim de jogo.\n\nOs ✨ eram os bons. Os 🤢 eram armadilha do coelho saboteador.",
                 color=discord.Color.dark_red(),
             )
             emb.set_image(url=random.choice(GIFS_OVO))
-            await interaction.response.edit_message(embed=emb, view=self.view)
+            await interaction.response.edit_message(embed=emb, view=PascoaCampoView(uid, self.jogo, self.bons, fim=True))
             return
-        st["bons_coletados"].add(self.index)
-        self.label = "✨"
-        self.style = discord.ButtonStyle.success
-        self.disabled = True
-        if len(st["bons_coletados"]) >= 3:
+        bons = self.bons | (1 << self.index)
+        if bin(bons).count("1") >= 3:
             pts = random.randint(35, 55)
             moedas = random.randint(90, 200)
-            bot.add_pascoa_pontos(uid, pts)
-            bot.user_balances.setdefault(uid, 0)
-            bot.user_balances[uid] += moedas
+            bot.add_pascoa_pontos(uid, pts, "pascoa_campo", guild_id=interaction.guild_id)
+            bot.movimentar(uid, moedas, "pascoa_campo", guild_id=interaction.guild_id)
             bot.save_data()
-            bot.pascoa_campo_cd[uid] = datetime.now(BR_TZ).isoformat()
-            del bot.pascoa_campo_state[self.game_id]
-            for child in self.view.children:
-                if isinstance(child, CampoOvoButton):
-                    child.disabled = True
-                    if child.index in st["podres"]:
-                        child.label = "🤢"
-                        child.style = discord.ButtonStyle.danger
-                    elif child.index in st["bons_coletados"]:
-                        child.label = "✨"
-                        child.style = discord.ButtonStyle.success
+            bot.cooldowns.ativar(uid, "pascoa_campo")
             emb = discord.Embed(
                 title="🌟 CAMPO LIMPO!",
                 description="Você achou **3 ovos de chocolate** sem pisar nos podres!\n\n🥚 **+{0}** pts\n🍫 **+{1}** moedas\n\n_O coelho admite derrota com um sorriso._".format(
@@ -1893,39 +4008,40 @@ class CampoOvoButton(Button):
                 color=discord.Color.gold(),
             )
             emb.set_image(url=random.choice(GIFS_CHOCOLHATE))
-            await interaction.response.edit_message(embed=emb, view=self.view)
+            await interaction.response.edit_message(embed=emb, view=PascoaCampoView(uid, self.jogo, bons, fim=True))
             return
-        restam = 3 - len(st["bons_coletados"])
+        restam = 3 - bin(bons).count("1")
         emb = discord.Embed(
             title="✨ Bom ovo!",
             description=f"Chocolate legítimo! Faltam **{restam}** ovo(s) bom(ns).\n\n**Dica:** existem **2 ovos podres** escondidos no campo. Escolha com cuidado.",
             color=discord.Color.green(),
         )
-        await interaction.response.edit_message(embed=emb, view=self.view)
+        await interaction.response.edit_message(embed=emb, view=PascoaCampoView(uid, self.jogo, bons))
 
 
 class PascoaCampoView(View):
     """6 ovos: 2 podres, 4 bons. Colete 3 bons sem abrir podre."""
 
-    def __init__(self, game_id: str):
-        super().__init__(timeout=120)
+    def __init__(self, uid: str, jogo: str, bons: int = 0, fim: bool = False):
+        super().__init__(timeout=None)
+        podres = podres_campo(jogo) if fim else ()
         for i in range(6):
-            self.add_item(CampoOvoButton(game_id, i))
+            if i in podres:
+                self.add_item(CampoOvoButton(uid, jogo, bons, i, "🤢", discord.ButtonStyle.danger, disabled=True))
+            elif bons >> i & 1:
+                self.add_item(CampoOvoButton(uid, jogo, bons, i, "✨", discord.ButtonStyle.success, disabled=True))
+            else:
+                self.add_item(CampoOvoButton(uid, jogo, bons, i, disabled=fim))
 
 
 @bot.tree.command(name="pascoa_maratona", description="🔥 3 perguntas seguidas — prêmio cresce (cooldown 20min)")
 async def pascoa_maratona(interaction: discord.Interaction):
     uid = str(interaction.user.id)
-    agora = datetime.now(BR_TZ)
-    raw = bot.pascoa_maratona_cd.get(uid)
-    if raw:
-        ult = datetime.fromisoformat(raw)
-        if ult.tzinfo is None:
-            ult = ult.replace(tzinfo=BR_TZ)
-        if agora - ult < timedelta(minutes=20):
-            m = int((timedelta(minutes=20) - (agora - ult)).total_seconds() // 60)
-            await interaction.response.send_message(f"🔥 Descanse o cérebro! Maratona de novo em **{m} min**.", ephemeral=True)
-            return
+    restante = bot.cooldowns.restante(uid, "pascoa_maratona")
+    if restante:
+        m = int(restante // 60)
+        await interaction.response.send_message(f"🔥 Descanse o cérebro! Maratona de novo em **{m} min**.", ephemeral=True)
+        return
     qs = random.sample(QUIZ_PASCOA, min(3, len(QUIZ_PASCOA)))
     while len(qs) < 3:
         qs.append(random.choice(QUIZ_PASCOA))
@@ -1945,16 +4061,11 @@ async def pascoa_maratona(interaction: discord.Interaction):
 @bot.tree.command(name="pascoa_boss", description="⚔️ Lute contra o Coelho Boss (cooldown 30min)")
 async def pascoa_boss(interaction: discord.Interaction):
     uid = str(interaction.user.id)
-    agora = datetime.now(BR_TZ)
-    raw = bot.pascoa_boss_cd.get(uid)
-    if raw:
-        ult = datetime.fromisoformat(raw)
-        if ult.tzinfo is None:
-            ult = ult.replace(tzinfo=BR_TZ)
-        if agora - ult < timedelta(minutes=30):
-            m = int((timedelta(minutes=30) - (agora - ult)).total_seconds() // 60)
-            await interaction.response.send_message(f"⚔️ O coelho ainda está se recuperando. Volte em **{m} min**.", ephemeral=True)
-            return
+    restante = bot.cooldowns.restante(uid, "pascoa_boss")
+    if restante:
+        m = int(restante // 60)
+        await interaction.response.send_message(f"⚔️ O coelho ainda está se recuperando. Volte em **{m} min**.", ephemeral=True)
+        return
     boss_hp = 100
     hearts = 3
     emb = discord.Embed(
@@ -1974,24 +4085,11 @@ async def pascoa_boss(interaction: discord.Interaction):
 @bot.tree.command(name="pascoa_campo", description="🥚 6 ovos, 2 são podres — ache 3 bons (cooldown 20min)")
 async def pascoa_campo(interaction: discord.Interaction):
     uid = str(interaction.user.id)
-    agora = datetime.now(BR_TZ)
-    raw = bot.pascoa_campo_cd.get(uid)
-    if raw:
-        ult = datetime.fromisoformat(raw)
-        if ult.tzinfo is None:
-            ult = ult.replace(tzinfo=BR_TZ)
-        if agora - ult < timedelta(minutes=20):
-            m = int((timedelta(minutes=20) - (agora - ult)).total_seconds() // 60)
-            await interaction.response.send_message(f"🥚 O campo ainda cheira mal… Volte em **{m} min**.", ephemeral=True)
-            return
-    game_id = str(interaction.id)
-    podres = set(random.sample(range(6), 2))
-    bot.pascoa_campo_state[game_id] = {
-        "uid": uid,
-        "podres": podres,
-        "bons_coletados": set(),
-        "revelados": set(),
-    }
+    restante = bot.cooldowns.restante(uid, "pascoa_campo")
+    if restante:
+        m = int(restante // 60)
+        await interaction.response.send_message(f"🥚 O campo ainda cheira mal… Volte em **{m} min**.", ephemeral=True)
+        return
     emb = discord.Embed(
         title="🥚 Campo Minado do Coelho",
         description="**6 ovos.** Quatro são **chocolate bom**, dois são **podres** (armadilha).\n\n"
@@ -2001,31 +4099,25 @@ async def pascoa_campo(interaction: discord.Interaction):
     )
     emb.set_image(url=random.choice(GIFS_OVO))
     emb.set_footer(text="Clique nos ovos 🥚")
-    await interaction.response.send_message(embed=emb, view=PascoaCampoView(game_id))
+    await interaction.response.send_message(embed=emb, view=PascoaCampoView(uid, base36(interaction.id)))
 
 
 @bot.tree.command(name="pascoa_caca", description="🐇 Caçar o coelho (cooldown 1h)")
 async def pascoa_caca(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     agora = datetime.now(BR_TZ)
-    if user_id in bot.pascoa_coelho:
-        ultimo = datetime.fromisoformat(bot.pascoa_coelho[user_id])
-        if ultimo.tzinfo is None:
-            ultimo = ultimo.replace(tzinfo=BR_TZ)
-        if agora - ultimo < timedelta(hours=1):
-            restante = timedelta(hours=1) - (agora - ultimo)
-            await interaction.response.send_message(f"🐇 Volte em **{int(restante.total_seconds() // 60)} min**.", ephemeral=True)
-            return
+    restante = bot.cooldowns.restante(user_id, "pascoa_caca")
+    if restante:
+        await interaction.response.send_message(f"🐇 Volte em **{int(restante // 60)} min**.", ephemeral=True)
+        return
     roll = random.random()
     gif = random.choice(GIFS_COELHO)
     deco = easter_header()
-    bot.pascoa_coelho[user_id] = agora.isoformat()
+    bot.cooldowns.ativar(user_id, "pascoa_caca")
     if roll < 0.60:
         pontos, moedas = random.randint(8, 20), random.randint(100, 250)
-        bot.add_pascoa_pontos(user_id, pontos)
-        if user_id not in bot.user_balances:
-            bot.user_balances[user_id] = 0
-        bot.user_balances[user_id] += moedas
+        bot.add_pascoa_pontos(user_id, pontos, "pascoa_caca", guild_id=interaction.guild_id)
+        bot.movimentar(user_id, moedas, "pascoa_caca", guild_id=interaction.guild_id)
         bot.save_data()
         embed = discord.Embed(title=f"{deco} COELHO! {deco}", description="Você encontrou o coelho! 🐇", color=discord.Color.green())
         embed.set_image(url=gif)
@@ -2033,7 +4125,7 @@ async def pascoa_caca(interaction: discord.Interaction):
         embed.add_field(name="🍫 Moedas", value=f"+{moedas}", inline=True)
     elif roll < 0.85:
         pontos = random.randint(2, 5)
-        bot.add_pascoa_pontos(user_id, pontos)
+        bot.add_pascoa_pontos(user_id, pontos, "pascoa_caca", guild_id=interaction.guild_id)
         bot.save_data()
         embed = discord.Embed(title="💨 Quase!", description="Fugiu, mas você ganhou uns pontinhos.", color=discord.Color.orange())
         embed.set_image(url=gif)
@@ -2049,16 +4141,11 @@ async def pascoa_caca(interaction: discord.Interaction):
 async def pascoa_ovo(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     agora = datetime.now(BR_TZ)
-    chave = f"{user_id}_{interaction.channel.id}"
-    if chave in bot.pascoa_ovos:
-        ultimo = datetime.fromisoformat(bot.pascoa_ovos[chave])
-        if ultimo.tzinfo is None:
-            ultimo = ultimo.replace(tzinfo=BR_TZ)
-        if agora - ultimo < timedelta(minutes=20):
-            r = timedelta(minutes=20) - (agora - ultimo)
-            await interaction.response.send_message(f"🥚 Espere **{int(r.total_seconds() // 60)}m**.", ephemeral=True)
-            return
-    bot.pascoa_ovos[chave] = agora.isoformat()
+    r = bot.cooldowns.restante(user_id, "pascoa_ovo", interaction.channel.id)
+    if r:
+        await interaction.response.send_message(f"🥚 Espere **{int(r // 60)}m**.", ephemeral=True)
+        return
+    bot.cooldowns.ativar(user_id, "pascoa_ovo", interaction.channel.id)
     tipos = [
         ("🥚 Ovo Comum", 3, 30),
         ("🥚 Colorido", 6, 60),
@@ -2071,10 +4158,8 @@ async def pascoa_ovo(interaction: discord.Interaction):
     nome, pontos, moedas = random.choices(tipos, weights=pesos, k=1)[0]
     deco = easter_header()
     if pontos > 0:
-        bot.add_pascoa_pontos(user_id, pontos)
-        if user_id not in bot.user_balances:
-            bot.user_balances[user_id] = 0
-        bot.user_balances[user_id] += moedas
+        bot.add_pascoa_pontos(user_id, pontos, "pascoa_ovo", guild_id=interaction.guild_id)
+        bot.movimentar(user_id, moedas, "pascoa_ovo", guild_id=interaction.guild_id)
         bot.save_data()
         embed = discord.Embed(title=f"{deco} OVO! {deco}", description=nome, color=discord.Color.from_str("#FFD700"))
         embed.set_image(url=random.choice(GIFS_OVO))
@@ -2093,10 +4178,9 @@ async def pascoa_corrida(interaction: discord.Interaction, coelho: int):
     if coelho < 1 or coelho > 5:
         await interaction.response.send_message("❌ Escolha 1 a 5!", ephemeral=True)
         return
-    if user_id not in bot.user_balances or bot.user_balances[user_id] < 50:
+    if not bot.debitar_se_suficiente(user_id, 50, "pascoa_corrida", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌ Precisa de 50 moedas!", ephemeral=True)
         return
-    bot.user_balances[user_id] -= 50
     coelhos = ["🐰 A", "🐇 B", "🐰 C", "🐇 D", "🐰 E"]
     posicoes = list(range(5))
     random.shuffle(posicoes)
@@ -2113,8 +4197,8 @@ async def pascoa_corrida(interaction: discord.Interaction, coelho: int):
     if ganhou:
         mult = random.choice([2, 3, 4, 5])
         premio = 50 * mult
-        bot.user_balances[user_id] += premio
-        bot.add_pascoa_pontos(user_id, 15)
+        bot.movimentar(user_id, premio, "pascoa_corrida", guild_id=interaction.guild_id)
+        bot.add_pascoa_pontos(user_id, 15, "pascoa_corrida", guild_id=interaction.guild_id)
         bot.save_data()
         embed = discord.Embed(title=f"{deco} VENCEU! {deco}", description=f"```{corrida_texto}```", color=discord.Color.gold())
         embed.add_field(name="Prêmio", value=f"{premio} moedas (x{mult})", inline=True)
@@ -2133,15 +4217,12 @@ async def pascoa_chocolate(interaction: discord.Interaction, membro: discord.Mem
     if membro == interaction.user:
         await interaction.response.send_message("❌ Escolha outra pessoa.", ephemeral=True)
         return
-    if user_id not in bot.user_balances or bot.user_balances[user_id] < 80:
+    tid = str(membro.id)
+    if not bot.debitar_se_suficiente(user_id, 80, "pascoa_chocolate", tid, guild_id=interaction.guild_id):
         await interaction.response.send_message("❌ 80 moedas necessárias.", ephemeral=True)
         return
-    bot.user_balances[user_id] -= 80
-    tid = str(membro.id)
-    if tid not in bot.user_balances:
-        bot.user_balances[tid] = 0
-    bot.user_balances[tid] += 30
-    bot.add_pascoa_pontos(user_id, 5)
+    bot.movimentar(tid, 30, "pascoa_chocolate", user_id, guild_id=interaction.guild_id)
+    bot.add_pascoa_pontos(user_id, 5, "pascoa_chocolate", guild_id=interaction.guild_id)
     bot.save_data()
     chocs = ["🍫 Ao leite", "🍬 Bombom", "🥚 Ovo gigante", "🍭 Trufa"]
     c = random.choice(chocs)
@@ -2158,28 +4239,33 @@ async def pascoa_chocolate(interaction: discord.Interaction, membro: discord.Mem
 
 
 @bot.tree.command(name="pascoa_ranking", description="🏆 Ranking de Páscoa")
-async def pascoa_ranking(interaction: discord.Interaction):
-    if not bot.pascoa_pontos:
+@app_commands.describe(geral="Ranking de todos os servidores em vez só deste")
+async def pascoa_ranking(interaction: discord.Interaction, geral: bool = False):
+    geral = geral or interaction.guild is None
+    ranking = bot.ranking_pascoa if geral else bot.particoes.obter(interaction.guild_id).ranking
+    if not ranking:
         await interaction.response.send_message("🐣 Ninguém tem pontos ainda!", ephemeral=True)
         return
     membros = []
-    for uid, pontos in bot.pascoa_pontos.items():
-        m = interaction.guild.get_member(int(uid))
-        if m and not m.bot and pontos > 0:
+    for uid, pontos in ranking.maiores():
+        m = bot.get_user(int(uid)) if geral else interaction.guild.get_member(int(uid))
+        if m and not m.bot:
             membros.append((m, pontos))
-    membros.sort(key=lambda x: x[1], reverse=True)
+            if len(membros) == 15:
+                break
     if not membros:
         await interaction.response.send_message("🐣 Ranking vazio neste servidor.", ephemeral=True)
         return
     texto = ""
     medals = ["🥇", "🥈", "🥉"]
-    for i, (m, p) in enumerate(membros[:15], 1):
+    for i, (m, p) in enumerate(membros, 1):
         texto += f"{medals[i-1] if i <= 3 else str(i)+'.'} {m.display_name} — **{p}** pts\n"
-    embed = discord.Embed(title=f"{easter_header()} RANKING {easter_header()}", description=texto, color=discord.Color.gold())
+    titulo = "RANKING GERAL" if geral else "RANKING"
+    embed = discord.Embed(title=f"{easter_header()} {titulo} {easter_header()}", description=texto, color=discord.Color.gold())
     uid = str(interaction.user.id)
-    pos = next((i + 1 for i, (m, _) in enumerate(membros) if str(m.id) == uid), None)
+    pos = ranking.posicao(uid)
     if pos:
-        embed.add_field(name="Você", value=f"{pos}º — {bot.pascoa_pontos.get(uid, 0)} pts", inline=False)
+        embed.add_field(name="Você", value=f"{pos}º — {ranking.pontos[uid]} pts", inline=False)
     await interaction.response.send_message(embed=embed)
 
 
@@ -2188,10 +4274,14 @@ async def pascoa_pontos_cmd(interaction: discord.Interaction, membro: Optional[d
     membro = membro or interaction.user
     user_id = str(membro.id)
     pontos = bot.pascoa_pontos.get(user_id, 0)
-    ranking = sorted(bot.pascoa_pontos.items(), key=lambda x: x[1], reverse=True)
-    pos = next((i + 1 for i, (u, _) in enumerate(ranking) if u == user_id), None)
+    pos = bot.ranking_pascoa.posicao(user_id)
     embed = discord.Embed(title="🥚 Pontos de Páscoa", description=f"**{membro.display_name}** — **{pontos}** pts", color=discord.Color.from_str("#FF69B4"))
     embed.set_thumbnail(url=membro.display_avatar.url)
+    if interaction.guild:
+        ranking_local = bot.particoes.obter(interaction.guild_id).ranking
+        pos_local = ranking_local.posicao(user_id)
+        if pos_local:
+            embed.add_field(name="Neste servidor", value=f"{pos_local}º — {ranking_local.pontos[user_id]} pts", inline=True)
     if pos:
         embed.add_field(name="Ranking geral", value=f"{pos}º lugar", inline=True)
     await interaction.response.send_message(embed=embed)
@@ -2200,10 +4290,9 @@ async def pascoa_pontos_cmd(interaction: discord.Interaction, membro: Optional[d
 @bot.tree.command(name="pascoa_slot", description="🎰 Slot de Páscoa (40 moedas)")
 async def pascoa_slot(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
-    if user_id not in bot.user_balances or bot.user_balances[user_id] < 40:
+    if not bot.debitar_se_suficiente(user_id, 40, "pascoa_slot", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌ 40 moedas!", ephemeral=True)
         return
-    bot.user_balances[user_id] -= 40
     sims = ["🥚", "🐣", "🐇", "🌸", "🍫", "🌷", "✝️", "🎀"]
     w = [25, 20, 15, 15, 10, 8, 5, 2]
     r = random.choices(sims, weights=w, k=3)
@@ -2217,8 +4306,8 @@ async def pascoa_slot(interaction: discord.Interaction):
         premio_moedas, premio_pts = 80, 5
         msg = "🥳 Par!"
     if premio_moedas:
-        bot.user_balances[user_id] += premio_moedas
-        bot.add_pascoa_pontos(user_id, premio_pts)
+        bot.movimentar(user_id, premio_moedas, "pascoa_slot", guild_id=interaction.guild_id)
+        bot.add_pascoa_pontos(user_id, premio_pts, "pascoa_slot", guild_id=interaction.guild_id)
     bot.save_data()
     embed = discord.Embed(
         title="🎰 Slot Páscoa",
@@ -2629,6 +4718,7 @@ async def rp_ficha(interaction: discord.Interaction, nome: str = None, idade: st
         bot.rp_fichas[user_id]["personalidade"] = personalidade
     if historia:
         bot.rp_fichas[user_id]["historia"] = historia
+    bot.rp_fichas.marcar(user_id)
     bot.save_rp()
     await interaction.response.send_message("✅ Ficha salva!", ephemeral=True)
 
@@ -2704,6 +4794,7 @@ async def likeship(interaction: discord.Interaction, pessoa1: discord.Member, pe
         await interaction.response.send_message("❌ Ship não existe.", ephemeral=True)
         return
     bot.ship_data[sid]["likes"] += 1
+    bot.ship_data.marcar(sid)
     bot.save_data()
     await interaction.response.send_message(f"👍 Total: {bot.ship_data[sid]['likes']}")
 
@@ -2792,10 +4883,9 @@ async def pedir(interaction: discord.Interaction, pessoa: discord.Member):
         if tid in (d["pessoa1"], d["pessoa2"]):
             await interaction.response.send_message("❌ Essa pessoa já está casada.", ephemeral=True)
             return
-    if uid not in bot.user_balances or bot.user_balances[uid] < 2000:
+    if not bot.debitar_se_suficiente(uid, 2000, "pedir", tid, guild_id=interaction.guild_id):
         await interaction.response.send_message("❌ 2000 moedas.", ephemeral=True)
         return
-    bot.user_balances[uid] -= 2000
     bot.save_data()
     embed = discord.Embed(
         title="💍 PEDIDO",
@@ -2818,8 +4908,7 @@ async def aceitar(interaction: discord.Interaction, pessoa: discord.Member):
         "presentes": [],
     }
     for x in (pid, uid):
-        bot.user_balances.setdefault(x, 0)
-        bot.user_balances[x] += 1000
+        bot.movimentar(x, 1000, "aceitar", guild_id=interaction.guild_id)
     bot.save_data()
     await interaction.response.send_message(embed=discord.Embed(title="💞 CASADOS!", description=f"{pessoa.mention} ❤️ {interaction.user.mention}", color=discord.Color.gold()))
 
@@ -2836,14 +4925,13 @@ async def divorciar(interaction: discord.Interaction):
     if not mid:
         await interaction.response.send_message("❌ Não casado.", ephemeral=True)
         return
-    if uid in bot.divorce_cooldowns and datetime.now(BR_TZ) - bot.divorce_cooldowns[uid] < timedelta(days=7):
+    if bot.cooldowns.restante(uid, "divorciar"):
         await interaction.response.send_message("❌ Cooldown 7d.", ephemeral=True)
         return
-    if uid not in bot.user_balances or bot.user_balances[uid] < 5000:
+    if not bot.debitar_se_suficiente(uid, 5000, "divorciar", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌ 5000 moedas.", ephemeral=True)
         return
-    bot.user_balances[uid] -= 5000
-    bot.divorce_cooldowns[uid] = datetime.now(BR_TZ)
+    bot.cooldowns.ativar(uid, "divorciar")
     del bot.marriage_data[mid]
     bot.save_data()
     await interaction.response.send_message("💔 Divórcio realizado.")
@@ -2871,15 +4959,15 @@ async def casamento(interaction: discord.Interaction):
 @bot.tree.command(name="presentear", description="🎁 Presente ao cônjuge (100 moedas)")
 async def presentear(interaction: discord.Interaction, presente: str):
     uid = str(interaction.user.id)
-    d = next((x for x in bot.marriage_data.values() if x["pessoa1"] == uid or x["pessoa2"] == uid), None)
+    mid, d = next(((m, x) for m, x in bot.marriage_data.items() if x["pessoa1"] == uid or x["pessoa2"] == uid), (None, None))
     if not d:
         await interaction.response.send_message("❌", ephemeral=True)
         return
-    if uid not in bot.user_balances or bot.user_balances[uid] < 100:
+    if not bot.debitar_se_suficiente(uid, 100, "presentear", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌", ephemeral=True)
         return
-    bot.user_balances[uid] -= 100
     d.setdefault("presentes", []).append(f"{interaction.user.name}: {presente}")
+    bot.marriage_data.marcar(mid)
     bot.save_data()
     cid = d["pessoa2"] if d["pessoa1"] == uid else d["pessoa1"]
     await interaction.response.send_message(f"🎁 Para <@{cid}>")
@@ -2888,7 +4976,7 @@ async def presentear(interaction: discord.Interaction, presente: str):
 @bot.tree.command(name="aniversario", description="🎂 Aniversário de casamento")
 async def aniversario(interaction: discord.Interaction):
     uid = str(interaction.user.id)
-    d = next((x for x in bot.marriage_data.values() if x["pessoa1"] == uid or x["pessoa2"] == uid), None)
+    mid, d = next(((m, x) for m, x in bot.marriage_data.items() if x["pessoa1"] == uid or x["pessoa2"] == uid), (None, None))
     if not d:
         await interaction.response.send_message("❌", ephemeral=True)
         return
@@ -2902,10 +4990,10 @@ async def aniversario(interaction: discord.Interaction):
         await interaction.response.send_message("❌ Já comemorado.", ephemeral=True)
         return
     d["aniversarios_comemorados"] = anos
+    bot.marriage_data.marcar(mid)
     cid = d["pessoa2"] if d["pessoa1"] == uid else d["pessoa1"]
     for x in (uid, cid):
-        bot.user_balances.setdefault(x, 0)
-        bot.user_balances[x] += 500 * anos
+        bot.movimentar(x, 500 * anos, "aniversario", guild_id=interaction.guild_id)
     bot.save_data()
     await interaction.response.send_message(embed=discord.Embed(title="🎂", description=f"{anos} anos! +{500*anos} moedas cada.", color=discord.Color.gold()))
 
@@ -2913,13 +5001,14 @@ async def aniversario(interaction: discord.Interaction):
 @bot.tree.command(name="luademel", description="🌙 Lua de mel")
 async def luademel(interaction: discord.Interaction):
     uid = str(interaction.user.id)
-    d = next((x for x in bot.marriage_data.values() if x["pessoa1"] == uid or x["pessoa2"] == uid), None)
+    mid, d = next(((m, x) for m, x in bot.marriage_data.items() if x["pessoa1"] == uid or x["pessoa2"] == uid), (None, None))
     if not d:
         await interaction.response.send_message("❌", ephemeral=True)
         return
     dt = datetime.fromisoformat(d["data_casamento"]).replace(tzinfo=BR_TZ)
     if datetime.now(BR_TZ) - dt > timedelta(days=7):
         d["luademel"] = False
+        bot.marriage_data.marcar(mid)
         bot.save_data()
         await interaction.response.send_message("❌ Acabou.", ephemeral=True)
         return
@@ -2958,12 +5047,12 @@ async def comprar_presente(interaction: discord.Interaction, presente: str, usua
         return
     preco = PRESENTES_LOJA[presente]
     uid = str(interaction.user.id)
-    if uid not in bot.user_balances or bot.user_balances[uid] < preco:
+    tid = str(usuario.id)
+    if not bot.debitar_se_suficiente(uid, preco, "comprar_presente", tid, guild_id=interaction.guild_id):
         await interaction.response.send_message("❌ Saldo.", ephemeral=True)
         return
-    bot.user_balances[uid] -= preco
-    tid = str(usuario.id)
     bot.user_inventory.setdefault(tid, []).append({"presente": presente, "de": interaction.user.name, "data": datetime.now(BR_TZ).isoformat()})
+    bot.user_inventory.marcar(tid, len(bot.user_inventory[tid]) - 1)
     bot.save_data()
     await interaction.response.send_message(f"🎁 {presente} → {usuario.mention}")
 
@@ -2984,41 +5073,25 @@ async def meuspresentes(interaction: discord.Interaction):
 async def daily(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     agora = datetime.now(BR_TZ)
-    hoje, ontem = agora.date(), agora.date() - timedelta(days=1)
     bot.user_balances.setdefault(user_id, 0)
-    ultimo_raw = bot.daily_cooldowns.get(user_id)
-    if ultimo_raw:
-        try:
-            ultimo = datetime.fromisoformat(ultimo_raw)
-            if ultimo.tzinfo is None:
-                ultimo = ultimo.replace(tzinfo=BR_TZ)
-            if ultimo.date() == hoje:
-                prox = datetime(agora.year, agora.month, agora.day, 0, 0, 0, tzinfo=BR_TZ) + timedelta(days=1)
-                r = prox - agora
-                await interaction.response.send_message(
-                    embed=discord.Embed(
-                        title="⏰ Daily já pego",
-                        description=f"Próximo em **{int(r.total_seconds()//3600)}h {int((r.total_seconds()%3600)//60)}m**\nSaldo: **{bot.user_balances[user_id]}**",
-                        color=discord.Color.orange(),
-                    ),
-                    ephemeral=True,
-                )
-                return
-        except (ValueError, TypeError):
-            pass
+    restante = bot.cooldowns.restante(user_id, "daily")
+    if restante:
+        await interaction.response.send_message(
+            embed=discord.Embed(
+                title="⏰ Daily já pego",
+                description=f"Próximo em **{int(restante//3600)}h {int((restante%3600)//60)}m**\nSaldo: **{bot.user_balances[user_id]}**",
+                color=discord.Color.orange(),
+            ),
+            ephemeral=True,
+        )
+        return
     streak_key = f"{user_id}_streak"
     streak = 1
-    if user_id in bot.daily_cooldowns:
+    # daily_streak vence um dia depois do daily: ainda vigente = último daily foi ontem.
+    if bot.cooldowns.restante(user_id, "daily_streak"):
         try:
-            u = datetime.fromisoformat(bot.daily_cooldowns[user_id])
-            if u.tzinfo is None:
-                u = u.replace(tzinfo=BR_TZ)
-            if u.date() == ontem:
-                try:
-                    streak = int(bot.daily_cooldowns.get(streak_key, "0")) + 1
-                except ValueError:
-                    streak = 1
-        except Exception:
+            streak = int(bot.daily_cooldowns.get(streak_key, "0")) + 1
+        except ValueError:
             streak = 1
     base = random.randint(300, 600)
     bonus_streak = min(streak * 30, 500)
@@ -3031,8 +5104,10 @@ async def daily(interaction: discord.Interaction):
     elif roll < 0.35:
         extra, msg_b = 100, "Bônus +100"
     total = base + bonus_streak + extra
-    bot.user_balances[user_id] += total
-    bot.daily_cooldowns[user_id] = agora.isoformat()
+    bot.movimentar(user_id, total, "daily", guild_id=interaction.guild_id)
+    meia_noite = proxima_meia_noite(agora)
+    bot.cooldowns.ativar(user_id, "daily", prazo=meia_noite)
+    bot.cooldowns.ativar(user_id, "daily_streak", prazo=meia_noite + 86400)
     bot.daily_cooldowns[streak_key] = str(streak)
     bot.save_data()
     embed = discord.Embed(title="💰 DAILY", description=f"**+{total}** moedas\nStreak: **{streak}** dias (+{bonus_streak})", color=discord.Color.gold())
@@ -3051,6 +5126,9 @@ async def saldo(interaction: discord.Interaction, membro: Optional[discord.Membe
     st = int(bot.daily_cooldowns[sk]) if sk in bot.daily_cooldowns else 0
     embed = discord.Embed(title=f"💰 {membro.display_name}", color=discord.Color.gold())
     embed.add_field(name="Moedas", value=str(bot.user_balances.get(uid, 0)), inline=True)
+    fluxo = bot.particoes.obter(interaction.guild_id).fluxo.get(uid, 0) if interaction.guild else 0
+    if fluxo:
+        embed.add_field(name="Neste servidor", value=f"{fluxo:+}", inline=True)
     if st:
         embed.add_field(name="Streak", value=str(st), inline=True)
     embed.set_thumbnail(url=membro.display_avatar.url)
@@ -3063,12 +5141,9 @@ async def transferir(interaction: discord.Interaction, membro: discord.Member, v
         await interaction.response.send_message("❌", ephemeral=True)
         return
     uid, tid = str(interaction.user.id), str(membro.id)
-    if uid not in bot.user_balances or bot.user_balances[uid] < valor:
+    if not bot.transferir_saldo(uid, tid, valor, "transferir", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌", ephemeral=True)
         return
-    bot.user_balances[uid] -= valor
-    bot.user_balances.setdefault(tid, 0)
-    bot.user_balances[tid] += valor
     bot.save_data()
     await interaction.response.send_message(f"💸 {valor} → {membro.mention}")
 
@@ -3076,10 +5151,9 @@ async def transferir(interaction: discord.Interaction, membro: discord.Member, v
 @bot.tree.command(name="slot", description="🎰 Slot 50 moedas")
 async def slot(interaction: discord.Interaction):
     uid = str(interaction.user.id)
-    if uid not in bot.user_balances or bot.user_balances[uid] < 50:
+    if not bot.debitar_se_suficiente(uid, 50, "slot", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌", ephemeral=True)
         return
-    bot.user_balances[uid] -= 50
     sims = ["🍒", "🍋", "🍊", "🍇", "💎", "7️⃣"]
     r = [random.choice(sims) for _ in range(3)]
     premio = 0
@@ -3088,7 +5162,7 @@ async def slot(interaction: discord.Interaction):
     elif r[0] == r[1] or r[1] == r[2] or r[0] == r[2]:
         premio = 75
     if premio:
-        bot.user_balances[uid] += premio
+        bot.movimentar(uid, premio, "slot", guild_id=interaction.guild_id)
     bot.save_data()
     await interaction.response.send_message(f"🎰 `{r[0]}|{r[1]}|{r[2]}` → **{premio}** moedas | saldo {bot.user_balances[uid]}")
 
@@ -3107,13 +5181,12 @@ async def cara_coroa(interaction: discord.Interaction, escolha: str, aposta: int
     if escolha.lower() not in ("cara", "coroa") or aposta <= 0:
         await interaction.response.send_message("❌", ephemeral=True)
         return
-    if uid not in bot.user_balances or bot.user_balances[uid] < aposta:
+    if not bot.debitar_se_suficiente(uid, aposta, "cara_coroa", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌", ephemeral=True)
         return
-    bot.user_balances[uid] -= aposta
     res = random.choice(["cara", "coroa"])
     if res == escolha.lower():
-        bot.user_balances[uid] += aposta * 2
+        bot.movimentar(uid, aposta * 2, "cara_coroa", guild_id=interaction.guild_id)
         msg = f"Ganhou **{aposta*2}**"
     else:
         msg = "Perdeu"
@@ -3142,13 +5215,15 @@ async def ppt(interaction: discord.Interaction, escolha: str):
 @bot.tree.command(name="adivinha", description="🔢 1-10 (30 moedas)")
 async def adivinha(interaction: discord.Interaction, numero: int):
     uid = str(interaction.user.id)
-    if uid not in bot.user_balances or bot.user_balances[uid] < 30 or not 1 <= numero <= 10:
+    if not 1 <= numero <= 10:
+        await interaction.response.send_message("❌", ephemeral=True)
+        return
+    if not bot.debitar_se_suficiente(uid, 30, "adivinha", guild_id=interaction.guild_id):
         await interaction.response.send_message("❌", ephemeral=True)
         return
-    bot.user_balances[uid] -= 30
     sec = random.randint(1, 10)
     if numero == sec:
-        bot.user_balances[uid] += 150
+        bot.movimentar(uid, 150, "adivinha", guild_id=interaction.guild_id)
         msg = f"ACERTOU **{sec}**! +150"
     else:
         msg = f"Era **{sec}**"